@@ -0,0 +1,112 @@
+"""
+aggregator.py
+─────────────
+Central attendance aggregator for buildings with one Pi per room.
+
+With AGGREGATOR_URL set, an edge node no longer writes Firestore itself;
+every confirmation is shipped as a compact event
+
+    {"date", "rollNo", "name", "room", "ts", "distance", "camera"}
+
+in small POST /events batches (model/aggregator_client.py).  This service
+is the HTTP layer around aggregator_core.Aggregator, which
+
+  • dedupes by (date, rollNo): the first confirmation wins, later ones —
+    another room, a client retry — only extend the record's room list
+  • writes new records to Firestore in batched commits every flush_s (up to
+    max_batch records plus one summary-doc update per date, see
+    FirestoreWriter); a failed commit is retried on the next flush
+  • sums the end-of-session scan reports ("scans" in the same POST body,
+    deduped by session id) into the summary doc's scan counters
+  • serves the consolidated view, GET /status[?date=YYYY-MM-DD], per
+    student and per room, with each room's last contact
+
+so Firestore write volume and cloud round trips no longer grow with the
+number of rooms — edge nodes only talk to the LAN.
+
+Run it on any machine on the LAN (one of the Pis will do):
+    python aggregator.py [--host 0.0.0.0] [--port 8100] [--dry-run]
+
+--dry-run (or no Firebase credentials) keeps everything in memory and only
+logs the writes it would make.
+
+A single-room node without AGGREGATOR_URL runs the same Aggregator in
+process (model/face_engine.py), so its writes are batched the same way.
+"""
+
+import logging
+import os
+
+from flask import Flask, Response, jsonify, request
+
+import metrics
+from aggregator_core import DATE_RE, Aggregator, FirestoreWriter, firestore_client
+
+logger = logging.getLogger("smart-switch")
+
+_MAX_EVENTS_PER_POST = 1000
+
+
+# ── HTTP ────────────────────────────────────────────────
+
+def create_app(aggregator: Aggregator) -> Flask:
+    app = Flask("aggregator")
+
+    @app.route("/", methods=["GET"])
+    def index():
+        return jsonify({"service": "attendance-aggregator",
+                        "endpoints": ["/events", "/status", "/metrics"]})
+
+    @app.route("/events", methods=["POST"])
+    def events():
+        data = request.get_json(force=True, silent=True)
+        batch = data.get("events", []) if isinstance(data, dict) else data
+        scans = data.get("scans", []) if isinstance(data, dict) else []
+        if not isinstance(batch, list) or not isinstance(scans, list):
+            return jsonify({"error": "expected a list of events"}), 400
+        if len(batch) + len(scans) > _MAX_EVENTS_PER_POST:
+            return jsonify({"error": f"at most {_MAX_EVENTS_PER_POST} events per request"}), 413
+        return jsonify(aggregator.ingest(batch, scans))
+
+    @app.route("/status", methods=["GET"])
+    def status():
+        date = request.args.get("date")
+        if date is not None and not DATE_RE.match(date):
+            return jsonify({"error": "date must be YYYY-MM-DD"}), 400
+        return jsonify(aggregator.status(date))
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics_endpoint():
+        return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+    return app
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import http_server
+
+    ap = argparse.ArgumentParser(description="Central attendance aggregator")
+    ap.add_argument("--host", default=os.getenv("AGGREGATOR_HOST", "0.0.0.0"))
+    ap.add_argument("--port", type=int, default=int(os.getenv("AGGREGATOR_PORT", "8100")))
+    ap.add_argument("--flush", type=float, default=float(os.getenv("AGGREGATOR_COMMIT_S", "2")),
+                    help="seconds between Firestore batch commits")
+    ap.add_argument("--dry-run", action="store_true", help="log writes instead of committing")
+    args = ap.parse_args()
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"),
+                        format="%(asctime)s [%(levelname)s] %(message)s")
+
+    db = None if args.dry_run else firestore_client()
+    agg = Aggregator(FirestoreWriter(db) if db is not None else None,
+                     flush_s=args.flush,
+                     max_batch=int(os.getenv("AGGREGATOR_MAX_BATCH", "400")))
+    agg.start()
+    logger.info("[Aggregator] Listening on %s:%d (%s)", args.host, args.port,
+                "Firestore" if db is not None else "dry run")
+    try:
+        http_server.serve(create_app(agg), args.host, args.port, workers=4)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        agg.stop()
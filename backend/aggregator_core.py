@@ -0,0 +1,438 @@
+"""
+aggregator_core.py
+──────────────────
+Deduping, batching attendance writer shared by the central aggregator
+service (aggregator.py, which adds the HTTP layer) and single-room edge
+nodes (model/face_engine.py runs an Aggregator in process).
+
+  • Aggregator.ingest() merges confirmation events, deduped by
+    (date, rollNo), and end-of-session scan reports, deduped by session id
+  • a flush thread hands the new records and summed scan counters to the
+    writer every flush_s; a failed commit is retried on the next flush
+  • FirestoreWriter turns them into batched commits, including the per-day
+    summary document dashboards read
+
+No Flask here: edge nodes import this without the service.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+import metrics
+
+logger = logging.getLogger("smart-switch")
+
+try:
+    import firebase_admin                                    # type: ignore
+    from firebase_admin import credentials, firestore        # type: ignore
+    _FB_OK = True
+except ImportError:
+    _FB_OK = False
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SERVICE_ACCOUNT = os.path.join(
+    _HERE, "smart-class-da901-firebase-adminsdk-fbsvc-3b7bc6538d.json"
+)
+CLASS_LABEL = "24CS (Batch 2024)"
+
+DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+# Numeric fields of a scan report, summed per date until the next commit
+_SCAN_COUNTERS = ("sessions", "passes", "faces", "embeddings", "duration_s")
+
+_M_EVENTS  = metrics.counter("aggregator_events_total",
+                             "Confirmation events by result (accepted/duplicate/invalid)",
+                             ("result",))
+_M_COMMITS = metrics.counter("aggregator_commits_total",
+                             "Firestore batch commits by result", ("result",))
+_M_COMMIT  = metrics.histogram("aggregator_commit_seconds", "Firestore batch commit latency")
+
+
+# ── Firestore ───────────────────────────────────────────
+
+def firestore_client():
+    """Firestore client from FIREBASE_SERVICE_ACCOUNT /
+    GOOGLE_APPLICATION_CREDENTIALS / the default key file; None if
+    firebase-admin or credentials are missing."""
+    if not _FB_OK:
+        logger.warning("[Aggregator] firebase-admin not installed – dry run")
+        return None
+    path = (os.getenv("FIREBASE_SERVICE_ACCOUNT") or "").strip()
+    if path and not os.path.isabs(path):
+        path = os.path.join(_HERE, path)
+    path = path or (os.getenv("GOOGLE_APPLICATION_CREDENTIALS") or "").strip() \
+        or DEFAULT_SERVICE_ACCOUNT
+    try:
+        try:
+            app = firebase_admin.get_app("aggregator")
+        except ValueError:
+            if os.path.exists(path):
+                app = firebase_admin.initialize_app(credentials.Certificate(path),
+                                                    name="aggregator")
+            else:
+                app = firebase_admin.initialize_app(name="aggregator")
+        return firestore.client(app=app)
+    except Exception as exc:
+        logger.error("[Aggregator] Firebase init error: %s – dry run", exc)
+        return None
+
+
+class FirestoreWriter:
+    """Writes new records, plus one summary document per date, as batched
+    commits (Firestore allows 500 operations per batch).
+
+    attendance/{date}/summary/camera is what a dashboard needs in one read:
+
+        presentCount  students the cameras confirmed (Increment)
+        present       their roll numbers (ArrayUnion)
+        firstSeen     {rollNo: time of the first confirmation}
+        firstRoom     {rollNo: room of the first confirmation}
+        scan          session / pass / face counters (Increment) and the
+                      last session's stop reason and room
+
+    The counters are server-side transforms, so a commit never reads the
+    document.  Which rolls are already counted is read once per date (so a
+    restart or a second session that day does not count anyone twice) and
+    kept.  The parent attendance/{date} doc is written once per date per
+    process instead of on every confirmation.
+    """
+
+    MAX_OPS = 450
+
+    def __init__(self, db):
+        self.db = db
+        self._counted: dict[str, set] = {}      # date → rolls in presentCount
+        self._parents: set[str] = set()         # dates whose parent doc exists
+
+    def _day(self, date: str):
+        return self.db.collection("attendance").document(date)
+
+    def _counted_for(self, date: str) -> set:
+        if date not in self._counted:
+            snap = self._day(date).collection("summary").document("camera").get()
+            data = (snap.to_dict() if snap.exists else None) or {}
+            self._counted[date] = set(data.get("present") or [])
+        return self._counted[date]
+
+    def __call__(self, records: list[dict], scans: list[dict] = ()):
+        ops, tail = [], []
+        new_rolls: dict[str, list[str]] = {}
+        for date in sorted({r["date"] for r in records} | {s["date"] for s in scans}):
+            day = self._day(date)
+            counted = self._counted_for(date)
+            new = []
+            for rec in records:
+                if rec["date"] != date:
+                    continue
+                ops.append((day.collection("records").document(rec["rollNo"]), {
+                    "rollNo":    rec["rollNo"],
+                    "name":      rec["name"],
+                    "status":    "present",
+                    "odType":    None,
+                    "source":    "camera",
+                    "room":      rec["room"],
+                    "distance":  rec["distance"],
+                    "updatedAt": firestore.SERVER_TIMESTAMP,
+                }))
+                if rec["rollNo"] not in counted:
+                    new.append(rec)
+
+            if date not in self._parents:
+                tail.append((day, {"date": date, "classLabel": CLASS_LABEL}))
+            summary = {"date": date, "classLabel": CLASS_LABEL,
+                       "updatedAt": firestore.SERVER_TIMESTAMP}
+            if new:
+                summary["presentCount"] = firestore.Increment(len(new))
+                summary["present"] = firestore.ArrayUnion([r["rollNo"] for r in new])
+                summary["firstSeen"] = {r["rollNo"]: datetime.fromtimestamp(r["ts"], tz=timezone.utc)
+                                        for r in new}
+                summary["firstRoom"] = {r["rollNo"]: r["room"] for r in new}
+            scan = next((s for s in scans if s["date"] == date), None)
+            if scan:
+                summary["scan"] = {
+                    "sessions":       firestore.Increment(scan["sessions"]),
+                    "passes":         firestore.Increment(scan["passes"]),
+                    "faces":          firestore.Increment(scan["faces"]),
+                    "embeddings":     firestore.Increment(scan["embeddings"]),
+                    "durationS":      firestore.Increment(scan["duration_s"]),
+                    "lastStopReason": scan["stop_reason"],
+                    "lastRoom":       scan["room"],
+                    "lastSessionAt":  firestore.SERVER_TIMESTAMP,
+                }
+            tail.append((day.collection("summary").document("camera"), summary))
+            new_rolls[date] = [r["rollNo"] for r in new]
+
+        # The parent and summary writes ride in the last commit: if an
+        # earlier one fails the retry rewrites records (idempotent) but
+        # nothing has been counted yet.
+        while ops and len(ops) + len(tail) > self.MAX_OPS:
+            self._commit(ops[:self.MAX_OPS])
+            ops = ops[self.MAX_OPS:]
+        self._commit(ops + tail)
+        for date, rolls in new_rolls.items():
+            self._counted[date].update(rolls)
+            self._parents.add(date)
+
+    def _commit(self, ops: list):
+        batch = self.db.batch()
+        for ref, data in ops:
+            batch.set(ref, data, merge=True)
+        batch.commit()
+
+
+def _log_writer(records: list[dict], scans: list[dict] = ()):
+    for rec in records:
+        logger.info("[Aggregator] (dry run) present: %s (%s) on %s from %s",
+                    rec["name"], rec["rollNo"], rec["date"], rec["room"])
+    for scan in scans:
+        logger.info("[Aggregator] (dry run) scan on %s: %d sessions, %d passes, %d faces",
+                    scan["date"], scan["sessions"], scan["passes"], scan["faces"])
+
+
+# ── Aggregator ──────────────────────────────────────────
+
+def _parse_scan(sc) -> Optional[dict]:
+    if not isinstance(sc, dict) or not DATE_RE.match(str(sc.get("date") or "")):
+        return None
+    session = str(sc.get("session") or "").strip()
+    if not session:
+        return None
+    try:
+        counters = {k: max(0.0, float(sc.get(k) or 0)) for k in _SCAN_COUNTERS}
+    except (TypeError, ValueError):
+        return None
+    counters["duration_s"] = round(counters["duration_s"], 1)
+    for k in _SCAN_COUNTERS[:-1]:
+        counters[k] = int(counters[k])
+    return dict(counters, date=sc["date"], session=session,
+                room=str(sc.get("room") or "unknown"), stop_reason=sc.get("stop_reason"))
+
+
+class Aggregator:
+    def __init__(self, writer: Optional[Callable[[list], None]] = None,
+                 flush_s: float = 2.0, max_batch: int = 400, keep_days: int = 7):
+        self._writer = writer or _log_writer
+        self.flush_s = flush_s
+        self.max_batch = max(1, max_batch)
+        self.keep_days = max(1, keep_days)
+
+        self._lock = threading.Lock()
+        self._dates: dict[str, dict[str, dict]] = {}   # date → rollNo → record
+        self._pending: dict[tuple, dict] = {}          # (date, rollNo) → record to write
+        self._rooms: dict[str, dict] = {}              # room → contact stats
+        self._scans: dict[str, dict] = {}              # date → scan counters to write
+        self._scan_totals: dict[str, dict] = {}        # date → scan counters seen
+        self._sessions: dict[str, set] = {}            # date → scan session ids seen
+        self._wake = threading.Event()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+        self._stats = {"received": 0, "accepted": 0, "duplicates": 0, "invalid": 0,
+                       "written": 0, "commits": 0, "failed_commits": 0}
+        self._last_error: Optional[str] = None
+        self._last_flush_at: Optional[float] = None
+
+    # ── Lifecycle ───────────────────────────────────────
+
+    def start(self):
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="aggregator-flush")
+        self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            self._running = False
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+
+    # ── Ingest ──────────────────────────────────────────
+
+    def ingest(self, events: list, scans: list = ()) -> dict:
+        """Merge a batch of confirmation events and end-of-session scan
+        reports ({"date", "session", "room", "sessions", "passes", "faces",
+        "embeddings", "duration_s", "stop_reason"}); return counts.  A scan
+        report whose session id was already seen (a retried POST) is
+        counted as a duplicate and not summed again."""
+        now = time.time()
+        accepted = duplicates = invalid = 0
+        with self._lock:
+            for ev in events:
+                if not isinstance(ev, dict):
+                    invalid += 1
+                    continue
+                roll = str(ev.get("rollNo") or "").strip()
+                date = str(ev.get("date") or "").strip()
+                room = str(ev.get("room") or "unknown").strip()
+                try:
+                    ts = float(ev.get("ts") or now)
+                    distance = float(ev["distance"]) if ev.get("distance") is not None else None
+                except (TypeError, ValueError):
+                    invalid += 1
+                    continue
+                if not roll or not DATE_RE.match(date):
+                    invalid += 1
+                    continue
+
+                node = self._rooms.setdefault(room, {"events": 0, "duplicates": 0,
+                                                     "last_contact": None})
+                node["events"] += 1
+                node["last_contact"] = now
+
+                records = self._dates.setdefault(date, {})
+                rec = records.get(roll)
+                if rec is not None:
+                    duplicates += 1
+                    node["duplicates"] += 1
+                    if room not in rec["rooms"]:
+                        rec["rooms"].append(room)
+                    continue
+                rec = {
+                    "date":        date,
+                    "rollNo":      roll,
+                    "name":        str(ev.get("name") or roll),
+                    "room":        room,
+                    "rooms":       [room],
+                    "camera":      ev.get("camera"),
+                    "ts":          ts,
+                    "received_at": now,
+                    "distance":    distance,
+                }
+                records[roll] = rec
+                self._pending[(date, roll)] = rec
+                accepted += 1
+
+            for sc in scans:
+                scan = _parse_scan(sc)
+                if scan is None:
+                    invalid += 1
+                    continue
+                seen = self._sessions.setdefault(scan["date"], set())
+                if scan["session"] in seen:
+                    duplicates += 1
+                    continue
+                seen.add(scan["session"])
+                self._add_scan_locked(self._scans, scan)
+                self._add_scan_locked(self._scan_totals, scan)
+
+            for old in sorted(self._dates)[:-self.keep_days]:
+                del self._dates[old]
+            for old in sorted(self._scan_totals)[:-self.keep_days]:
+                del self._scan_totals[old]
+            for old in sorted(self._sessions)[:-self.keep_days]:
+                del self._sessions[old]
+            self._stats["received"] += len(events)
+            self._stats["accepted"] += accepted
+            self._stats["duplicates"] += duplicates
+            self._stats["invalid"] += invalid
+            backlog = len(self._pending)
+
+        _M_EVENTS.inc(accepted, result="accepted")
+        _M_EVENTS.inc(duplicates, result="duplicate")
+        _M_EVENTS.inc(invalid, result="invalid")
+        if backlog >= self.max_batch:
+            self._wake.set()
+        return {"accepted": accepted, "duplicates": duplicates, "invalid": invalid}
+
+    @staticmethod
+    def _add_scan_locked(into: dict, scan: dict):
+        cur = into.setdefault(scan["date"], {"date": scan["date"],
+                                             **{k: 0 for k in _SCAN_COUNTERS}})
+        for k in _SCAN_COUNTERS:
+            cur[k] += scan[k]
+        cur["room"] = scan["room"]
+        cur["stop_reason"] = scan["stop_reason"]
+
+    # ── Writes ──────────────────────────────────────────
+
+    def flush(self) -> int:
+        """Write up to max_batch pending records, and the pending scan
+        counters; return how many records."""
+        with self._lock:
+            keys = list(self._pending)[:self.max_batch]
+            batch = [self._pending.pop(k) for k in keys]
+            scans = list(self._scans.values())
+            self._scans = {}
+        if not batch and not scans:
+            return 0
+        t0 = time.perf_counter()
+        try:
+            self._writer([dict(rec) for rec in batch], scans)
+        except Exception as exc:
+            _M_COMMITS.inc(result="error")
+            logger.error("[Aggregator] Commit of %d records failed, will retry: %s",
+                         len(batch), exc)
+            with self._lock:
+                for rec in batch:
+                    self._pending.setdefault((rec["date"], rec["rollNo"]), rec)
+                for scan in scans:
+                    self._add_scan_locked(self._scans, scan)
+                self._stats["failed_commits"] += 1
+                self._last_error = str(exc)
+            return 0
+        finally:
+            _M_COMMIT.observe(time.perf_counter() - t0)
+        _M_COMMITS.inc(result="ok")
+        with self._lock:
+            self._stats["written"] += len(batch)
+            self._stats["commits"] += 1
+            self._last_flush_at = time.time()
+        logger.info("[Aggregator] Wrote %d records%s in %.0f ms", len(batch),
+                    f" and {len(scans)} scan reports" if scans else "",
+                    (time.perf_counter() - t0) * 1000.0)
+        return len(batch)
+
+    def _loop(self):
+        while True:
+            self._wake.wait(self.flush_s)
+            self._wake.clear()
+            with self._lock:
+                if not self._running:
+                    return
+            while self.flush() >= self.max_batch:
+                pass
+
+    # ── Status ──────────────────────────────────────────
+
+    def _rooms_locked(self, now: float) -> dict:
+        return {room: {"events": n["events"], "duplicates": n["duplicates"],
+                       "last_contact_s": round(now - n["last_contact"], 1)
+                       if n["last_contact"] else None}
+                for room, n in sorted(self._rooms.items())}
+
+    def status(self, date: Optional[str] = None) -> dict:
+        now = time.time()
+        with self._lock:
+            out = {
+                "rooms":          self._rooms_locked(now),
+                "pending_writes": len(self._pending),
+                "stats":          dict(self._stats),
+                "last_error":     self._last_error,
+                "last_flush_s":   round(now - self._last_flush_at, 1)
+                if self._last_flush_at else None,
+            }
+            if date is None:
+                out["dates"] = {d: len(recs) for d, recs in sorted(self._dates.items())}
+                return out
+            records = sorted(self._dates.get(date, {}).values(), key=lambda r: r["ts"])
+            by_room: dict[str, int] = {}
+            for rec in records:
+                by_room[rec["room"]] = by_room.get(rec["room"], 0) + 1
+            out.update({
+                "date":    date,
+                "present": len(records),
+                "by_room": by_room,
+                "scan":    dict(self._scan_totals[date]) if date in self._scan_totals else None,
+                "records": [{k: rec[k] for k in ("rollNo", "name", "room", "rooms",
+                                                 "camera", "ts", "distance")}
+                            for rec in records],
+            })
+            return out
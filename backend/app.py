@@ -1,22 +1,28 @@
-import json
+import gzip
 import logging
 import os
 import time
 import uuid
-from datetime import datetime, timezone
+from datetime import datetime
 from threading import Lock, Thread
 
-import ntplib
 import pytz
 
 from apscheduler.schedulers.background import BackgroundScheduler
-from flask import Flask, jsonify, request, Response
+from flask import Flask, g, jsonify, request, Response
 from flask_cors import CORS
 from gpiozero import Button, Device, OutputDevice
 from gpiozero.pins.mock import MockFactory
 from gpiozero.exc import BadPinFactory
 
-from devices import devices, switch_pins
+import http_server
+import metrics
+import profiler
+from devices import devices, inrush_devices, scenes, switch_pins
+from relay_controller import RelayController, RelayWriteError
+from schedule_engine import ScheduleEngine
+from schedule_store import ScheduleStore
+from timesource import Clock, NTPSource
 
 # ── Slider motor (runs during attendance scan) ────────────────────────────────
 try:
@@ -28,16 +34,14 @@ except Exception as _sl_err:
     logging.getLogger("smart-switch").warning("slider_motor unavailable: %s", _sl_err)
 
 # ── Face-detection engine (optional — disabled on machines without camera/TF) ──
-try:
-    from model.face_engine import engine as face_engine, load_students
-    _FACE_ENGINE_OK = True
-except Exception as _fe_err:
-    face_engine   = None
-    load_students = None
-    _FACE_ENGINE_OK = False
-    logging.getLogger("smart-switch").warning(
-        "face_engine unavailable: %s", _fe_err
-    )
+# Importing model.face_engine pulls in cv2, DeepFace/TensorFlow and Firestore,
+# which takes many seconds on a Pi.  It is loaded by a background thread
+# (_load_face_engine, started once GPIO and the scheduler are up) so relay
+# control is available immediately after boot.
+face_engine = None
+_FACE_ENGINE_OK = False
+_face_engine_state = "initializing"     # initializing | ready | unavailable
+_face_engine_error = None
 
 # ── App setup ────────────────────────────────────────────
 
@@ -64,48 +68,38 @@ logging.basicConfig(
 logger = logging.getLogger("smart-switch")
 
 SCHEDULES_FILE = os.path.join(os.path.dirname(__file__), "schedules.json")
-schedules_lock = Lock()
 
 # ── NTP time sync ────────────────────────────────────────
 #
 # Raspberry Pi has no hardware RTC. Without internet on first boot the
 # system clock is wrong, which breaks all schedules.
-# We fetch the true time from NTP servers, compute the offset between
-# NTP and the local clock, and apply that offset in ntp_now().
-# This never requires root and works even without 'timedatectl'.
+# timesource.Clock pins the true time (from NTP, or the persisted last
+# known good time when offline) to the monotonic clock and applies it in
+# ntp_now().  This never requires root and works even without 'timedatectl'.
+# Clock steps are reported to listeners (relay reconciliation, schedule
+# engine) — see _on_clock_step below.
 
 TIMEZONE    = pytz.timezone(os.getenv("TZ", "Asia/Kolkata"))  # change via TZ env var
-_ntp_offset = 0.0          # seconds: ntp_utc - local_utc
-_ntp_lock   = Lock()
-NTP_SERVERS = ["pool.ntp.org", "time.google.com", "time.cloudflare.com"]
+NTP_SERVERS = [s.strip() for s in
+               os.getenv("NTP_SERVERS", "pool.ntp.org,time.google.com,time.cloudflare.com")
+               .split(",") if s.strip()]
+TIME_STATE_FILE = os.path.join(os.path.dirname(__file__), "time_state.json")
+
+clock = Clock(TIMEZONE, [NTPSource(NTP_SERVERS, timeout_s=3.0)],
+              state_path=TIME_STATE_FILE,
+              step_s=float(os.getenv("CLOCK_STEP_S", "2.0")))
 
 def sync_ntp():
-    """Query NTP and update _ntp_offset. Safe to call from any thread."""
-    global _ntp_offset
-    c = ntplib.NTPClient()
-    for server in NTP_SERVERS:
-        try:
-            resp = c.request(server, version=3, timeout=3)
-            offset = resp.offset          # how many seconds NTP is ahead of us
-            with _ntp_lock:
-                _ntp_offset = offset
-            logger.info("[NTP] Synced with %s  offset=%.3fs  true_time=%s",
-                        server,
-                        offset,
-                        datetime.fromtimestamp(resp.tx_time, tz=timezone.utc)
-                            .astimezone(TIMEZONE)
-                            .strftime("%Y-%m-%d %H:%M:%S %Z"))
-            return True
-        except Exception as exc:
-            logger.warning("[NTP] %s unreachable: %s", server, exc)
-    logger.warning("[NTP] All servers failed — using system clock (offset unchanged)")
-    return False
+    """Query NTP and update the clock. Safe to call from any thread."""
+    return clock.sync()
+
+def _retry_ntp():
+    if clock.source != "ntp":
+        sync_ntp()
 
 def ntp_now() -> datetime:
-    """Return the current local time corrected by the last NTP offset."""
-    with _ntp_lock:
-        offset = _ntp_offset
-    return datetime.fromtimestamp(time.time() + offset, tz=TIMEZONE)
+    """Return the current local time corrected by the last NTP sync."""
+    return clock.now()
 
 # Run initial NTP sync in a background thread so startup isn't blocked
 Thread(target=sync_ntp, daemon=True, name="ntp-init").start()
@@ -187,11 +181,35 @@ STUDENTS = [
     {"rollNo": "LE03",    "name": "ABDHUL KAREEM L"},
 ]
 
-if _FACE_ENGINE_OK and load_students:
+def _on_scan_ended(reason):
+    """Stop the slider whenever a scan ends — including early stops when the
+    roster is complete or confirmations plateau."""
+    if _SLIDER_OK and _slider is not None and _slider.running:
+        _slider.stop()
+        logger.info("[Slider] stopped with scan (%s)", reason)
+
+def _load_face_engine():
+    """Import and wire up the face engine off the main thread."""
+    global face_engine, _FACE_ENGINE_OK, _face_engine_state, _face_engine_error
+    t0 = time.monotonic()
+    try:
+        from model.face_engine import engine, load_students
+    except Exception as exc:
+        _face_engine_error = str(exc)
+        _face_engine_state = "unavailable"
+        logger.warning("face_engine unavailable: %s", exc)
+        return
     try:
         load_students(STUDENTS)
     except Exception as _ls_err:
         logger.warning("load_students failed: %s", _ls_err)
+    engine.add_session_end_listener(_on_scan_ended)
+    if _SLIDER_OK and _slider is not None:
+        engine.set_position_source(lambda: _slider.position)
+    face_engine = engine
+    _FACE_ENGINE_OK = True
+    _face_engine_state = "ready"
+    logger.info("[FaceEngine] loaded in %.1fs", time.monotonic() - t0)
 
 # ── GPIO setup ───────────────────────────────────────────
 
@@ -218,36 +236,36 @@ def create_relays():
 setup_pin_factory()
 relays = create_relays()
 
+# All relay writes go through the controller: change-only, batched, fans
+# staggered — see relay_controller.py.
+relay_ctl = RelayController(relays, inrush=inrush_devices,
+                            stagger_s=float(os.getenv("RELAY_STAGGER_S", "0.3")))
+
 # ── Physical switch (push-button) setup ─────────────────
 #
 # Each push button is wired between its GPIO input pin and GND.
 # The internal pull-up resistor keeps the pin HIGH when idle.
 # Pressing the button pulls it LOW → gpiozero fires when_pressed.
-# The callback simply toggles whichever relay the button controls.
-# Because /states always reads live relay state, the next frontend
-# poll (every 1 s) will automatically reflect the physical change.
+# The callback toggles whichever relay the button controls (via relay_ctl).
+# /states returns relay_ctl's tracked state, which every write — buttons
+# included — updates, so the next frontend poll (every 1 s) reflects it.
 
-def _make_toggle(relay, name):
+def _make_toggle(name):
     """Return a thread-safe closure that toggles one relay."""
     def _toggle():
-        if relay.is_active:
-            relay.off()
-            logger.info("[Physical Switch] OFF  %s", name)
-        else:
-            relay.on()
-            logger.info("[Physical Switch] ON   %s", name)
+        on = relay_ctl.toggle(name, source="button")
+        logger.info("[Physical Switch] %s %s", "ON  " if on else "OFF ", name)
     return _toggle
 
 def create_buttons():
     buttons = {}
     for name, pin in switch_pins.items():
-        relay = relays.get(name)
-        if relay is None:
+        if name not in relay_ctl:
             logger.warning("No relay found for switch '%s' (pin %s)", name, pin)
             continue
         try:
             btn = Button(pin, pull_up=True, bounce_time=0.05)
-            btn.when_pressed = _make_toggle(relay, name)
+            btn.when_pressed = _make_toggle(name)
             buttons[name] = btn
             logger.info("Physical switch '%s' listening on GPIO %s", name, pin)
         except Exception as exc:
@@ -257,68 +275,186 @@ def create_buttons():
 buttons = create_buttons()
 
 # ── Schedule persistence ─────────────────────────────────
+# Loaded once; CRUD routes mutate the in-memory list and the store persists
+# each change atomically.  The schedule engine never touches the SD card.
 
-def load_schedules():
-    if not os.path.exists(SCHEDULES_FILE):
-        return []
-    try:
-        with open(SCHEDULES_FILE, "r") as f:
-            return json.load(f)
-    except Exception:
-        return []
-
-def save_schedules(schedules):
-    with open(SCHEDULES_FILE, "w") as f:
-        json.dump(schedules, f, indent=2)
+schedule_store = ScheduleStore(SCHEDULES_FILE)
 
 # ── Scheduler logic ──────────────────────────────────────
+# Each schedule edge (on_time / off_time) is indexed by ScheduleEngine and
+# fired exactly once at its NTP-corrected time; see schedule_engine.py.
 
-def run_schedules():
-    """Called every minute by APScheduler. Uses NTP-corrected time."""
-    now = ntp_now()
-    current_time = now.strftime("%H:%M")
-    current_day  = now.weekday()  # 0=Mon … 6=Sun
+SCHEDULE_GRACE_S = float(os.getenv("SCHEDULE_GRACE_S", "120"))
 
-    with schedules_lock:
-        schedules = load_schedules()
-
-    for sched in schedules:
-        if not sched.get("enabled", True):
-            continue
-        if current_day not in sched.get("days", list(range(7))):
-            continue
-
-        for device in sched.get("devices", []):
-            relay = relays.get(device)
-            if relay is None:
-                continue
-            if sched.get("on_time") == current_time:
-                relay.on()
-                logger.info("[Scheduler] ON  %s (schedule: %s)", device, sched.get("label"))
-            if sched.get("off_time") == current_time:
-                relay.off()
-                logger.info("[Scheduler] OFF %s (schedule: %s)", device, sched.get("label"))
-
-        # ── Auto-start camera attendance if schedule has attendance=True ──
-        if sched.get("attendance") and sched.get("on_time") == current_time:
-            if _FACE_ENGINE_OK and face_engine:
-                date_str = now.strftime("%Y-%m-%d")
-                result   = face_engine.start(session_date=date_str)
-                logger.info("[Scheduler] Auto-start camera for %s: %s",
-                            sched.get("label"), result)
-
-        if sched.get("attendance") and sched.get("off_time") == current_time:
-            if _FACE_ENGINE_OK and face_engine:
-                result = face_engine.stop()
-                logger.info("[Scheduler] Auto-stop camera for %s: %s",
-                            sched.get("label"), result)
+def fire_schedule(sched, action, when):
+    """Apply one schedule edge. Called by the schedule engine thread."""
+    # One batch; devices already in state (e.g. reconciled) are not written
+    try:
+        changed = relay_ctl.apply({d: action == "on" for d in sched.get("devices", [])},
+                                  source=f"schedule {sched.get('label')}")
+    except RelayWriteError as exc:
+        # Still start/stop the camera below; the failed relays are logged
+        logger.error("[Scheduler] %s of %s: %s", action.upper(), sched.get("label"), exc)
+        changed = exc.changed
+    if changed:
+        logger.info("[Scheduler] %-3s %s (schedule: %s)", action.upper(),
+                    ", ".join(changed), sched.get("label"))
+
+    # ── Auto-start camera attendance if schedule has attendance=True ──
+    if not sched.get("attendance"):
+        return
+    if action == "on":
+        if _FACE_ENGINE_OK and face_engine:
+            date_str = when.strftime("%Y-%m-%d")
+            result   = face_engine.start(session_date=date_str)
+            logger.info("[Scheduler] Auto-start camera for %s: %s",
+                        sched.get("label"), result)
+        else:
+            logger.warning("[Scheduler] Auto-start camera for %s skipped: %s",
+                           sched.get("label"), _engine_unavailable_reason())
+    elif _FACE_ENGINE_OK and face_engine:
+        result = face_engine.stop()
+        logger.info("[Scheduler] Auto-stop camera for %s: %s",
+                    sched.get("label"), result)
+
+schedule_engine = ScheduleEngine(schedule_store, ntp_now, TIMEZONE, fire_schedule,
+                                 grace_s=SCHEDULE_GRACE_S)
+
+# ── Relay reconciliation ─────────────────────────────────
+# Relays boot off and edges only act at their exact minute, so after a
+# reboot mid-class (or an NTP correction that jumps over an edge) the
+# desired state is recomputed from the schedule index and only the
+# differing relays are switched.
+
+_reconcile_lock = Lock()
+_last_reconcile = {}
+
+def reconcile_relays(reason, since=None):
+    """Drive every scheduled relay to the state of its most recent edge.
+
+    With `since` (the clock reading before an NTP correction) only devices
+    whose desired state differs between `since` and now are touched, so a
+    manual override made in the meantime survives the correction.
+    """
+    global _last_reconcile
+    with _reconcile_lock:
+        now  = ntp_now()
+        want = schedule_engine.desired_states(now)
+        if since is not None:
+            before = schedule_engine.desired_states(since)
+            want = {d: v for d, v in want.items()
+                    if before.get(d, (None,))[0] != v[0]}
+
+        failed = {}
+        try:
+            changed = relay_ctl.apply({d: v[0] == "on" for d, v in want.items()},
+                                      source=f"reconcile {reason}")
+        except RelayWriteError as exc:
+            changed, failed = exc.changed, exc.failed
+        applied = [{"device": d, "state": want[d][0], "schedule": want[d][1].get("label"),
+                    "edge": want[d][2].strftime("%Y-%m-%d %H:%M")}
+                   for d in sorted(changed)]
+        _last_reconcile = {"reason": reason, "at": now.isoformat(),
+                           "checked": len(want), "applied": applied,
+                           "failed": {d: str(e) for d, e in sorted(failed.items())}}
+    if failed:
+        logger.error("[Reconcile] %s: could not switch %s", reason, ", ".join(sorted(failed)))
+    if applied:
+        logger.info("[Reconcile] %s: %s", reason,
+                    ", ".join(f"{c['device']}={c['state']} ({c['schedule']} @ {c['edge']})"
+                              for c in applied))
+    elif not failed:
+        logger.info("[Reconcile] %s: no changes (%d scheduled devices checked)",
+                    reason, len(want))
+    return applied
+
+def _on_clock_step(before, after):
+    schedule_engine.clock_stepped(before, after)
+    reconcile_relays("clock-step", since=before)
+
+clock.add_listener(_on_clock_step)
+reconcile_relays("startup")
+schedule_engine.start()
 
 scheduler = BackgroundScheduler(timezone=TIMEZONE)
-scheduler.add_job(run_schedules, "cron", minute="*")          # every minute
 scheduler.add_job(sync_ntp,      "cron", hour="*", minute=0)  # re-sync every hour
+scheduler.add_job(clock.check_step, "interval", seconds=30)   # step detection + persist
+scheduler.add_job(_retry_ntp,     "interval", minutes=5)      # retry sooner while offline
 scheduler.start()
 logger.info("Scheduler started (timezone: %s)", TIMEZONE)
 
+Thread(target=_load_face_engine, daemon=True, name="face-engine-init").start()
+
+# ── Request metrics ──────────────────────────────────────
+
+_M_HTTP = metrics.histogram("http_request_duration_seconds",
+                            "Flask handler latency (streams: time to first byte)",
+                            ("method", "route", "status"))
+
+@app.before_request
+def _start_timer():
+    g.t0 = time.perf_counter()
+
+@app.after_request
+def _observe_request(response):
+    t0 = g.pop("t0", None)
+    if t0 is not None:
+        # Route template, not the raw path, to keep label cardinality bounded
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        _M_HTTP.observe(time.perf_counter() - t0, method=request.method,
+                        route=route, status=response.status_code)
+    return response
+
+# ── Response compression ─────────────────────────────────
+# Schedules, camera status and /metrics are repetitive JSON/text; gzip them
+# for phones on the classroom Wi-Fi.  Small bodies and streams are left alone.
+
+GZIP_MIN_BYTES = int(os.getenv("HTTP_GZIP_MIN_BYTES", "1024"))
+_GZIP_TYPES    = ("application/json", "text/plain")
+
+@app.after_request
+def _compress(response):
+    if (response.direct_passthrough or response.is_streamed
+            or response.mimetype not in _GZIP_TYPES
+            or "Content-Encoding" in response.headers
+            or "gzip" not in request.headers.get("Accept-Encoding", "")):
+        return response
+    body = response.get_data()
+    if len(body) < GZIP_MIN_BYTES:
+        return response
+    response.set_data(gzip.compress(body, compresslevel=5))
+    response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    return response
+
+@app.route("/metrics")
+def metrics_endpoint():
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+# ── Sampling profiler (field debugging) ──────────────────
+
+ENABLE_PROFILER = os.getenv("ENABLE_PROFILER", "0") == "1"
+
+@app.route("/debug/profile")
+def debug_profile():
+    """Sample all threads for ?seconds=N (default 10, max 60) at ?hz=
+    (default 100) and return collapsed stacks for a flame graph."""
+    if not ENABLE_PROFILER:
+        return jsonify({"error": "Not found"}), 404
+    try:
+        seconds = float(request.args.get("seconds", 10))
+        hz      = float(request.args.get("hz", 100))
+    except ValueError:
+        return jsonify({"error": "seconds and hz must be numbers"}), 400
+    try:
+        body = profiler.profile(seconds, hz)
+    except RuntimeError as exc:
+        return jsonify({"error": str(exc)}), 409
+    logger.info("[Profiler] %.1fs profile served (%d stacks)", seconds, body.count("\n"))
+    name = f"profile-{ntp_now().strftime('%Y%m%d-%H%M%S')}.collapsed"
+    return Response(body, mimetype="text/plain",
+                    headers={"Content-Disposition": f"attachment; filename={name}"})
+
 # ── Routes ───────────────────────────────────────────────
 
 @app.route("/")
@@ -330,26 +466,35 @@ def index():
             "devices": "/devices",
             "states": "/states",
             "control": "/control/<device>/<state>",
-            "schedules": "/schedules"
+            "scenes": "/scenes",
+            "schedules": "/schedules",
+            "metrics": "/metrics"
         }
     })
 
 @app.route("/status")
 def status():
-    return jsonify({"status": "Smart Switch Running"})
+    return jsonify({
+        "status":    "Smart Switch Running",
+        "scheduler": schedule_engine.get_stats(),
+        "reconcile": _last_reconcile,
+        "streams":   stream_slots.stats(),
+    })
 
 @app.route("/time")
 def server_time():
     """Return the NTP-corrected server time so the frontend can display it."""
-    now = ntp_now()
-    with _ntp_lock:
-        offset = _ntp_offset
+    now  = ntp_now()
+    info = clock.info()
     return jsonify({
         "time":     now.strftime("%H:%M:%S"),
         "date":     now.strftime("%Y-%m-%d"),
         "timezone": str(TIMEZONE),
-        "ntp_offset_s": round(offset, 3),
-        "ntp_synced":   abs(offset) < 600,   # consider synced if offset < 10 min
+        "ntp_offset_s": info["offset_s"],
+        "ntp_synced":   info["source"] == "ntp",
+        "ntp_server":   info.get("server"),
+        "ntp_delay_ms": info.get("delay_ms"),
+        "time_source":  info["source"],      # ntp | persisted | system
     })
 
 @app.route("/devices")
@@ -359,32 +504,47 @@ def list_devices():
 @app.route("/states")
 def get_states():
     """Return current on/off state of every relay (reflects physical switch changes too)."""
-    return jsonify({
-        name: relay.is_active
-        for name, relay in relays.items()
-    })
+    return jsonify(relay_ctl.states())
 
 @app.route("/control/<device>/<state>")
 def control(device, state):
-    relay = relays.get(device)
-    if relay is None:
+    if device not in relay_ctl:
         return jsonify({"error": "Invalid device"}), 404
     if state not in {"on", "off"}:
         return jsonify({"error": "Invalid state"}), 400
     try:
-        relay.on() if state == "on" else relay.off()
-        logger.info("Set %s to %s", device, state)
+        relay_ctl.set(device, state == "on", source="api")
     except Exception as exc:
         logger.error("Failed to set %s to %s: %s", device, state, exc)
         return jsonify({"error": "Hardware control failed"}), 500
-    return jsonify({"device": device, "state": state, "is_active": relay.is_active})
+    return jsonify({"device": device, "state": state, "is_active": relays[device].is_active})
+
+# ── Scenes ───────────────────────────────────────────────
+
+@app.route("/scenes", methods=["GET"])
+def list_scenes():
+    return jsonify(scenes)
+
+@app.route("/scenes/<name>", methods=["POST"])
+def apply_scene(name):
+    scene = scenes.get(name)
+    if scene is None:
+        return jsonify({"error": "Not found"}), 404
+    try:
+        changed = relay_ctl.apply({d: s == "on" for d, s in scene.items()},
+                                  source=f"scene {name}")
+    except RelayWriteError as exc:
+        logger.error("Scene %s: %s", name, exc)
+        return jsonify({"error": "Hardware control failed", "scene": name,
+                        "changed": exc.changed, "failed": sorted(exc.failed),
+                        "states": relay_ctl.states()}), 500
+    return jsonify({"scene": name, "changed": changed, "states": relay_ctl.states()})
 
 # ── Schedule CRUD ────────────────────────────────────────
 
 @app.route("/schedules", methods=["GET"])
 def get_schedules():
-    with schedules_lock:
-        return jsonify(load_schedules())
+    return jsonify(schedule_store.all())
 
 @app.route("/schedules", methods=["POST"])
 def create_schedule():
@@ -404,35 +564,40 @@ def create_schedule():
         "attendance": data.get("attendance", False),  # auto-start camera when True
     }
 
-    with schedules_lock:
-        schedules = load_schedules()
-        schedules.append(schedule)
-        save_schedules(schedules)
+    schedule_store.add(schedule)
 
     logger.info("Created schedule: %s", schedule["label"])
     return jsonify(schedule), 201
 
 @app.route("/schedules/<sched_id>", methods=["DELETE"])
 def delete_schedule(sched_id):
-    with schedules_lock:
-        schedules = load_schedules()
-        new = [s for s in schedules if s["id"] != sched_id]
-        if len(new) == len(schedules):
-            return jsonify({"error": "Not found"}), 404
-        save_schedules(new)
+    if not schedule_store.remove(sched_id):
+        return jsonify({"error": "Not found"}), 404
     logger.info("Deleted schedule %s", sched_id)
     return jsonify({"deleted": sched_id})
 
 # ── Camera / Attendance routes ───────────────────────────────────────────────
 
+def _engine_unavailable_reason():
+    if _face_engine_state == "initializing":
+        return "face engine is still loading"
+    return "face_engine not available"
+
+
 @app.route("/attendance/camera", methods=["GET"])
 def camera_status():
     """Return current face-detection engine status."""
     if not _FACE_ENGINE_OK or face_engine is None:
-        return jsonify({"available": False,
-                        "reason": "face_engine not available on this server"})
+        if _face_engine_state == "initializing":
+            return jsonify({"available": False, "state": "initializing",
+                            "reason": "face engine is still loading"})
+        return jsonify({"available": False, "state": "unavailable",
+                        "reason": "face_engine not available on this server",
+                        "error": _face_engine_error})
     status = face_engine.get_status()
     status["available"] = True
+    if _SLIDER_OK and _slider is not None:
+        status["slider"] = _slider.get_status()
     return jsonify(status)
 
 
@@ -440,7 +605,7 @@ def camera_status():
 def camera_start():
     """Manually start a face-detection session for the given date (or today)."""
     if not _FACE_ENGINE_OK or face_engine is None:
-        return jsonify({"ok": False, "reason": "face_engine not available"}), 503
+        return jsonify({"ok": False, "reason": _engine_unavailable_reason()}), 503
 
     data = request.get_json(force=True, silent=True) or {}
     date_str = data.get("date") or ntp_now().strftime("%Y-%m-%d")
@@ -459,7 +624,7 @@ def camera_start():
 def camera_stop():
     """Stop the running face-detection session."""
     if not _FACE_ENGINE_OK or face_engine is None:
-        return jsonify({"ok": False, "reason": "face_engine not available"}), 503
+        return jsonify({"ok": False, "reason": _engine_unavailable_reason()}), 503
     result = face_engine.stop()
 
     # Stop slider motor alongside the camera scan
@@ -472,10 +637,14 @@ def camera_stop():
 
 @app.route("/attendance/camera/frame", methods=["GET"])
 def camera_frame():
-    """Return the latest annotated JPEG frame from the face-detection engine."""
+    """Return the latest annotated JPEG frame from the face-detection engine
+    (?cam=<id> picks a camera, default the first)."""
     if not _FACE_ENGINE_OK or face_engine is None:
         return ("", 204)
-    jpeg = face_engine.get_frame()
+    cam = request.args.get("cam")
+    if cam is not None and cam not in face_engine.camera_ids():
+        return jsonify({"error": f"Unknown camera: {cam}"}), 404
+    jpeg = face_engine.get_frame(cam)
     if jpeg is None:
         return ("", 204)
     return Response(
@@ -488,6 +657,17 @@ def camera_frame():
     )
 
 
+# ── Stream viewers ───────────────────────────────────────
+# Each MJPEG viewer holds one server thread (see http_server); at most
+# HTTP_STREAM_WORKERS watch at once and the next one gets 503.
+
+stream_slots = http_server.StreamSlots(int(os.getenv("HTTP_STREAM_WORKERS", "4")))
+
+metrics.gauge("http_stream_viewers", "MJPEG stream viewers connected",
+              fn=lambda: stream_slots.stats()["active"])
+metrics.gauge("http_stream_rejected", "MJPEG viewers turned away (all slots in use) since start",
+              fn=lambda: stream_slots.stats()["rejected"])
+
 @app.route("/attendance/camera/stream", methods=["GET"])
 def camera_stream():
     """MJPEG stream of annotated camera frames.
@@ -496,16 +676,33 @@ def camera_stream():
     pushes each new JPEG as a multipart chunk.  This eliminates per-frame
     TCP connection overhead and allows the browser to display frames at full
     server output rate (~20-30 fps on a Pi 5) with no JavaScript polling.
+    With several cameras, ?cam=<id> selects one (default the first).
     """
     if not _FACE_ENGINE_OK or face_engine is None:
         return ("", 204)
+    cam = request.args.get("cam")
+    if cam is not None and cam not in face_engine.camera_ids():
+        return jsonify({"error": f"Unknown camera: {cam}"}), 404
+    # Each viewer holds a server thread; past the limit new viewers get 503
+    # so relay control always has threads left.
+    if not stream_slots.acquire():
+        logger.warning("[HTTP] %d stream viewers already – rejected %s",
+                       stream_slots.limit, request.remote_addr)
+        return jsonify({"error": "Too many stream viewers"}), 503, {"Retry-After": "2"}
 
     def _generate():
         last_jpeg = None
+        last_sent = time.monotonic()
         while True:
-            jpeg = face_engine.get_frame()
-            if jpeg is not None and jpeg is not last_jpeg:
+            jpeg = face_engine.get_frame(cam)
+            now = time.monotonic()
+            if jpeg is None and now - last_sent > 10.0:
+                return                  # no camera output: end, don't pin a worker
+            # Re-send an unchanged frame now and then so a viewer that went
+            # away is noticed (write fails) and its stream worker is freed.
+            if jpeg is not None and (jpeg is not last_jpeg or now - last_sent > 2.0):
                 last_jpeg = jpeg
+                last_sent = now
                 yield (
                     b"--frame\r\n"
                     b"Content-Type: image/jpeg\r\n\r\n"
@@ -515,32 +712,42 @@ def camera_stream():
             else:
                 time.sleep(0.025)   # ~40 fps cap; back off when no new frame
 
-    return Response(
+    resp = Response(
         _generate(),
         mimetype="multipart/x-mixed-replace; boundary=frame",
         headers={"Cache-Control": "no-store"},
     )
+    resp.call_on_close(stream_slots.release)
+    return resp
 
 
 @app.route("/schedules/<sched_id>/toggle", methods=["PATCH"])
 def toggle_schedule(sched_id):
-    with schedules_lock:
-        schedules = load_schedules()
-        for s in schedules:
-            if s["id"] == sched_id:
-                s["enabled"] = not s.get("enabled", True)
-                save_schedules(schedules)
-                logger.info("Toggled schedule %s -> enabled=%s", sched_id, s["enabled"])
-                return jsonify(s)
-    return jsonify({"error": "Not found"}), 404
+    s = schedule_store.toggle(sched_id)
+    if s is None:
+        return jsonify({"error": "Not found"}), 404
+    logger.info("Toggled schedule %s -> enabled=%s", sched_id, s["enabled"])
+    return jsonify(s)
 
 # ── Entry point ──────────────────────────────────────────
 
 if __name__ == "__main__":
+    host = os.getenv("FLASK_HOST", "0.0.0.0")
+    port = int(os.getenv("FLASK_PORT", "8000"))
     try:
-        app.run(host="0.0.0.0", port=8000, debug=False, use_reloader=False)
+        http_server.serve(
+            app, host, port,
+            workers=int(os.getenv("HTTP_WORKERS", "8")),
+            stream_workers=stream_slots.limit,
+            keepalive_s=float(os.getenv("HTTP_KEEPALIVE_S", "15")),
+            connection_limit=int(os.getenv("HTTP_CONNECTION_LIMIT", "100")),
+            dev=os.getenv("HTTP_SERVER", "waitress") == "dev",
+        )
     finally:
         scheduler.shutdown()
+        schedule_engine.stop()
+        if _FACE_ENGINE_OK and face_engine is not None:
+            face_engine.shutdown()
         for btn in buttons.values():
             btn.close()
         if _SLIDER_OK and _slider is not None:
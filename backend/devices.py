@@ -22,3 +22,19 @@ switch_pins = {
     "fan3":   21,
     "fan4":   26,
 }
+
+# Devices with a motor start-up (inrush) current. When several of them are
+# switched on together they are started RELAY_STAGGER_S apart.
+inrush_devices = {"fan1", "fan2", "fan3", "fan4"}
+
+# Scenes: named device states applied in one batch via POST /scenes/<name>.
+# Devices not listed in a scene keep their current state.
+_lights = ("light1", "light2", "light3", "light4")
+_fans   = ("fan1", "fan2", "fan3", "fan4")
+
+scenes = {
+    "class":        {**{d: "on" for d in _lights}, **{d: "on" for d in _fans}},
+    "lights":       {d: "on" for d in _lights},
+    "presentation": {"light1": "off", "light2": "off", "light3": "on", "light4": "on"},
+    "all_off":      {d: "off" for d in devices},
+}
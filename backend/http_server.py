@@ -0,0 +1,80 @@
+"""
+http_server.py
+──────────────
+Runs the Flask app under waitress, a production threaded WSGI server.
+
+Werkzeug's development server (app.run) starts one unbounded thread per
+connection and closes the connection after every response, so each MJPEG
+viewer pins a thread and every 1 Hz /states poll pays a new TCP handshake.
+waitress keeps idle keep-alive connections in its event loop (no thread
+each) and runs requests on a fixed pool of threads.
+
+An MJPEG viewer holds a thread for as long as it watches, so the pool is
+sized workers + stream_workers and stream routes first take a StreamSlots
+slot: at most stream_workers viewers at a time, the next one gets 503.
+However many viewers connect, `workers` threads stay free for relay control
+and polling.
+
+HTTP_SERVER=dev (or waitress not installed) falls back to app.run.
+"""
+
+import logging
+import threading
+
+logger = logging.getLogger("smart-switch")
+
+try:
+    import waitress                                         # type: ignore
+    _WAITRESS_OK = True
+except ImportError:
+    _WAITRESS_OK = False
+
+
+class StreamSlots:
+    """Bounded number of concurrent streaming responses."""
+
+    def __init__(self, limit: int):
+        self.limit = max(1, int(limit))
+        self._sem = threading.BoundedSemaphore(self.limit)
+        self._lock = threading.Lock()
+        self._active = 0
+        self.rejected = 0
+
+    def acquire(self) -> bool:
+        """Take a slot without waiting; False when all are in use."""
+        if not self._sem.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            return False
+        with self._lock:
+            self._active += 1
+        return True
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+        self._sem.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"limit": self.limit, "active": self._active, "rejected": self.rejected}
+
+
+def serve(app, host: str = "0.0.0.0", port: int = 8000, workers: int = 8,
+          stream_workers: int = 0, keepalive_s: float = 15.0,
+          connection_limit: int = 100, dev: bool = False):
+    """Serve app until interrupted: waitress with workers + stream_workers
+    threads, or Werkzeug's threaded dev server when dev=True or waitress is
+    missing."""
+    if dev or not _WAITRESS_OK:
+        if not dev:
+            logger.warning("[HTTP] waitress not installed – using the Werkzeug dev server")
+        app.run(host=host, port=port, debug=False, use_reloader=False, threaded=True)
+        return
+    logger.info("[HTTP] Serving on http://%s:%d with waitress (workers=%d, stream workers=%d, "
+                "keep-alive %.0fs)", host, port, workers, stream_workers, keepalive_s)
+    waitress.serve(app, host=host, port=port,
+                   threads=workers + stream_workers,
+                   channel_timeout=keepalive_s,
+                   connection_limit=connection_limit,
+                   ident="smart-switch")
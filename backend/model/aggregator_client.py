@@ -0,0 +1,202 @@
+"""
+aggregator_client.py
+────────────────────
+Ships attendance confirmations from an edge node to the central aggregator
+(aggregator.py) instead of writing Firestore directly (AGGREGATOR_URL).
+
+  • send() only appends to a queue — the detect loop never waits on the
+    network
+  • a sender thread POSTs what is queued as one JSON batch (up to
+    _MAX_BATCH events), at most every flush_s, over a single keep-alive
+    connection
+  • a failed POST keeps the batch and retries with exponential backoff
+    (capped at max_backoff_s), so a flaky link or an aggregator restart
+    loses nothing; the aggregator dedupes retransmitted events by
+    (date, rollNo) and scan reports by their session id
+  • the queue is bounded; when it overflows the oldest events are dropped
+    and counted
+  • end-of-session scan reports (send_scan) share the queue and go in the
+    same POST as "scans"
+"""
+
+from __future__ import annotations
+
+import http.client
+import json
+import logging
+import threading
+import time
+from collections import deque
+from itertools import islice
+from typing import Optional
+from urllib.parse import urlparse
+
+import metrics
+
+logger = logging.getLogger("face_engine")
+
+_M_EVENTS = metrics.counter("aggregator_client_events_total",
+                            "Confirmation events shipped to the aggregator by result "
+                            "(sent/dropped)", ("result",))
+_M_POSTS  = metrics.counter("aggregator_client_posts_total",
+                            "POST /events requests by result", ("result",))
+
+_MAX_BATCH = 500          # events per POST (the aggregator accepts up to 1000)
+
+
+class AggregatorClient:
+    def __init__(self, url: str, room: str, flush_s: float = 0.5,
+                 timeout_s: float = 5.0, max_queue: int = 5000,
+                 max_backoff_s: float = 30.0):
+        u = urlparse(url if "://" in url else f"http://{url}")
+        self._https = u.scheme == "https"
+        self._host = u.hostname or "127.0.0.1"
+        self._port = u.port or (443 if self._https else 80)
+        self._path = (u.path.rstrip("/") or "") + "/events"
+        self.url = url
+        self.room = room
+        self.flush_s = flush_s
+        self.timeout_s = timeout_s
+        self.max_backoff_s = max_backoff_s
+
+        self._lock = threading.Lock()
+        self._queue: deque = deque(maxlen=max(1, max_queue))   # (seq, kind, payload)
+        self._seq = 0
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._conn: Optional[http.client.HTTPConnection] = None
+
+        self._sent = 0
+        self._dropped = 0
+        self._failures = 0
+        self._last_error: Optional[str] = None
+        self._last_ok_at: Optional[float] = None
+
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="aggregator-client")
+        self._thread.start()
+
+    def send(self, event: dict):
+        """Queue one confirmation event; the room is filled in."""
+        self._enqueue("events", event)
+
+    def send_scan(self, scan: dict):
+        """Queue one end-of-session scan report; the room is filled in.  It
+        must carry a unique "session" id so a retried POST is not summed
+        twice."""
+        self._enqueue("scans", scan)
+
+    def _enqueue(self, kind: str, payload: dict):
+        payload = dict(payload, room=self.room)
+        with self._lock:
+            if len(self._queue) == self._queue.maxlen:
+                self._dropped += 1
+                _M_EVENTS.inc(result="dropped")
+            self._seq += 1
+            self._queue.append((self._seq, kind, payload))
+        self._wake.set()
+
+    def flush(self, timeout_s: float = 3.0) -> bool:
+        """Wait until everything queued is delivered; False on timeout."""
+        deadline = time.monotonic() + timeout_s
+        self._wake.set()
+        while time.monotonic() < deadline:
+            with self._lock:
+                if not self._queue:
+                    return True
+            time.sleep(0.05)
+        return False
+
+    def stop(self, timeout_s: float = 3.0):
+        """Stop the sender after trying to deliver what is still queued."""
+        self._stopped.set()
+        self._wake.set()
+        self._thread.join(timeout=timeout_s)
+
+    # ── Sender ──────────────────────────────────────────
+
+    def _connection(self) -> http.client.HTTPConnection:
+        if self._conn is None:
+            cls = http.client.HTTPSConnection if self._https else http.client.HTTPConnection
+            self._conn = cls(self._host, self._port, timeout=self.timeout_s)
+        return self._conn
+
+    def _post(self, batch: dict) -> None:
+        body = json.dumps(batch).encode()
+        conn = self._connection()
+        try:
+            conn.request("POST", self._path, body=body,
+                         headers={"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            resp.read()
+        except Exception:
+            conn.close()
+            self._conn = None
+            raise
+        if resp.will_close:
+            conn.close()
+            self._conn = None
+        if resp.status >= 500:
+            raise RuntimeError(f"HTTP {resp.status}")
+        if resp.status != 200:
+            # 4xx will not get better on retry: drop the batch
+            logger.error("[Aggregator] %s rejected %d events: HTTP %d",
+                         self.url, len(batch["events"]), resp.status)
+
+    def _loop(self):
+        backoff = 0.0
+        while True:
+            if backoff:
+                self._stopped.wait(backoff)
+            elif not self._stopped.is_set():
+                self._wake.wait()
+                self._stopped.wait(self.flush_s)    # let a burst collect into one POST
+            self._wake.clear()
+            with self._lock:
+                queued = list(islice(self._queue, _MAX_BATCH))
+            if not queued:
+                if self._stopped.is_set():
+                    return
+                continue
+            last_seq = queued[-1][0]
+            batch = {"events": [], "scans": []}
+            for _, kind, payload in queued:
+                batch[kind].append(payload)
+            try:
+                self._post(batch)
+            except Exception as exc:
+                _M_POSTS.inc(result="error")
+                backoff = min(self.max_backoff_s, max(1.0, backoff * 2))
+                with self._lock:
+                    self._failures += 1
+                    self._last_error = str(exc)
+                logger.warning("[Aggregator] POST to %s failed (%d queued, retry in %.0fs): %s",
+                               self.url, len(queued), backoff, exc)
+                if self._stopped.is_set():
+                    return
+                continue
+            _M_POSTS.inc(result="ok")
+            _M_EVENTS.inc(len(queued), result="sent")
+            backoff = 0.0
+            with self._lock:
+                while self._queue and self._queue[0][0] <= last_seq:
+                    self._queue.popleft()
+                self._sent += len(queued)
+                self._last_ok_at = time.time()
+                if self._queue:
+                    self._wake.set()
+
+    # ── Status ──────────────────────────────────────────
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "url":        self.url,
+                "room":       self.room,
+                "queued":     len(self._queue),
+                "sent":       self._sent,
+                "dropped":    self._dropped,
+                "failures":   self._failures,
+                "last_error": self._last_error,
+                "last_ok_s":  round(time.time() - self._last_ok_at, 1)
+                if self._last_ok_at else None,
+            }
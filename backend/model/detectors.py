@@ -0,0 +1,258 @@
+"""
+detectors.py
+────────────
+Native face detectors that bypass DeepFace.extract_faces (CAM_NATIVE_DETECTOR).
+
+  • yunet – OpenCV's cv2.FaceDetectorYN (face_detection_yunet_2023mar.onnx,
+            ~230 KB) on the OpenCV DNN CPU backend; no extra dependency
+  • scrfd – InsightFace SCRFD (scrfd_500m / 2.5g / 10g ONNX) on ONNX Runtime
+
+One call returns boxes, confidence and 5-point landmarks, and the aligned
+crop is produced here, so a pass costs one detector forward instead of
+DeepFace's per-call model lookup, preprocessing and — on failure — a second
+full pass with the fallback backend.  Results use the same face_obj layout
+as DeepFace.extract_faces:
+
+    {"face": RGB float32 crop in [0, 1],
+     "facial_area": {x, y, w, h, left_eye, right_eye, nose, mouth_left, mouth_right},
+     "confidence": float}
+
+Alignment:
+  • deepface – rotate so the eyes are level and crop the detector box, like
+               DeepFace (align=True); embeddings stay comparable with the pkl
+               gallery, which was built through DeepFace
+  • arcface  – 5-point similarity transform onto the 112×112 ArcFace
+               template; more accurate, but re-enrol the gallery with it
+
+As in DeepFace, "left_eye" is the subject's left eye (image right).
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import threading
+
+import numpy as np
+
+logger = logging.getLogger("face_engine")
+
+try:
+    import cv2                          # type: ignore
+    _CV2_OK = True
+except ImportError:
+    _CV2_OK = False
+
+BACKENDS = ("yunet", "scrfd")
+
+# InsightFace ArcFace 112×112 reference landmarks (image-left eye first)
+_ARCFACE_DST = np.array([
+    [38.2946, 51.6963], [73.5318, 51.5014], [56.0252, 71.7366],
+    [41.5493, 92.3655], [70.7299, 92.2041],
+], dtype=np.float32)
+
+
+# ── Alignment ─────────────────────────────────────────────────────────────────
+
+def _align_deepface(img, box: tuple, pts: np.ndarray) -> np.ndarray:
+    x, y, w, h = box
+    (lx, ly), (rx, ry) = pts[0], pts[1]            # image-left, image-right eye
+    angle = math.degrees(math.atan2(ry - ly, rx - lx))
+    cx, cy = x + w / 2.0, y + h / 2.0
+    M = cv2.getRotationMatrix2D((cx, cy), angle, 1.0)
+    # Shift so the box lands at the origin of a w×h output
+    M[0, 2] -= x
+    M[1, 2] -= y
+    return cv2.warpAffine(img, M, (max(1, int(w)), max(1, int(h))),
+                          flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT)
+
+
+def _align_arcface(img, pts: np.ndarray) -> np.ndarray:
+    M, _ = cv2.estimateAffinePartial2D(pts.astype(np.float32), _ARCFACE_DST, method=cv2.LMEDS)
+    if M is None:
+        raise ValueError("degenerate landmarks")
+    return cv2.warpAffine(img, M, (112, 112), flags=cv2.INTER_LINEAR)
+
+
+def _face_obj(img, box: tuple, score: float, pts: np.ndarray, align: str) -> dict:
+    x, y, w, h = (int(round(v)) for v in box)
+    H, W = img.shape[:2]
+    x, y = max(0, x), max(0, y)
+    w, h = min(w, W - x), min(h, H - y)
+    try:
+        if align == "arcface":
+            crop = _align_arcface(img, pts)
+        else:
+            crop = _align_deepface(img, (x, y, w, h), pts)
+    except Exception:
+        crop = img[y:y + h, x:x + w]
+    face = crop[:, :, ::-1].astype(np.float32) / 255.0      # BGR → RGB, [0, 1]
+    p = [[int(round(a)), int(round(b))] for a, b in pts]
+    return {
+        "face": face,
+        "facial_area": {
+            "x": x, "y": y, "w": w, "h": h,
+            "left_eye": p[1], "right_eye": p[0], "nose": p[2],
+            "mouth_left": p[4], "mouth_right": p[3],
+        },
+        "confidence": float(score),
+    }
+
+
+# ── YuNet (OpenCV DNN) ────────────────────────────────────────────────────────
+
+class YuNetDetector:
+    name = "yunet"
+
+    def __init__(self, model_path: str, input_size: int = 0,
+                 score_threshold: float = 0.6, nms_threshold: float = 0.3,
+                 align: str = "deepface"):
+        if not hasattr(cv2, "FaceDetectorYN"):
+            raise RuntimeError("OpenCV >= 4.5.4 with FaceDetectorYN required")
+        self.model_path = model_path
+        self.input_size = input_size
+        self.score_threshold = score_threshold
+        self.nms_threshold = nms_threshold
+        self.align = align
+        self._local = threading.local()      # FaceDetectorYN is not thread-safe
+        self._net()                          # fail early on a bad model file
+
+    def _net(self):
+        net = getattr(self._local, "net", None)
+        if net is None:
+            net = cv2.FaceDetectorYN.create(self.model_path, "", (320, 320),
+                                            self.score_threshold, self.nms_threshold, 5000)
+            self._local.net = net
+        return net
+
+    def detect(self, img) -> list[dict]:
+        h, w = img.shape[:2]
+        f = 1.0
+        src = img
+        if self.input_size and max(h, w) != self.input_size:
+            f = self.input_size / float(max(h, w))
+            src = cv2.resize(img, (max(1, int(w * f)), max(1, int(h * f))))
+        net = self._net()
+        net.setInputSize((src.shape[1], src.shape[0]))
+        _, rows = net.detect(src)
+        if rows is None:
+            return []
+        out = []
+        for r in rows:
+            box = tuple(r[0:4] / f)
+            pts = r[4:14].reshape(5, 2) / f
+            out.append(_face_obj(img, box, r[14], pts, self.align))
+        return out
+
+
+# ── SCRFD (ONNX Runtime) ──────────────────────────────────────────────────────
+
+class SCRFDDetector:
+    name = "scrfd"
+
+    def __init__(self, model_path: str, input_size: int = 640,
+                 score_threshold: float = 0.5, nms_threshold: float = 0.4,
+                 align: str = "deepface", threads: int = 0):
+        import onnxruntime as ort           # type: ignore
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = threads or os.cpu_count() or 1
+        self._sess = ort.InferenceSession(model_path, sess_options=opts,
+                                          providers=["CPUExecutionProvider"])
+        inp = self._sess.get_inputs()[0]
+        self._input_name = inp.name
+        fixed = [d for d in inp.shape[2:4] if isinstance(d, int)]
+        self.input_size = fixed[0] if len(fixed) == 2 else (input_size or 640)
+        self.model_path = model_path
+        self.score_threshold = score_threshold
+        self.nms_threshold = nms_threshold
+        self.align = align
+        n_out = len(self._sess.get_outputs())
+        # 6 outputs: no landmarks; 9: with landmarks (3 strides each)
+        self._fmc = 3
+        self._strides = (8, 16, 32)
+        self._has_kps = n_out == 9
+        self._anchors: dict = {}
+
+    def _anchor_centers(self, fh: int, fw: int, stride: int, n: int) -> np.ndarray:
+        key = (fh, fw, stride)
+        if key not in self._anchors:
+            grid = np.stack(np.mgrid[:fh, :fw][::-1], axis=-1).astype(np.float32)
+            centers = (grid * stride).reshape(-1, 2)
+            self._anchors[key] = np.repeat(centers, n, axis=0) if n > 1 else centers
+        return self._anchors[key]
+
+    def detect(self, img) -> list[dict]:
+        h, w = img.shape[:2]
+        size = self.input_size
+        f = size / float(max(h, w))
+        nh, nw = int(round(h * f)), int(round(w * f))
+        canvas = np.zeros((size, size, 3), dtype=np.uint8)
+        canvas[:nh, :nw] = cv2.resize(img, (nw, nh))
+        blob = cv2.dnn.blobFromImage(canvas, 1.0 / 128, (size, size),
+                                     (127.5, 127.5, 127.5), swapRB=True)
+        outs = self._sess.run(None, {self._input_name: blob})
+
+        boxes, scores, kpss = [], [], []
+        for i, stride in enumerate(self._strides):
+            sc = outs[i].reshape(-1)
+            bb = outs[i + self._fmc].reshape(-1, 4) * stride
+            fh, fw = size // stride, size // stride
+            n = sc.shape[0] // (fh * fw)
+            centers = self._anchor_centers(fh, fw, stride, n)
+            keep = np.where(sc >= self.score_threshold)[0]
+            if keep.size == 0:
+                continue
+            c = centers[keep]
+            b = np.hstack([c - bb[keep, :2], c + bb[keep, 2:]])
+            boxes.append(b)
+            scores.append(sc[keep])
+            if self._has_kps:
+                kp = outs[i + 2 * self._fmc].reshape(-1, 10)[keep] * stride
+                kpss.append(kp.reshape(-1, 5, 2) + c[:, None, :])
+        if not boxes:
+            return []
+        boxes = np.vstack(boxes) / f
+        scores = np.concatenate(scores)
+        kps = np.vstack(kpss) / f if kpss else None
+
+        xywh = [[float(x1), float(y1), float(x2 - x1), float(y2 - y1)]
+                for x1, y1, x2, y2 in boxes]
+        idx = cv2.dnn.NMSBoxes(xywh, scores.tolist(), self.score_threshold, self.nms_threshold)
+        out = []
+        for i in np.asarray(idx).reshape(-1):
+            x, y, bw, bh = xywh[i]
+            if kps is not None:
+                pts = kps[i]
+            else:       # no landmarks: synthesise level eyes, no rotation
+                pts = np.array([[x + bw * 0.3, y + bh * 0.4], [x + bw * 0.7, y + bh * 0.4],
+                                [x + bw * 0.5, y + bh * 0.6], [x + bw * 0.35, y + bh * 0.8],
+                                [x + bw * 0.65, y + bh * 0.8]], dtype=np.float32)
+            out.append(_face_obj(img, (x, y, bw, bh), scores[i], pts, self.align))
+        return out
+
+
+def make_detector(backend: str, model_path: str, input_size: int = 0,
+                  score_threshold: float = 0.6, align: str = "deepface"):
+    """Build a native detector, or return None (and log why) so the caller
+    keeps using DeepFace.extract_faces."""
+    backend = (backend or "").lower()
+    if not backend:
+        return None
+    if backend not in BACKENDS:
+        logger.error("[Detect] Unknown native detector %r – using DeepFace", backend)
+        return None
+    if not _CV2_OK or not model_path or not os.path.exists(model_path):
+        logger.error("[Detect] %s model not found: %r – using DeepFace", backend, model_path)
+        return None
+    try:
+        if backend == "yunet":
+            det = YuNetDetector(model_path, input_size, score_threshold, align=align)
+        else:
+            det = SCRFDDetector(model_path, input_size or 640, score_threshold, align=align)
+    except Exception as exc:
+        logger.error("[Detect] %s unavailable (%s) – using DeepFace", backend, exc)
+        return None
+    logger.info("[Detect] Using native %s detector: %s (input %s, align=%s)",
+                backend, model_path, det.input_size or "native", align)
+    return det
@@ -0,0 +1,193 @@
+"""
+embedders.py
+────────────
+Pluggable face-embedding backends for Recognizer (CAM_EMBED_BACKEND).
+
+  • deepface – DeepFace.represent on the full-precision Keras model (default)
+  • tflite   – a converted .tflite model (fp32, fp16 or int8) run by
+               tflite_runtime / tf.lite with the XNNPACK delegate
+  • onnx     – a converted .onnx model (fp32 or QDQ int8) on ONNX Runtime's
+               CPU provider
+
+Converted models come from tools/convert_arcface.py; check that they agree
+with the Keras model on the enrolled dataset with tools/check_embedder.py
+before switching a Pi over.  All backends take the aligned face crop that
+DeepFace.extract_faces returns and yield an L2-normalised float32 vector.
+Preprocessing mirrors DeepFace.represent (RGB→BGR, aspect-preserving resize
+with zero padding, [0, 1] pixels) so gallery embeddings in the pkl stay
+valid.  Optional runtimes are imported lazily; make_embedder() falls back to
+DeepFace when the requested one is missing.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger("face_engine")
+
+try:
+    import cv2                          # type: ignore
+    _CV2_OK = True
+except ImportError:
+    _CV2_OK = False
+
+BACKENDS = ("deepface", "tflite", "onnx")
+
+
+def _l2(vec: np.ndarray) -> np.ndarray:
+    vec = np.asarray(vec, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+def preprocess(face, size: tuple[int, int]) -> np.ndarray:
+    """Aligned RGB crop → (1, h, w, 3) float32 BGR in [0, 1], letterboxed
+    to size=(h, w) like deepface.commons preprocessing.resize_image."""
+    img = np.asarray(face, dtype=np.float32)[:, :, ::-1]
+    th, tw = size
+    h, w = img.shape[:2]
+    if h and w and (h, w) != (th, tw):
+        f = min(th / h, tw / w)
+        nw, nh = max(1, int(round(w * f))), max(1, int(round(h * f)))
+        img = cv2.resize(img, (nw, nh))
+        dh, dw = th - nh, tw - nw
+        img = np.pad(img, ((dh // 2, dh - dh // 2), (dw // 2, dw - dw // 2), (0, 0)))
+    if img.max() > 1.0:
+        img = img / 255.0
+    return np.ascontiguousarray(img[None, ...], dtype=np.float32)
+
+
+class DeepFaceEmbedder:
+    name = "deepface"
+
+    def __init__(self, model_name: str = "ArcFace"):
+        from deepface import DeepFace       # type: ignore
+        self._df = DeepFace
+        self.model_name = model_name
+
+    def embed(self, face) -> Optional[np.ndarray]:
+        reps = self._df.represent(
+            img_path=face,
+            model_name=self.model_name,
+            detector_backend="skip",
+            enforce_detection=False,
+            align=False,
+        )
+        if not reps:
+            return None
+        return _l2(reps[0].get("embedding"))
+
+
+class TFLiteEmbedder:
+    name = "tflite"
+
+    def __init__(self, model_path: str, threads: int = 0):
+        try:
+            from tflite_runtime.interpreter import Interpreter   # type: ignore
+        except ImportError:
+            from tensorflow.lite import Interpreter              # type: ignore
+        # XNNPACK is the default CPU delegate for float and int8 models in
+        # current TFLite builds; num_threads controls its thread pool.
+        self._interp = Interpreter(model_path=model_path,
+                                   num_threads=threads or os.cpu_count() or 1)
+        self._interp.allocate_tensors()
+        self._in = self._interp.get_input_details()[0]
+        self._out = self._interp.get_output_details()[0]
+        self.input_size = tuple(int(v) for v in self._in["shape"][1:3])
+        self.model_path = model_path
+
+    def embed(self, face) -> Optional[np.ndarray]:
+        x = preprocess(face, self.input_size)
+        scale, zero = self._in.get("quantization", (0.0, 0))
+        if self._in["dtype"] != np.float32 and scale:
+            x = np.clip(np.round(x / scale + zero),
+                        np.iinfo(self._in["dtype"]).min,
+                        np.iinfo(self._in["dtype"]).max).astype(self._in["dtype"])
+        self._interp.set_tensor(self._in["index"], x)
+        self._interp.invoke()
+        y = self._interp.get_tensor(self._out["index"])
+        scale, zero = self._out.get("quantization", (0.0, 0))
+        if self._out["dtype"] != np.float32 and scale:
+            y = (y.astype(np.float32) - zero) * scale
+        return _l2(y)
+
+
+class ONNXEmbedder:
+    name = "onnx"
+
+    def __init__(self, model_path: str, threads: int = 0):
+        import onnxruntime as ort           # type: ignore
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = threads or os.cpu_count() or 1
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self._sess = ort.InferenceSession(model_path, sess_options=opts,
+                                          providers=["CPUExecutionProvider"])
+        inp = self._sess.get_inputs()[0]
+        self._input_name = inp.name
+        # NHWC as exported from Keras; symbolic dims fall back to ArcFace's 112
+        dims = [d if isinstance(d, int) else 112 for d in inp.shape[1:3]]
+        self.input_size = (dims[0], dims[1])
+        self.model_path = model_path
+
+    def embed(self, face) -> Optional[np.ndarray]:
+        x = preprocess(face, self.input_size)
+        y = self._sess.run(None, {self._input_name: x})[0]
+        return _l2(y)
+
+
+def iter_dataset_faces(root: str, detector_backend: str = "opencv", limit: int = 0):
+    """Yield (person, image_path, aligned_face) for the largest face in each
+    image of an enrolment dataset laid out as root/<person>/<image>.
+    Used by the conversion (calibration) and accuracy-check tools."""
+    from deepface import DeepFace           # type: ignore
+    n = 0
+    for person in sorted(os.listdir(root)):
+        pdir = os.path.join(root, person)
+        if not os.path.isdir(pdir):
+            continue
+        for fname in sorted(os.listdir(pdir)):
+            if not fname.lower().endswith((".jpg", ".jpeg", ".png")):
+                continue
+            path = os.path.join(pdir, fname)
+            try:
+                faces = DeepFace.extract_faces(img_path=path, detector_backend=detector_backend,
+                                               enforce_detection=False, align=True)
+            except Exception as exc:
+                logger.debug("[Embed] %s: %s", path, exc)
+                continue
+            if not faces:
+                continue
+            best = max(faces, key=lambda f: f["facial_area"]["w"] * f["facial_area"]["h"])
+            yield person, path, best["face"]
+            n += 1
+            if limit and n >= limit:
+                return
+
+
+def make_embedder(backend: str = "deepface", model_name: str = "ArcFace",
+                  model_path: str = "", threads: int = 0):
+    """Build the requested backend; fall back to DeepFace (or None when even
+    DeepFace is missing) and log why."""
+    backend = (backend or "deepface").lower()
+    if backend in ("tflite", "onnx"):
+        if not model_path or not os.path.exists(model_path):
+            logger.error("[Embed] %s model not found: %r – using DeepFace", backend, model_path)
+        else:
+            try:
+                emb = (TFLiteEmbedder if backend == "tflite" else ONNXEmbedder)(model_path, threads)
+                logger.info("[Embed] Using %s backend: %s (input %s)",
+                            backend, model_path, emb.input_size)
+                return emb
+            except Exception as exc:
+                logger.error("[Embed] %s backend unavailable (%s) – using DeepFace", backend, exc)
+    elif backend != "deepface":
+        logger.error("[Embed] Unknown backend %r – using DeepFace", backend)
+    try:
+        return DeepFaceEmbedder(model_name)
+    except Exception as exc:
+        logger.warning("[Embed] DeepFace unavailable: %s", exc)
+        return None
@@ -10,9 +10,22 @@ Usage (from app.py):
     engine.stop()
 
 Architecture (after performance optimisation):
-  • _capture_thread  – runs at full camera speed, stores latest raw frame
-  • _detect_loop     – reads raw frames, runs DeepFace every N frames via
-                       a ThreadPoolExecutor, annotates & JPEG-encodes output
+  • _capture_thread  – one per camera, runs at full camera speed, stores the
+                       camera's latest raw frame
+  • _detect_loop     – reads raw frames, runs the Recognizer (recognition.py)
+                       every N frames via a ThreadPoolExecutor — or, with
+                       CAM_INFERENCE_PROCESS=1, in a separate worker process
+                       (inference_worker.py) — annotates & JPEG-encodes output
+  • CAM_SOURCES lists several cameras for large rooms; they share that one
+    Recognizer / worker (one model in memory), take turns fairly, merge
+    their votes per roll number and each serve their own preview
+  • AdaptiveScheduler (scheduling.py) picks the gap between detection passes
+    from measured latency, load, temperature and scene change; CoverageMap
+    skips slider positions whose faces are already confirmed
+  • every session writes an NDJSON trace (trace.py) to CAM_TRACE_DIR for
+    offline re-tuning with tools/replay_trace.py
+  • CAM_SOURCE replaces the camera with a JPEG directory or video file
+    (file_capture.py); CAM_RECORD_DIR records live frames for later replay
 
 This separation means the live preview runs at camera speed (~20-30 fps on
 a Pi 5) while face detection happens asynchronously without blocking frames.
@@ -23,18 +36,47 @@ from __future__ import annotations
 import os
 import sys
 import pickle
+import socket
 import threading
 import time
+import uuid
 import logging
-from concurrent.futures import ThreadPoolExecutor, Future
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Optional
 
 import numpy as np
 
+import metrics
+from model import trace as _trace
+from model.recognition import ADAPTIVE_THRESHOLD, MIN_MARGIN, Recognizer, plan_regions
+from model.inference_worker import InferenceWorker
+from model.scheduling import AdaptiveScheduler, CoverageMap
+from model.file_capture import FileCapture, FrameRecorder
+from model.aggregator_client import AggregatorClient
+from aggregator_core import Aggregator, FirestoreWriter
+
 # ── Logging ───────────────────────────────────────────────────────────────────
 logger = logging.getLogger("face_engine")
 
+# ── Metrics (exported by app.py at /metrics) ──────────────────────────────────
+_M_CAPTURE  = metrics.histogram("camera_capture_seconds",
+                                "Time to obtain one frame from the capture source", ("source",))
+_M_FRAMES   = metrics.counter("camera_frames_total",
+                              "Frames delivered by the capture source", ("source",))
+_M_STAGE    = metrics.histogram("face_stage_seconds",
+                                "Recognizer time per detection pass by stage", ("stage",))
+_M_PASS     = metrics.histogram("face_pass_roundtrip_seconds",
+                                "Submit-to-result latency of a detection pass", ("mode",))
+_M_FACES    = metrics.counter("face_faces_total",
+                              "Faces per outcome (detected/embedded/cached/gated/reused)", ("outcome",))
+_M_CONFIRM  = metrics.counter("attendance_confirmed_total", "Students confirmed present by camera")
+_M_FS_WRITE = metrics.histogram("firestore_write_seconds", "Attendance batch commit latency")
+_M_FS_TOTAL = metrics.counter("firestore_writes_total", "Attendance records written by result",
+                              ("result",))
+_M_ENCODE   = metrics.histogram("preview_encode_seconds",
+                                "Annotate + JPEG encode time of the live preview")
+
 # ── Optional heavy imports (fail gracefully on dev machines) ──────────────────
 os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
 os.environ.setdefault("TF_ENABLE_ONEDNN_OPTS", "0")
@@ -77,7 +119,7 @@ class _LibcameraCapture:
     _SOI = b"\xff\xd8"
     _EOI = b"\xff\xd9"
 
-    def __init__(self, width: int = 640, height: int = 480, fps: int = 30):
+    def __init__(self, width: int = 640, height: int = 480, fps: int = 30, camera: int = 0):
         import subprocess
         contrast = os.getenv("CAM_CONTRAST", "1.06")
         saturation = os.getenv("CAM_SATURATION", "1.08")
@@ -100,6 +142,8 @@ class _LibcameraCapture:
             "--flush",
             "-o", "-",
         ]
+        if camera:
+            cmd[1:1] = ["--camera", str(camera)]
         logger.info("Spawning: %s", " ".join(cmd))
         self._proc = subprocess.Popen(
             cmd,
@@ -473,34 +517,92 @@ def _load_embeddings():
 
 
 # ── Firestore writer ──────────────────────────────────────────────────────────
+# Confirmations are not written one by one: they go through the same
+# Aggregator as aggregator.py, run in process, which commits every
+# ATTENDANCE_COMMIT_S what has piled up — record docs plus one Increment /
+# ArrayUnion update of attendance/{date}/summary/camera — as one batch.
+
+_fs_writer: Optional[FirestoreWriter] = None
 
-def _mark_present_firebase(date: str, roll_no: str, student_name: str):
-    """Update attendance/{date}/records/{rollNo} → status=present."""
+
+def _write_attendance(records: list[dict], scans: list[dict] = ()):
+    """Aggregator writer: one batched Firestore commit (raises to retry)."""
+    global _fs_writer
+    rolls = [rec["rollNo"] for rec in records]
     if _db is None:
-        logger.warning("Firestore not available – skipping write for %s", roll_no)
+        if rolls:
+            logger.warning("Firestore not available – skipping write for %s", rolls)
+        _M_FS_TOTAL.inc(len(records), result="skipped")
         return
+    if _fs_writer is None or _fs_writer.db is not _db:
+        _fs_writer = FirestoreWriter(_db)
+    t0 = time.perf_counter()
     try:
-        ref = _db.collection("attendance").document(date) \
-                 .collection("records").document(roll_no)
-        ref.set({
-            "rollNo":    roll_no,
-            "name":      student_name,
-            "status":    "present",
-            "odType":    None,
-            "source":    "camera",
-            "updatedAt": firestore.SERVER_TIMESTAMP,
-        }, merge=True)
-
-        # Also touch the parent summary doc so it exists
-        _db.collection("attendance").document(date).set({
-            "date":       date,
-            "classLabel": "24CS (Batch 2024)",
-            "markedAt":   firestore.SERVER_TIMESTAMP,
-        }, merge=True)
-
-        logger.info("[Firestore] Marked present: %s (%s) on %s", student_name, roll_no, date)
-    except Exception as exc:
-        logger.error("[Firestore] Write error for %s: %s", roll_no, exc)
+        _fs_writer(records, scans)
+    except Exception:
+        _M_FS_TOTAL.inc(len(records), result="error")
+        raise
+    finally:
+        _M_FS_WRITE.observe(time.perf_counter() - t0)
+    _M_FS_TOTAL.inc(len(records), result="ok")
+    if rolls:
+        logger.info("[Firestore] Marked present: %s", rolls)
+
+
+_local_attendance = Aggregator(_write_attendance,
+                               flush_s=float(os.getenv("ATTENDANCE_COMMIT_S", 1.0)))
+
+
+# ── Central aggregator (multi-room deployments) ───────────────────────────────
+# With AGGREGATOR_URL set, confirmations go to aggregator.py as compact events
+# and it does the deduped, batched Firestore writes for every room.
+
+AGGREGATOR_URL = os.getenv("AGGREGATOR_URL", "").strip()
+ROOM_ID = os.getenv("ROOM_ID", "").strip() or socket.gethostname()
+_aggregator: Optional[AggregatorClient] = (
+    AggregatorClient(AGGREGATOR_URL, ROOM_ID,
+                     flush_s=float(os.getenv("AGGREGATOR_FLUSH_S", 0.5)))
+    if AGGREGATOR_URL else None
+)
+if _aggregator is not None:
+    logger.info("Attendance goes to aggregator %s as room %s", AGGREGATOR_URL, ROOM_ID)
+else:
+    _local_attendance.start()
+
+
+def _report_present(date: str, roll_no: str, student_name: str,
+                    distance: Optional[float] = None, camera: Optional[str] = None):
+    """Record a confirmation: via the aggregator if configured, else the
+    local batched Firestore writer."""
+    event = {
+        "date":     date,
+        "rollNo":   roll_no,
+        "name":     student_name,
+        "ts":       round(time.time(), 3),
+        "distance": distance,
+        "camera":   camera,
+    }
+    if _aggregator is None:
+        _local_attendance.ingest([dict(event, room=ROOM_ID)])
+    else:
+        _aggregator.send(event)
+
+
+def _report_scan(scan: dict):
+    """Add one finished session's counters to the date's summary doc."""
+    if _aggregator is None:
+        _local_attendance.ingest([], [dict(scan, room=ROOM_ID)])
+    else:
+        _aggregator.send_scan(scan)
+
+
+def _flush_attendance() -> bool:
+    """Deliver everything queued; False if something is still pending."""
+    if _aggregator is not None:
+        return _aggregator.flush()
+    while _local_attendance.flush() >= _local_attendance.max_batch:
+        pass
+    return not _local_attendance.status()["pending_writes"]
 
 
 # ── Session state ─────────────────────────────────────────────────────────────
@@ -511,6 +613,119 @@ class _State:
     STOPPING = "stopping"
 
 
+def _parse_sources(value: str, default: str) -> list[tuple[str, str]]:
+    """CAM_SOURCES "front=0,back=1,clip=recordings/x" → [(id, spec), …].
+
+    spec is a camera index or a JPEG directory / video file; unnamed entries
+    are called cam0, cam1, …  Empty value → one camera, CAM_SOURCE or index 0.
+    """
+    out: list[tuple[str, str]] = []
+    entries = [e.strip() for e in value.split(",") if e.strip()]
+    for i, entry in enumerate(entries):
+        name, sep, spec = entry.partition("=")
+        if not sep:
+            name, spec = f"cam{i}", entry
+        name = name.strip() or f"cam{i}"
+        if any(name == n for n, _ in out):
+            name = f"{name}{i}"
+        out.append((name, spec.strip()))
+    return out or [("cam0", default)]
+
+
+def _source_label(spec: str) -> str:
+    if spec and not spec.isdigit():
+        return spec
+    return "camera" if spec in ("", "0") else f"camera {spec}"
+
+
+class _Camera:
+    """One capture source of a session: device handle, latest raw frame,
+    annotated preview and its own detection pacing.  Every camera feeds the
+    same Recognizer / inference worker, so the model is loaded only once.
+    """
+
+    def __init__(self, cam_id: str, spec: str):
+        self.id    = cam_id
+        self.spec  = spec
+        self.index = int(spec) if spec.isdigit() else 0 if not spec else None
+        self.picam2 = None
+        self.libcam = None
+        self.cap    = None                      # cv2.VideoCapture or FileCapture
+        self.recorder: Optional[FrameRecorder] = None
+        self.thread: Optional[threading.Thread] = None
+
+        # Raw frame double-buffer (written by the capture thread)
+        self.raw_lock  = threading.Lock()
+        self.raw_frame = None
+        self.capture_count = 0
+
+        # Live preview (JPEG bytes of the latest annotated frame)
+        self.frame_lock  = threading.Lock()
+        self.latest_jpeg: Optional[bytes] = None
+        self.face_boxes: list[dict] = []
+        self.fps      = 0.0
+        self.encode_t = time.time()
+
+        # Detection pacing (detect loop only)
+        self.scheduler: Optional[AdaptiveScheduler] = None
+        self.last_boxes: list[dict] = []
+        self.pass_idx        = 0
+        self.next_detect_at  = 0.0
+        self.next_preview_at = 0.0
+        self.last_served     = 0.0
+        self.result_at       = 0.0
+
+        self.passes     = 0
+        self.faces      = 0
+        self.confirmed  = 0
+        self.latency_ms = 0.0       # submit → result, EWMA
+        self.wait_ms    = 0.0       # due → submitted (queued behind other cameras), EWMA
+
+    @property
+    def kind(self) -> str:
+        return ("picamera2" if self.picam2 else "libcamera" if self.libcam
+                else "file" if isinstance(self.cap, FileCapture) else "opencv")
+
+    @property
+    def exhausted(self) -> bool:
+        return bool(getattr(self.cap, "exhausted", False))
+
+    def latest(self):
+        with self.raw_lock:
+            return self.raw_frame
+
+    def record_pass(self, latency_ms: float, faces: int):
+        self.passes += 1
+        self.faces  += faces
+        self.latency_ms = latency_ms if self.passes == 1 else \
+            self.latency_ms * 0.8 + latency_ms * 0.2
+
+    def record_wait(self, wait_ms: float):
+        self.wait_ms = self.wait_ms * 0.8 + wait_ms * 0.2
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+        if self.libcam:
+            self.libcam.release()
+        if self.picam2:
+            self.picam2.stop()
+
+    def get_stats(self) -> dict:
+        return {
+            "source":        _source_label(self.spec),
+            "backend":       self.kind,
+            "fps":           round(self.fps, 1),
+            "capture_count": self.capture_count,
+            "passes":        self.passes,
+            "faces":         self.faces,
+            "confirmed":     self.confirmed,
+            "latency_ms":    round(self.latency_ms, 1),
+            "wait_ms":       round(self.wait_ms, 1),
+            "detect_interval_s": round(self.scheduler.interval_s, 3) if self.scheduler else None,
+        }
+
+
 class FaceEngine:
     """
     Singleton engine. Call start() / stop() from Flask routes or scheduler.
@@ -525,23 +740,20 @@ class FaceEngine:
         # Status fields (read by get_status())
         self._state          = _State.IDLE
         self._session_date   = ""
+        self._session_id     = ""
         self._detected_so_far: list[str] = []   # rollNo list
         self._last_seen: dict[str, str]  = {}   # rollNo → name
         self._started_at: Optional[str]  = None
         self._stopped_at: Optional[str]  = None
         self._error: Optional[str]       = None
+        self._stop_reason: Optional[str] = None
+        self._roster: dict               = {}   # coverage snapshot for get_status()
         self._frame_count    = 0
-        self._fps            = 0.0
-        self._encode_t       = time.time()  # timestamp of last JPEG encode
+        self._stage_ms: dict[str, float] = {}   # summed Recognizer timings
 
-        # Live frame buffer (JPEG bytes of the latest annotated frame)
-        self._frame_lock   = threading.Lock()
-        self._latest_jpeg: Optional[bytes]   = None
-        self._face_boxes:  list[dict]        = []   # [{label, confirmed, facial_area}]
-
-        # Raw frame double-buffer (written by capture thread, read by detect loop)
-        self._raw_lock  = threading.Lock()
-        self._raw_frame: Optional[object] = None   # latest BGR numpy array
+        # Cameras of the current / last session; each holds its raw frame
+        # buffer and live preview (see _Camera)
+        self._cameras: list[_Camera] = []
 
         # Config
         self.max_duration_s   = int(os.getenv("CAM_MAX_DURATION", 600))   # 10 min default
@@ -553,6 +765,16 @@ class FaceEngine:
         # opencv (Haar cascade) is fast but only finds one face at a time.
         self.detector_backend = os.getenv("CAM_DETECTOR", "retinaface")
         self.fallback_backend = os.getenv("CAM_FALLBACK", "mtcnn")
+        # Native yunet / scrfd detector instead of DeepFace (see detectors.py);
+        # CAM_DETECTOR / CAM_FALLBACK then only serve as the error fallback
+        self.native_detector  = os.getenv("CAM_NATIVE_DETECTOR", "").strip().lower()
+        det_path              = os.getenv("CAM_DETECTOR_MODEL", "").strip()
+        if det_path and not os.path.isabs(det_path):
+            det_path = os.path.join(_BACKEND, det_path)
+        self.detector_model_path = det_path
+        self.detector_input_size = int(os.getenv("CAM_DETECTOR_INPUT", 0))   # 0 = native
+        self.detector_threshold  = float(os.getenv("CAM_DETECTOR_THRESHOLD", 0.6))
+        self.detector_align      = os.getenv("CAM_DETECTOR_ALIGN", "deepface").lower()
         self.jpeg_quality     = int(os.getenv("CAM_JPEG_QUALITY", 55))
         self.preview_every    = int(os.getenv("CAM_PREVIEW_EVERY", 5))   # heartbeat frames
         self.preview_fps      = float(os.getenv("CAM_PREVIEW_FPS", 15))
@@ -565,6 +787,82 @@ class FaceEngine:
         self.cam_saturation   = float(os.getenv("CAM_SATURATION", 1.08))
         self.cam_sharpness    = float(os.getenv("CAM_SHARPNESS", 1.08))
         self.cam_brightness   = float(os.getenv("CAM_BRIGHTNESS", 0.00))
+        # Quality gate applied before ArcFace (see recognition.Recognizer.quality)
+        self.min_face_px      = int(os.getenv("CAM_MIN_FACE_PX", 48))
+        self.min_blur         = float(os.getenv("CAM_MIN_BLUR", 30))
+        self.min_det_conf     = float(os.getenv("CAM_MIN_DET_CONF", 0.80))
+        self.max_yaw_deg      = float(os.getenv("CAM_MAX_YAW", 0))          # 0 = off
+        self.max_embeds       = int(os.getenv("CAM_MAX_EMBED_PER_PASS", 0))  # 0 = all
+        self._recog_stats: dict[str, int] = {}
+        # Reuse the embedding of a near-identical crop at the same spot
+        # (dHash + box cell) instead of re-running ArcFace; size 0 disables
+        self.embed_cache_size    = int(os.getenv("CAM_EMBED_CACHE_SIZE", 256))
+        self.embed_cache_ttl_s   = float(os.getenv("CAM_EMBED_CACHE_TTL_S", 10))
+        self.embed_cache_hamming = int(os.getenv("CAM_EMBED_CACHE_HAMMING", 4))
+        # ArcFace backend: deepface (Keras) | tflite | onnx, see embedders.py
+        self.embed_backend     = os.getenv("CAM_EMBED_BACKEND", "deepface").lower()
+        model_path             = os.getenv("CAM_EMBED_MODEL", "").strip()
+        if model_path and not os.path.isabs(model_path):
+            model_path = os.path.join(_BACKEND, model_path)
+        self.embed_model_path  = model_path
+        self.embed_threads     = int(os.getenv("CAM_EMBED_THREADS", 0))   # 0 = all cores
+        # ROI mode: between full sweeps, detect only on padded crops around
+        # the last boxes at CAM_ROI_SCALE (higher than CAM_SCALE)
+        self.roi_mode         = os.getenv("CAM_ROI", "0") == "1"
+        self.roi_full_every   = max(1, int(os.getenv("CAM_ROI_FULL_EVERY", 4)))
+        self.roi_scale        = float(os.getenv("CAM_ROI_SCALE", 1.0))
+        self.roi_pad          = float(os.getenv("CAM_ROI_PAD", 0.75))
+        # Tiled mode: capture at full sensor resolution and detect on
+        # overlapping tiles in parallel (large lecture halls)
+        self.tiled            = os.getenv("CAM_TILED", "0") == "1"
+        rows, _, cols = os.getenv("CAM_TILE_GRID", "2x2").lower().partition("x")
+        self.tile_grid        = (max(1, int(rows)), max(1, int(cols or rows)))
+        self.tile_overlap     = float(os.getenv("CAM_TILE_OVERLAP", 0.15))
+        self.tile_scale       = float(os.getenv("CAM_TILE_SCALE", 1.0))
+        self.tile_workers     = int(os.getenv("CAM_TILE_WORKERS", 2))
+        self.tiled_width      = int(os.getenv("CAM_TILED_WIDTH", 0))    # 0 = sensor max
+        self.tiled_height     = int(os.getenv("CAM_TILED_HEIGHT", 0))
+        # Slider-position-aware scheduling (position source set by app.py)
+        self.position_bins    = int(os.getenv("CAM_POSITION_BINS", 8))
+        self.position_revisit_s = float(os.getenv("CAM_POSITION_REVISIT_S", 20))
+        self._position_source = None
+        self._coverage: Optional[CoverageMap] = None
+        # Annotated preview is downscaled to this width before JPEG encoding
+        self.preview_width    = int(os.getenv("CAM_PREVIEW_WIDTH", 640))
+        # Derive the detection cadence from latency / load / scene change
+        # instead of the fixed detect_interval_s (CAM_ADAPTIVE=0 restores it)
+        self.adaptive         = os.getenv("CAM_ADAPTIVE", "1") == "1"
+        self._scheduler: Optional[AdaptiveScheduler] = None
+        # End the session early once the enrolled roster is (nearly) covered
+        self.early_stop        = os.getenv("CAM_EARLY_STOP", "1") == "1"
+        self.early_stop_coverage = float(os.getenv("CAM_EARLY_STOP_COVERAGE", 0.9))
+        self.plateau_s         = float(os.getenv("CAM_PLATEAU_S", 60))
+        self._end_listeners: list = []
+        # Run TF/DeepFace in a separate process (frames via shared memory)
+        self.inference_process = os.getenv("CAM_INFERENCE_PROCESS", "0") == "1"
+        self.worker_timeout_s  = float(os.getenv("CAM_WORKER_TIMEOUT_S", 30))
+
+        # File-backed source instead of the camera (JPEG dir or video file),
+        # and optional recording of live frames in the same format
+        self.cam_source        = os.getenv("CAM_SOURCE", "").strip()
+        self.source_realtime   = os.getenv("CAM_SOURCE_REALTIME", "1") == "1"
+        self.source_loop       = os.getenv("CAM_SOURCE_LOOP", "0") == "1"
+        self.source_fps        = float(os.getenv("CAM_SOURCE_FPS", 0))   # 0 = from file
+        self.record_dir        = os.getenv("CAM_RECORD_DIR", "").strip()
+        self.record_fps        = float(os.getenv("CAM_RECORD_FPS", 2))
+        # Several cameras ([name=]index-or-path, comma-separated) sharing one
+        # inference pool; the first is the one riding the slider
+        self.cam_sources       = _parse_sources(os.getenv("CAM_SOURCES", ""), self.cam_source)
+
+        # Per-session NDJSON trace (passes, distances, votes) for offline tuning
+        self.trace_enabled     = os.getenv("CAM_TRACE", "1") == "1"
+        self.trace_dir         = os.getenv("CAM_TRACE_DIR", "").strip() \
+            or os.path.join(_BACKEND, "traces")
+        self.trace_keep        = int(os.getenv("CAM_TRACE_KEEP", 20))
+        self._trace_path: Optional[str] = None
+
+        # Inference worker process – spawned on first session, kept warm after
+        self._worker: Optional[InferenceWorker] = None
 
     # ── Public API ────────────────────────────────────────────────────────────
 
@@ -577,13 +875,20 @@ class FaceEngine:
 
             date = session_date or datetime.now().strftime("%Y-%m-%d")
             self._session_date   = date
+            self._session_id     = uuid.uuid4().hex
             self._detected_so_far = []
             self._last_seen      = {}
             self._started_at     = datetime.now().isoformat(timespec="seconds")
             self._stopped_at     = None
             self._error          = None
+            self._stop_reason    = None
+            self._roster         = {}
+            self._recog_stats    = {"passes": 0, "roi_passes": 0, "faces": 0,
+                                    "embeddings": 0, "cache_hits": 0,
+                                    "gated": 0, "reused": 0}
+            self._stage_ms       = {"detect_ms": 0.0, "embed_ms": 0.0,
+                                    "match_ms": 0.0, "total_ms": 0.0}
             self._frame_count    = 0
-            self._fps            = 0.0
             self._stop_event.clear()
             self._state          = _State.RUNNING
 
@@ -605,12 +910,60 @@ class FaceEngine:
         logger.info("Stop requested for face detection session")
         return {"ok": True}
 
-    def get_frame(self) -> Optional[bytes]:
-        """Return the latest annotated JPEG frame, or None if not available."""
-        with self._frame_lock:
-            return self._latest_jpeg
+    def add_session_end_listener(self, fn):
+        """Register fn(stop_reason) to run whenever a session ends, including
+        early stops (e.g. app.py stops the slider motor)."""
+        self._end_listeners.append(fn)
+
+    def set_position_source(self, fn):
+        """Register fn() -> Optional[float] giving the camera's position along
+        the slider in [0, 1] (None when unknown)."""
+        self._position_source = fn
+
+    def _position(self) -> Optional[float]:
+        if self._position_source is None:
+            return None
+        try:
+            return self._position_source()
+        except Exception:
+            return None
+
+    def shutdown(self):
+        """Stop any running session and the inference worker process."""
+        self.stop()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self._worker is not None:
+            self._worker.stop()
+            self._worker = None
+        if not _flush_attendance():
+            logger.warning("Attendance writes still pending at shutdown")
+
+    def camera_ids(self) -> list[str]:
+        return [cam_id for cam_id, _ in self.cam_sources]
+
+    def _camera(self, cam_id: Optional[str] = None) -> Optional[_Camera]:
+        cameras = self._cameras
+        if not cameras:
+            return None
+        if cam_id is None:
+            return cameras[0]
+        return next((c for c in cameras if c.id == cam_id), None)
+
+    def get_frame(self, cam_id: Optional[str] = None) -> Optional[bytes]:
+        """Return the latest annotated JPEG frame of a camera (default: the
+        first one), or None if not available."""
+        camera = self._camera(cam_id)
+        if camera is None:
+            return None
+        with camera.frame_lock:
+            return camera.latest_jpeg
 
     def get_status(self) -> dict:
+        scheduler = self._scheduler
+        coverage = self._coverage
+        position = self._position()
+        cameras = self._cameras
         with self._lock:
             return {
                 "state":         self._state,
@@ -620,17 +973,97 @@ class FaceEngine:
                 "started_at":    self._started_at,
                 "stopped_at":    self._stopped_at,
                 "frame_count":   self._frame_count,
-                "fps":           round(self._fps, 1),
+                "capture_count": sum(c.capture_count for c in cameras),
+                "source":        self._sources_label(),
+                "fps":           round(cameras[0].fps, 1) if cameras else 0.0,
+                "cameras":       {c.id: c.get_stats() for c in cameras},
                 "error":         self._error,
+                "stop_reason":   self._stop_reason,
+                "roster":        dict(self._roster),
+                "recognition":   self._recognition_stats_locked(),
+                "stage_ms":      self._stage_means_locked(),
+                "embed_backend": self.embed_backend,
+                "detector":      self.native_detector or self.detector_backend,
+                "trace":         self._trace_path,
                 "embeddings_ok": os.path.exists(EMBEDDINGS_FILE),
                 "firebase_ok":   _db is not None,
                 "firebase_error": _firebase_error,
+                "aggregator":    _aggregator.get_stats() if _aggregator else None,
+                "inference":     self._inference_stats(),
+                "detect_interval_s": round(scheduler.interval_s if scheduler
+                                           else self.detect_interval_s, 3),
+                "adaptive":      scheduler.get_stats() if scheduler else None,
+                "slider_position": round(position, 3) if position is not None else None,
+                "coverage":      coverage.get_stats() if coverage else None,
             }
 
+    def _sources_label(self) -> str:
+        return ", ".join(_source_label(spec) for _, spec in self.cam_sources)
+
+    def _recognition_stats_locked(self) -> dict:
+        st = dict(self._recog_stats)
+        lookups = st.get("cache_hits", 0) + st.get("embeddings", 0)
+        st["cache_hit_rate"] = round(st.get("cache_hits", 0) / lookups, 3) if lookups else 0.0
+        return st
+
+    def _stage_means_locked(self) -> dict:
+        passes = self._recog_stats.get("passes", 0)
+        return {k: round(v / passes, 1) if passes else 0.0
+                for k, v in self._stage_ms.items()}
+
+    def _inference_stats(self) -> dict:
+        if self._worker is not None:
+            return self._worker.get_stats()
+        return {"mode": "thread"}
+
+    def _recognizer_kwargs(self) -> dict:
+        return {
+            "model_name":       self.model_name,
+            "detector_backend": self.detector_backend,
+            "fallback_backend": self.fallback_backend,
+            "detection_scale":  self.detection_scale,
+            "roi_scale":        self.roi_scale,
+            "tile_grid":        self.tile_grid if self.tiled else None,
+            "tile_overlap":     self.tile_overlap,
+            "tile_scale":       self.tile_scale,
+            "tile_workers":     self.tile_workers,
+            "min_face_px":      self.min_face_px,
+            "min_blur":         self.min_blur,
+            "min_confidence":   self.min_det_conf,
+            "max_yaw_deg":      self.max_yaw_deg,
+            "max_embeds":       self.max_embeds,
+            "cache_size":       self.embed_cache_size,
+            "cache_ttl_s":      self.embed_cache_ttl_s,
+            "cache_hamming":    self.embed_cache_hamming,
+            "embed_backend":    self.embed_backend,
+            "embed_model_path": self.embed_model_path,
+            "embed_threads":    self.embed_threads,
+            "native_detector":  self.native_detector,
+            "detector_model_path": self.detector_model_path,
+            "detector_input_size": self.detector_input_size,
+            "detector_threshold":  self.detector_threshold,
+            "detector_align":   self.detector_align,
+        }
+
+    def _ensure_worker(self, slot_bytes: int) -> InferenceWorker:
+        """Spawn the inference worker process once; reuse it across sessions
+        unless its shared-memory slots are too small for the current frames."""
+        if self._worker is not None and self._worker.slot_bytes < slot_bytes:
+            self._worker.stop()
+            self._worker = None
+        if self._worker is None:
+            self._worker = InferenceWorker(
+                recognizer_kwargs=self._recognizer_kwargs(),
+                slot_bytes=slot_bytes,
+                timeout_s=self.worker_timeout_s,
+            )
+            self._worker.start()
+        return self._worker
+
     # ── Frame annotation ──────────────────────────────────────────────────────
 
-    def _store_annotated_frame(self, frame):
-        """Draw bounding boxes + labels on frame and store as JPEG.
+    def _store_annotated_frame(self, camera: _Camera, frame):
+        """Draw bounding boxes + labels on frame and store as camera's JPEG.
 
         Only called after a detection pass or on the preview heartbeat.
         Reuses the last-known face boxes so the display stays live even
@@ -638,14 +1071,21 @@ class FaceEngine:
         """
         if not _CV2_OK:
             return
-        annotated = frame.copy()
+        t0 = time.perf_counter()
+        f = 1.0
+        if self.preview_width and frame.shape[1] > self.preview_width:
+            f = self.preview_width / frame.shape[1]
+            annotated = cv2.resize(frame, (0, 0), fx=f, fy=f, interpolation=cv2.INTER_AREA)
+        else:
+            annotated = frame.copy()
         h, w = annotated.shape[:2]
 
-        with self._frame_lock:
-            boxes = list(self._face_boxes)
+        with camera.frame_lock:
+            boxes = list(camera.face_boxes)
 
         for box in boxes:
-            x, y, bw, bh = box["x"], box["y"], box["w"], box["h"]
+            x, y = int(box["x"] * f), int(box["y"] * f)
+            bw, bh = int(box["w"] * f), int(box["h"] * f)
             label     = box.get("label", "")
             confirmed = box.get("confirmed", False)
 
@@ -672,31 +1112,38 @@ class FaceEngine:
                             font, 0.45, (0, 220, 80), 1, cv2.LINE_AA)
 
         # FPS watermark — uses the encode-rate FPS (updated below)
-        with self._lock:
-            fps = self._fps
-        cv2.putText(annotated, f"{fps:.1f} fps", (8, h - 10),
+        mark = f"{camera.fps:.1f} fps"
+        if len(self._cameras) > 1:
+            mark = f"{camera.id}  {mark}"
+        cv2.putText(annotated, mark, (8, h - 10),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.45, (200, 200, 200), 1, cv2.LINE_AA)
 
         ret, buf = cv2.imencode(".jpg", annotated,
                                 [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        _M_ENCODE.observe(time.perf_counter() - t0)
         if ret:
-            with self._frame_lock:
-                self._latest_jpeg = bytes(buf)
+            with camera.frame_lock:
+                camera.latest_jpeg = bytes(buf)
             # Measure FPS at encode time (true preview output rate, capped at 60)
             now = time.time()
-            dt  = max(now - self._encode_t, 1e-6)
+            dt  = max(now - camera.encode_t, 1e-6)
             instant_fps = min(1.0 / dt, 60.0)
-            self._fps   = self._fps * 0.85 + instant_fps * 0.15
-            self._encode_t = now
+            camera.fps  = camera.fps * 0.85 + instant_fps * 0.15
+            camera.encode_t = now
 
     # ── Capture thread ────────────────────────────────────────────────────────
 
-    def _capture_thread_fn(self, picam2, libcam, cam):
-        """Dedicated capture thread: grab frames as fast as the camera allows
-        and store the latest one in the raw-frame double buffer.
-        Exits when _stop_event is set.
+    def _capture_thread_fn(self, camera: _Camera):
+        """Dedicated capture thread (one per camera): grab frames as fast as
+        the camera allows and store the latest one in its raw-frame buffer.
+        Exits when _stop_event is set or a file source is exhausted.
         """
+        picam2, libcam, cam = camera.picam2, camera.libcam, camera.cap
+        source = camera.kind
         while not self._stop_event.is_set():
+            if camera.exhausted:
+                break
+            t0 = time.perf_counter()
             try:
                 if picam2:
                     rgb = picam2.capture_array("main")
@@ -708,41 +1155,116 @@ class FaceEngine:
                     ok, frame = cam.read()
 
                 if ok and frame is not None:
-                    with self._raw_lock:
-                        self._raw_frame = frame
+                    _M_CAPTURE.observe(time.perf_counter() - t0, source=source)
+                    _M_FRAMES.inc(source=source)
+                    with camera.raw_lock:
+                        camera.raw_frame = frame
+                    camera.capture_count += 1
+                    if camera.recorder is not None:
+                        camera.recorder.maybe_write(frame)
                 else:
                     time.sleep(0.005)
             except Exception as exc:
-                logger.debug("Capture thread error: %s", exc)
+                logger.debug("Capture thread error (%s): %s", camera.id, exc)
                 time.sleep(0.01)
 
     def _run_loop(self):
         try:
-            self._detect_loop()
+            reason = self._detect_loop()
         except Exception as exc:
             logger.exception("Face detection loop crashed: %s", exc)
+            reason = "error"
             with self._lock:
                 self._error = str(exc)
-                self._state = _State.IDLE
-                self._stopped_at = datetime.now().isoformat(timespec="seconds")
-        else:
-            with self._lock:
-                self._state = _State.IDLE
-                self._stopped_at = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            self._state = _State.IDLE
+            self._stop_reason = reason
+            self._stopped_at = datetime.now().isoformat(timespec="seconds")
+            started = datetime.fromisoformat(self._started_at)
+            scan = {
+                "date":        self._session_date,
+                "session":     self._session_id,
+                "sessions":    1,
+                "passes":      self._recog_stats["passes"],
+                "faces":       self._recog_stats["faces"],
+                "embeddings":  self._recog_stats["embeddings"],
+                "duration_s":  round((datetime.now() - started).total_seconds(), 1),
+                "stop_reason": reason,
+            }
+        _report_scan(scan)
+        for fn in list(self._end_listeners):
+            try:
+                fn(reason)
+            except Exception as exc:
+                logger.warning("Session-end listener failed: %s", exc)
 
-    def _detect_loop(self):
-        embs, emb_names, threshold = _load_embeddings()
+    def _early_stop_reason(self, present: set, enrolled: set,
+                           last_confirm_at: float, now: float) -> Optional[str]:
+        """Return "roster_complete" / "plateau" when the scan can end early."""
+        covered = len(present & enrolled)
+        coverage = covered / len(enrolled) if enrolled else 0.0
+        with self._lock:
+            self._roster = {
+                "expected": len(enrolled),
+                "present":  covered,
+                "coverage": round(coverage, 3),
+            }
+        if not self.early_stop or not enrolled:
+            return None
+        if covered == len(enrolled):
+            return "roster_complete"
+        if coverage >= self.early_stop_coverage and now - last_confirm_at >= self.plateau_s:
+            return "plateau"
+        return None
+
+    def _open_trace(self, date: str, threshold: float, emb_names, enrolled: set):
+        if not self.trace_enabled:
+            return None
+        _trace.prune(self.trace_dir, self.trace_keep - 1)
+        path = os.path.join(self.trace_dir,
+                            f"{date}_{datetime.now().strftime('%H%M%S')}.ndjson")
+        try:
+            tr = _trace.SessionTrace(path)
+        except OSError as exc:
+            logger.warning("[Trace] cannot open %s: %s", path, exc)
+            return None
+        tr.record("session", date=date,
+                  started_at=datetime.now().isoformat(timespec="seconds"),
+                  threshold=threshold, adaptive_threshold=ADAPTIVE_THRESHOLD,
+                  min_margin=MIN_MARGIN, vote_required=self.vote_required,
+                  gallery=len(set(emb_names or [])), enrolled=sorted(enrolled),
+                  source=self._sources_label(), embed_backend=self.embed_backend,
+                  mode="tiled" if self.tiled else "roi" if self.roi_mode else "full")
+        with self._lock:
+            self._trace_path = path
+        return tr
+
+    def _open_camera(self, camera: _Camera, cap_w: int, cap_h: int):
+        """Open camera's device: a file source, or Picamera2 → libcamera-vid →
+        OpenCV VideoCapture for a camera index."""
+        if camera.index is None:
+            cam = FileCapture(camera.spec, realtime=self.source_realtime,
+                              loop=self.source_loop, fps=self.source_fps)
+            if not cam.isOpened():
+                raise RuntimeError(f"Camera source cannot be opened: {camera.spec}")
+            camera.cap = cam
+            logger.info("[%s] Using file source %s (%d frames, %s%s)", camera.id, camera.spec,
+                        len(cam), "realtime" if self.source_realtime else "max speed",
+                        ", loop" if self.source_loop else "")
+            return
 
-        picam2 = None
-        libcam = None
-        cam = None
         if _PICAM_OK:
-            picam2 = Picamera2()
+            picam2 = Picamera2(camera.index)
+            if self.tiled and not self.tiled_width:
+                try:
+                    cap_w, cap_h = picam2.sensor_resolution
+                except Exception:
+                    pass
             try:
                 config = picam2.create_preview_configuration(
-                    main={"size": (self.cam_width, self.cam_height), "format": "RGB888"},
+                    main={"size": (cap_w, cap_h), "format": "RGB888"},
                     lores={
-                        "size": (max(160, self.cam_width // 2), max(120, self.cam_height // 2)),
+                        "size": (max(160, cap_w // 2), max(120, cap_h // 2)),
                         "format": "YUV420",
                     },
                     queue=False,
@@ -750,7 +1272,7 @@ class FaceEngine:
                 )
             except Exception:
                 config = picam2.create_preview_configuration(
-                    main={"size": (self.cam_width, self.cam_height), "format": "RGB888"},
+                    main={"size": (cap_w, cap_h), "format": "RGB888"},
                     queue=False,
                     buffer_count=2,
                 )
@@ -767,162 +1289,152 @@ class FaceEngine:
                 })
             except Exception as exc:
                 logger.debug("Picamera2 controls not fully applied: %s", exc)
-            logger.info("Using PiCamera2 @ %dx%d/%dfps", self.cam_width, self.cam_height, self.cam_fps)
-        elif _LIBCAM_OK:
-            libcam = _LibcameraCapture(width=self.cam_width, height=self.cam_height, fps=self.cam_fps)
-            if not libcam.isOpened():
-                logger.warning("libcamera-vid subprocess failed; falling back to V4L2")
-                libcam.release()
-                libcam = None
-            else:
+            camera.picam2 = picam2
+            logger.info("[%s] Using PiCamera2 #%d @ %dx%d/%dfps",
+                        camera.id, camera.index, cap_w, cap_h, self.cam_fps)
+            return
+
+        if _LIBCAM_OK:
+            libcam = _LibcameraCapture(width=cap_w, height=cap_h, fps=self.cam_fps,
+                                       camera=camera.index)
+            if libcam.isOpened():
+                camera.libcam = libcam
                 logger.info(
-                    "Using libcamera-vid subprocess (%s) @ %dx%d/%dfps",
-                    _LIBCAM_BIN, self.cam_width, self.cam_height, self.cam_fps,
+                    "[%s] Using libcamera-vid subprocess (%s) #%d @ %dx%d/%dfps",
+                    camera.id, _LIBCAM_BIN, camera.index, cap_w, cap_h, self.cam_fps,
                 )
+                return
+            logger.warning("libcamera-vid subprocess failed; falling back to V4L2")
+            libcam.release()
+
+        if sys.platform == "win32":
+            backend = cv2.CAP_DSHOW
+            backend_name = "DirectShow"
+        elif hasattr(cv2, "CAP_V4L2"):
+            backend = cv2.CAP_V4L2
+            backend_name = "V4L2"
+        else:
+            backend = cv2.CAP_ANY
+            backend_name = "CAP_ANY"
+        cam = cv2.VideoCapture(camera.index, backend)
+        if not cam.isOpened():
+            cam = cv2.VideoCapture(camera.index)
+            backend_name += "(fallback)"
+        cam.set(cv2.CAP_PROP_FRAME_WIDTH, cap_w)
+        cam.set(cv2.CAP_PROP_FRAME_HEIGHT, cap_h)
+        cam.set(cv2.CAP_PROP_FPS, self.cam_fps)
+        cam.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        camera.cap = cam
+        logger.info(
+            "[%s] Using OpenCV VideoCapture(%d) via %s @ %dx%d/%dfps",
+            camera.id, camera.index, backend_name, cap_w, cap_h, self.cam_fps,
+        )
 
-        if not picam2 and not libcam:
-            if sys.platform == "win32":
-                backend = cv2.CAP_DSHOW
-                backend_name = "DirectShow"
-            elif hasattr(cv2, "CAP_V4L2"):
-                backend = cv2.CAP_V4L2
-                backend_name = "V4L2"
-            else:
-                backend = cv2.CAP_ANY
-                backend_name = "CAP_ANY"
-            cam = cv2.VideoCapture(0, backend)
-            if not cam.isOpened():
-                cam = cv2.VideoCapture(0)
-                backend_name += "(fallback)"
-            cam.set(cv2.CAP_PROP_FRAME_WIDTH, self.cam_width)
-            cam.set(cv2.CAP_PROP_FRAME_HEIGHT, self.cam_height)
-            cam.set(cv2.CAP_PROP_FPS, self.cam_fps)
-            cam.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-            logger.info(
-                "Using OpenCV VideoCapture(0) via %s @ %dx%d/%dfps",
-                backend_name, self.cam_width, self.cam_height, self.cam_fps,
-            )
+    def _detect_loop(self) -> str:
+        """Run one session; return why it ended (manual, max_duration,
+        roster_complete, plateau or source_ended).
 
-        self._raw_frame = None
-        cap_thread = threading.Thread(
-            target=self._capture_thread_fn,
-            args=(picam2, libcam, cam),
-            daemon=True,
-            name="cam-capture",
-        )
-        cap_thread.start()
+        Every camera has its own capture thread, preview and pacing, but all
+        of them share one Recognizer (or inference worker) with one pass in
+        flight at a time.  When it is free, the camera that is due and was
+        served longest ago goes next, so a busy camera cannot starve the
+        others.  Votes are counted per roll number, whichever camera saw the
+        face.
+        """
+        embs, emb_names, threshold = _load_embeddings()
+
+        cap_w, cap_h = self.cam_width, self.cam_height
+        if self.tiled:
+            cap_w = self.tiled_width or 1920
+            cap_h = self.tiled_height or 1080
+
+        cameras = [_Camera(cam_id, spec) for cam_id, spec in self.cam_sources]
+        try:
+            for camera in cameras:
+                self._open_camera(camera, cap_w, cap_h)
+        except Exception:
+            for camera in cameras:
+                camera.release()
+            raise
+
+        if self.record_dir:
+            with self._lock:
+                stamp = f"{self._session_date}_{datetime.now().strftime('%H%M%S')}"
+            for camera in cameras:
+                if camera.index is None:
+                    continue                    # never re-record a file source
+                name = stamp if len(cameras) == 1 else f"{stamp}_{camera.id}"
+                camera.recorder = FrameRecorder(os.path.join(self.record_dir, name),
+                                                self.record_fps)
+                logger.info("[%s] Recording frames to %s @ %.1f fps",
+                            camera.id, camera.recorder.directory, self.record_fps)
+
+        primary = cameras[0]                    # the camera on the slider
+        for camera in cameras:
+            camera.scheduler = AdaptiveScheduler(self.detect_interval_s, enabled=self.adaptive)
+            camera.thread = threading.Thread(
+                target=self._capture_thread_fn,
+                args=(camera,),
+                daemon=True,
+                name=f"cam-capture-{camera.id}",
+            )
+        self._scheduler = primary.scheduler
+        self._cameras = cameras
+        for camera in cameras:
+            camera.thread.start()
 
         for _ in range(100):
-            with self._raw_lock:
-                if self._raw_frame is not None:
-                    break
+            if all(c.latest() is not None for c in cameras):
+                break
             time.sleep(0.01)
+        # Size worker slots from what the sources actually deliver
+        delivered = [f.nbytes for f in (c.latest() for c in cameras) if f is not None]
+        slot_bytes = max(delivered or [cap_w * cap_h * 3])
 
         votes: dict[str, int] = {}
         present_set: set[str] = set()
         frame_idx = 0
-        next_preview_at = time.time()
-        next_detect_at = time.time()
         deadline = time.time() + self.max_duration_s
-        detect_future: Optional[Future] = None
+        # (camera, future, started_at, slider position) of the pass in flight
+        inflight: Optional[tuple] = None
+        coverage = CoverageMap(self.position_bins, self.position_revisit_s)
+        self._coverage = coverage
+        now = time.time()
+        for camera in cameras:
+            camera.next_detect_at = camera.next_preview_at = now
 
         with self._lock:
             date = self._session_date
         roll_to_name = {s["rollNo"]: s["name"] for s in _STUDENTS}
-
-        def _run_detection(small_frame, scale):
+        # Only students with gallery embeddings can ever be confirmed, so the
+        # coverage target is the enrolled part of the roster.
+        enrolled = {r for r in map(_detected_name_to_roll, set(emb_names or [])) if r}
+        if roll_to_name:
+            enrolled &= set(roll_to_name)
+        last_confirm_at = time.time()
+        stop_reason: Optional[str] = None
+        trace = self._open_trace(date, threshold, emb_names, enrolled)
+
+        recognizer = Recognizer(**self._recognizer_kwargs())
+        confirmed_names: set[str] = set()   # pkl names whose roll is present
+        pass_idx = 0
+        recognizer.set_gallery(embs, emb_names, threshold)
+        worker = None
+        if self.inference_process:
             try:
-                faces = DeepFace.extract_faces(
-                    img_path=small_frame,
-                    detector_backend=self.detector_backend,
-                    enforce_detection=False,
-                    align=True,
-                )
-            except Exception:
-                try:
-                    faces = DeepFace.extract_faces(
-                        img_path=small_frame,
-                        detector_backend=self.fallback_backend,
-                        enforce_detection=False,
-                        align=True,
-                    )
-                except Exception:
-                    faces = []
-
-            out = []
-            for face_obj in faces:
-                fa = face_obj.get("facial_area") or {}
-                if not fa:
-                    continue
-
-                detected_name = "Unknown"
-                roll = None
-                face = face_obj.get("face")
-
-                if (face is not None) and embs is not None and embs.size > 0 and emb_names:
-                    try:
-                        reps = DeepFace.represent(
-                            img_path=face,
-                            model_name=self.model_name,
-                            detector_backend="skip",
-                            enforce_detection=False,
-                            align=False,
-                        )
-                    except Exception as _rep_exc:
-                        logger.warning("[Recog] DeepFace.represent error: %s", _rep_exc)
-                        reps = []
-
-                    if reps:
-                        vec = np.asarray(reps[0].get("embedding"), dtype=np.float32)
-                        norm = np.linalg.norm(vec)
-                        if norm:
-                            vec = vec / norm
-
-                        distances = 1.0 - np.dot(embs, vec)
-                        best_per_n: dict[str, float] = {}
-                        for i, dist in enumerate(distances):
-                            person = emb_names[i]
-                            if person not in best_per_n or dist < best_per_n[person]:
-                                best_per_n[person] = float(dist)
-
-                        sorted_c = sorted(best_per_n.items(), key=lambda x: x[1])
-                        if sorted_c:
-                            best_name, best_dist = sorted_c[0]
-                            second_dist = sorted_c[1][1] if len(sorted_c) > 1 else 1.0
-                            margin = second_dist - best_dist
-                            adaptive_thresh = threshold
-                            # Widen threshold to 0.52 whenever the match is reasonably
-                            # confident (margin >= 0.02 already filters weak matches below).
-                            if best_dist < 0.52 and margin >= 0.02:
-                                adaptive_thresh = 0.52
-                            logger.info(
-                                "[Recog] best=%s dist=%.3f thresh=%.2f margin=%.3f → %s",
-                                best_name, best_dist, adaptive_thresh, margin,
-                                "ACCEPT" if (best_dist < adaptive_thresh and margin >= 0.02) else "REJECT",
-                            )
-                            if best_dist < adaptive_thresh and margin >= 0.02:
-                                detected_name = best_name
-                                roll = _detected_name_to_roll(detected_name)
-
-                out.append({
-                    "x": int(fa.get("x", 0) * scale),
-                    "y": int(fa.get("y", 0) * scale),
-                    "w": int(fa.get("w", 50) * scale),
-                    "h": int(fa.get("h", 50) * scale),
-                    "detected_name": detected_name,
-                    "roll": roll,
-                })
-
-            return out
+                worker = self._ensure_worker(slot_bytes)
+                worker.set_gallery(embs, emb_names, threshold)
+            except Exception as exc:
+                logger.error("[Worker] Could not start inference process, "
+                             "using in-process detection: %s", exc)
+                worker = None
 
         executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="deepface")
 
         try:
             while not self._stop_event.is_set() and time.time() < deadline:
-                with self._raw_lock:
-                    frame = self._raw_frame
-
-                if frame is None:
+                latest = {c.id: c.latest() for c in cameras}
+                if all(f is None for f in latest.values()):
                     time.sleep(0.005)
                     continue
 
@@ -930,31 +1442,89 @@ class FaceEngine:
                 with self._lock:
                     self._frame_count = frame_idx
 
-                if detect_future is not None and detect_future.done():
+                if inflight is not None and inflight[1].done():
+                    camera, detect_future, detect_started_at, detect_position = inflight
+                    inflight = None
+                    frame = latest[camera.id]
                     try:
-                        detections = detect_future.result()
+                        result = detect_future.result()
                     except Exception as exc:
-                        logger.warning("Detection task raised: %s", exc)
-                        detections = []
-                    detect_future = None
+                        logger.warning("Detection task raised (%s): %s", camera.id, exc)
+                        result = {"faces": []}
+                    detections = result["faces"]
+                    camera.last_boxes = detections
+                    camera.result_at = time.time()
+                    camera.record_pass((camera.result_at - detect_started_at) * 1000.0,
+                                       len(detections))
+                    with self._lock:
+                        st = self._recog_stats
+                        st["passes"] += 1
+                        st["roi_passes"] += result.get("mode") == "roi"
+                        st["faces"] += len(detections)
+                        for key in ("embeddings", "cache_hits", "gated", "reused"):
+                            st[key] += result.get(key, 0)
+                        for key, ms in result.get("timings", {}).items():
+                            self._stage_ms[key] = self._stage_ms.get(key, 0.0) + ms
+                    for key, ms in result.get("timings", {}).items():
+                        _M_STAGE.observe(ms / 1000.0, stage=key.replace("_ms", ""))
+                    _M_PASS.observe(time.time() - detect_started_at,
+                                    mode=result.get("mode", "error"))
+                    _M_FACES.inc(len(detections), outcome="detected")
+                    _M_FACES.inc(result.get("embeddings", 0), outcome="embedded")
+                    _M_FACES.inc(result.get("cache_hits", 0), outcome="cached")
+                    _M_FACES.inc(result.get("gated", 0), outcome="gated")
+                    _M_FACES.inc(result.get("reused", 0), outcome="reused")
+
+                    for det in detections:
+                        name = det.get("detected_name") or "Unknown"
+                        det["roll"] = _detected_name_to_roll(name) if name != "Unknown" else None
+                    if trace is not None:
+                        trace.record(
+                            "pass", seq=pass_idx, cam=camera.id, mode=result.get("mode"),
+                            lat_ms=round((time.time() - detect_started_at) * 1000.0, 1),
+                            timings={k: round(v, 1) for k, v in result.get("timings", {}).items()},
+                            pos=detect_position,
+                            faces=[{
+                                "b":  [det["x"], det["y"], det["w"], det["h"]],
+                                "n":  det.get("detected_name"),
+                                "r":  det["roll"],
+                                "q":  det.get("quality"),
+                                "bn": det.get("best_name"),
+                                "br": (_detected_name_to_roll(det["best_name"])
+                                       if det.get("best_name") else None),
+                                "d1": det.get("best_dist"),
+                                "d2": det.get("second_dist"),
+                            } for det in detections])
 
                     for det in detections:
                         roll = det.get("roll")
-                        if not roll or roll in present_set:
+                        if not roll:
+                            continue
+                        if roll in present_set:
+                            confirmed_names.add(det["detected_name"])
                             continue
 
                         detected_name = det.get("detected_name") or "Unknown"
                         votes[roll] = votes.get(roll, 0) + 1
+                        if trace is not None:
+                            trace.record("vote", r=roll, v=votes[roll], cam=camera.id)
                         logger.info(
-                            "[Vote] %d/%d for %s (%s) | present_set=%s",
+                            "[Vote] %d/%d for %s (%s) via %s | present_set=%s",
                             votes[roll], self.vote_required, detected_name, roll,
-                            list(present_set),
+                            camera.id, list(present_set),
                         )
 
                         if votes[roll] >= self.vote_required:
                             present_set.add(roll)
+                            confirmed_names.add(detected_name)
+                            last_confirm_at = time.time()
+                            camera.confirmed += 1
+                            _M_CONFIRM.inc()
+                            if trace is not None:
+                                trace.record("confirm", r=roll, cam=camera.id)
                             s_name = roll_to_name.get(roll, detected_name)
-                            _mark_present_firebase(date, roll, s_name)
+                            _report_present(date, roll, s_name, det.get("best_dist"),
+                                            camera.id)
                             with self._lock:
                                 if roll not in self._detected_so_far:
                                     self._detected_so_far.append(roll)
@@ -978,45 +1548,108 @@ class FaceEngine:
                             "label": label,
                             "confirmed": confirmed,
                         })
-                    with self._frame_lock:
-                        self._face_boxes = boxes
-
-                    self._store_annotated_frame(frame)
-                    next_preview_at = time.time()
+                    with camera.frame_lock:
+                        camera.face_boxes = boxes
+
+                    pending = sum(1 for det in detections
+                                  if det.get("roll") and det["roll"] not in present_set)
+                    # Only enrolled students still collecting votes keep a
+                    # bin interesting; Unknown faces never get confirmed.
+                    unconfirmed = sum(1 for det in detections
+                                      if det.get("roll") in enrolled
+                                      and det["roll"] not in present_set)
+                    for det in detections:
+                        det["position"] = detect_position
+                    coverage.record(detect_position, len(detections), unconfirmed, time.time())
+                    camera.scheduler.record_pass(time.time() - detect_started_at,
+                                                 len(detections), pending)
+
+                    if frame is not None:
+                        self._store_annotated_frame(camera, frame)
+                    camera.next_preview_at = time.time()
+
+                    stop_reason = self._early_stop_reason(
+                        present_set, enrolled, last_confirm_at, time.time())
+                    if stop_reason:
+                        logger.info("Ending session early (%s): %d/%d enrolled present",
+                                    stop_reason, len(present_set & enrolled), len(enrolled))
+                        break
+
+                if inflight is None and all(c.exhausted for c in cameras):
+                    stop_reason = "source_ended"
+                    break
 
                 now = time.time()
-                if detect_future is None and now >= next_detect_at:
-                    scale = 1.0 / self.detection_scale if self.detection_scale != 1.0 else 1.0
-                    if self.detection_scale != 1.0:
-                        small = cv2.resize(
-                            frame, (0, 0),
-                            fx=self.detection_scale,
-                            fy=self.detection_scale,
-                            interpolation=cv2.INTER_LINEAR,
-                        )
-                    else:
-                        small = frame
-                    detect_future = executor.submit(_run_detection, small, scale)
-                    next_detect_at = now + max(0.10, self.detect_interval_s)
-                elif now >= next_preview_at:
-                    self._store_annotated_frame(frame)
-                    next_preview_at = now + (1.0 / max(self.preview_fps, 1.0))
+                started = None
+                if inflight is None:
+                    for camera in sorted(cameras, key=lambda c: c.last_served):
+                        frame = latest[camera.id]
+                        if frame is None or now < camera.next_detect_at:
+                            continue
+                        position = self._position() if camera is primary else None
+                        if (camera.scheduler.should_skip(frame, now)
+                                or not coverage.should_visit(position, now)):
+                            camera.next_detect_at = now + camera.scheduler.min_interval_s
+                            continue
+                        regions = None
+                        if (self.roi_mode and camera.last_boxes
+                                and camera.pass_idx % self.roi_full_every):
+                            regions = plan_regions(camera.last_boxes, frame.shape, self.roi_pad)
+                        pass_idx += 1
+                        camera.pass_idx += 1
+                        detect_future = None
+                        if worker is not None:
+                            try:
+                                detect_future = worker.submit(frame, confirmed_names, regions,
+                                                              camera.id)
+                            except (ValueError, RuntimeError) as exc:
+                                logger.debug("[Worker] submit failed, running in-process: %s", exc)
+                        if detect_future is None:
+                            detect_future = executor.submit(
+                                recognizer.run, frame, set(confirmed_names), regions, camera.id)
+                        # Time the camera was ready but the model busy elsewhere
+                        camera.record_wait(
+                            max(0.0, now - max(camera.next_detect_at, camera.result_at)) * 1000.0)
+                        camera.last_served = now
+                        inflight = (camera, detect_future, now, position)
+                        camera.next_detect_at = now + camera.scheduler.on_pass_started(frame, now)
+                        started = camera
+                        break
+
+                for camera in cameras:
+                    frame = latest[camera.id]
+                    if frame is None or camera is started or now < camera.next_preview_at:
+                        continue
+                    self._store_annotated_frame(camera, frame)
+                    camera.next_preview_at = now + (1.0 / max(self.preview_fps, 1.0))
 
                 time.sleep(0.001)
 
+            if stop_reason is None:
+                stop_reason = "manual" if self._stop_event.is_set() else "max_duration"
+
         finally:
             self._stop_event.set()
             executor.shutdown(wait=False)
-            cap_thread.join(timeout=3)
-            if cam:
-                cam.release()
-            if libcam:
-                libcam.release()
-            if picam2:
-                picam2.stop()
-            logger.info("Detection session ended. Confirmed present: %s", list(present_set))
+            for camera in cameras:
+                camera.thread.join(timeout=3)
+            for camera in cameras:
+                camera.release()
+            if trace is not None:
+                trace.close(reason=stop_reason or "error", present=sorted(present_set))
+            logger.info("Detection session ended (%s). Confirmed present: %s",
+                        stop_reason, list(present_set))
+        return stop_reason
 engine = FaceEngine()
 
+metrics.gauge("face_engine_running", "1 while a detection session is active",
+              fn=lambda: engine._state == _State.RUNNING)
+metrics.gauge("face_engine_preview_fps", "Live preview encode rate of the first camera",
+              fn=lambda: engine._cameras[0].fps if engine._cameras else 0.0)
+metrics.gauge("face_engine_detect_interval_seconds", "Current gap between detection passes",
+              fn=lambda: engine._scheduler.interval_s if engine._scheduler
+              else engine.detect_interval_s)
+
 
 # ── Pre-warm ArcFace model in background so first scan has no download delay ──
 def _prewarm_arcface():
@@ -0,0 +1,160 @@
+"""
+file_capture.py
+───────────────
+File-backed camera source and frame recorder for FaceEngine.
+
+FileCapture plays back either a directory of JPEG/PNG frames or a video file
+(MJPEG, MP4, … anything cv2.VideoCapture can open) through the same
+isOpened() / read() / release() interface as cv2.VideoCapture and
+_LibcameraCapture, so _detect_loop can run without a camera (CAM_SOURCE).
+
+  • realtime  – frames are released at their original pace: the timestamp
+                embedded in recorded file names (…_t<ms>.jpg), else the
+                video's FPS, else the fps argument
+  • max speed – realtime=False decodes as fast as possible (benchmarks)
+  • loop      – restart at the end instead of reporting exhaustion
+
+FrameRecorder writes frames from a live session in the format FileCapture
+replays (CAM_RECORD_DIR), throttled to a few frames per second.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import time
+from typing import Optional
+
+logger = logging.getLogger("face_engine")
+
+try:
+    import cv2                          # type: ignore
+    _CV2_OK = True
+except ImportError:
+    _CV2_OK = False
+
+_IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+_STAMP_RE   = re.compile(r"_t(\d+)\.[^.]+$")
+
+
+class FileCapture:
+    """Replay recorded frames as if they came from a camera."""
+
+    def __init__(self, source: str, realtime: bool = True, loop: bool = False,
+                 fps: float = 0.0):
+        self.source   = source
+        self.realtime = realtime
+        self.loop     = loop
+        self.exhausted = False
+        self._files: list[str] = []
+        self._stamps: list[Optional[float]] = []
+        self._video = None
+        self._idx = 0
+        self._t0: Optional[float] = None
+        self._fps = fps
+
+        if os.path.isdir(source):
+            names = sorted(n for n in os.listdir(source) if n.lower().endswith(_IMAGE_EXTS))
+            self._files = [os.path.join(source, n) for n in names]
+            for n in names:
+                m = _STAMP_RE.search(n)
+                self._stamps.append(int(m.group(1)) / 1000.0 if m else None)
+            if not all(s is not None for s in self._stamps):
+                self._stamps = []
+            self._opened = bool(self._files)
+        elif _CV2_OK:
+            self._video = cv2.VideoCapture(source)
+            self._opened = self._video.isOpened()
+            if self._opened and not self._fps:
+                self._fps = self._video.get(cv2.CAP_PROP_FPS) or 0.0
+        else:
+            self._opened = False
+        self._fps = self._fps or 30.0
+
+        if not self._opened:
+            logger.error("[Source] Cannot open frame source: %s", source)
+
+    def isOpened(self) -> bool:
+        return self._opened
+
+    def __len__(self) -> int:
+        if self._video is not None:
+            return int(self._video.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        return len(self._files)
+
+    def _due_at(self, idx: int) -> float:
+        """Seconds after playback start at which frame idx is shown."""
+        if self._stamps:
+            return self._stamps[idx] - self._stamps[0]
+        return idx / self._fps
+
+    def _rewind(self) -> bool:
+        if not self.loop:
+            self.exhausted = True
+            return False
+        self._idx = 0
+        self._t0 = None
+        if self._video is not None:
+            self._video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        return True
+
+    def read(self):
+        """Return (ok, bgr_frame) like cv2.VideoCapture.read()."""
+        if not self._opened or self.exhausted:
+            return False, None
+
+        if self._files and self._idx >= len(self._files) and not self._rewind():
+            return False, None
+
+        if self.realtime:
+            now = time.monotonic()
+            if self._t0 is None:
+                self._t0 = now
+            wait = self._t0 + self._due_at(self._idx) - now
+            if wait > 0:
+                time.sleep(wait)
+
+        if self._video is not None:
+            ok, frame = self._video.read()
+            if not ok:
+                if not self._rewind():
+                    return False, None
+                ok, frame = self._video.read()
+        else:
+            frame = cv2.imread(self._files[self._idx], cv2.IMREAD_COLOR)
+            ok = frame is not None
+        self._idx += 1
+        return ok, frame
+
+    def release(self):
+        self._opened = False
+        if self._video is not None:
+            self._video.release()
+
+
+class FrameRecorder:
+    """Write every 1/fps-th captured frame as <dir>/frame_<n>_t<ms>.jpg."""
+
+    def __init__(self, directory: str, fps: float = 2.0, quality: int = 90):
+        self.directory = directory
+        self._period   = 1.0 / fps if fps > 0 else 0.0
+        self._quality  = quality
+        self._t0: Optional[float] = None
+        self._next_at  = 0.0
+        self.written   = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def maybe_write(self, frame) -> bool:
+        now = time.monotonic()
+        if self._t0 is None:
+            self._t0 = now
+        if now < self._next_at:
+            return False
+        self._next_at = now + self._period
+        ms = int((now - self._t0) * 1000.0)
+        path = os.path.join(self.directory, f"frame_{self.written:06d}_t{ms:08d}.jpg")
+        if cv2.imwrite(path, frame, [cv2.IMWRITE_JPEG_QUALITY, self._quality]):
+            self.written += 1
+            return True
+        return False
@@ -0,0 +1,370 @@
+"""
+inference_worker.py
+───────────────────
+Optional out-of-process inference for FaceEngine (CAM_INFERENCE_PROCESS=1).
+
+TensorFlow/DeepFace run in a spawned child process so their thread pools and
+the GIL no longer compete with Flask, GPIO callbacks and APScheduler.
+
+  • Frames are handed over through multiprocessing.shared_memory slots — the
+    parent copies the BGR array into a free slot and only sends
+    (seq, slot, shape, dtype) over the request queue; no ndarray pickling.
+  • Detections come back as small dicts over a result queue and resolve a
+    concurrent.futures.Future, so the detect loop treats the worker exactly
+    like the in-process ThreadPoolExecutor.
+  • A receiver thread watches the child; if it dies or a request exceeds the
+    timeout, pending futures fail and the child is respawned (gallery is
+    re-sent automatically).  submit() raises while the respawn is under way,
+    so callers fall back to in-process inference instead of queueing frames
+    for a dead child.  The timeout only runs once the child has reported
+    ready — model warm-up on a slow Pi is not a hang.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import logging
+import multiprocessing as mp
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger("face_engine")
+
+_EWMA = 0.2          # smoothing factor for latency metrics
+_RESTART_DELAY_S = 1.0
+
+
+# ── Child process ─────────────────────────────────────────────────────────────
+
+def _worker_main(req_q, res_q, slot_names: list[str], recognizer_kwargs: dict):
+    """Entry point of the inference child process."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)   # parent owns shutdown
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO"),
+        format="%(asctime)s [%(levelname)s] [worker] %(message)s",
+    )
+
+    from model.recognition import Recognizer
+
+    slots = [shared_memory.SharedMemory(name=n) for n in slot_names]
+    rec = Recognizer(**recognizer_kwargs)
+    res_q.put(("ready", os.getpid()))
+
+    try:
+        while True:
+            msg = req_q.get()
+            if msg is None:
+                break
+            kind = msg[0]
+            if kind == "gallery":
+                _, embs, names, threshold = msg
+                rec.set_gallery(embs, names, threshold)
+                continue
+            if kind != "frame":
+                continue
+
+            _, seq, slot, shape, dtype, skip_names, regions, stream = msg
+            t0 = time.perf_counter()
+            try:
+                frame = np.ndarray(shape, dtype=np.dtype(dtype), buffer=slots[slot].buf)
+                result = rec.run(frame, skip_names, regions, stream)
+                del frame
+                res_q.put(("result", seq, result, (time.perf_counter() - t0) * 1000.0))
+            except Exception as exc:
+                res_q.put(("error", seq, repr(exc), (time.perf_counter() - t0) * 1000.0))
+    finally:
+        for shm in slots:
+            shm.close()
+
+
+@contextlib.contextmanager
+def _main_module_hidden():
+    """Stop the spawn start method from re-importing __main__ in the child.
+
+    app.py configures GPIO, relays and APScheduler at import time; running
+    that a second time inside the inference process would grab the pins
+    again.  The worker only needs model.recognition, so the main module's
+    path is hidden while Process.start() captures its preparation data.
+    """
+    main = sys.modules.get("__main__")
+    if main is None:
+        yield
+        return
+    saved = {k: main.__dict__[k] for k in ("__file__", "__spec__") if k in main.__dict__}
+    main.__dict__.pop("__file__", None)
+    main.__spec__ = None
+    try:
+        yield
+    finally:
+        main.__dict__.update(saved)
+
+
+# ── Parent-side handle ────────────────────────────────────────────────────────
+
+class InferenceWorker:
+    """Owns the child process, its shared-memory slots and the result pump."""
+
+    def __init__(self, recognizer_kwargs: dict, slot_bytes: int,
+                 slots: int = 2, timeout_s: float = 30.0):
+        self._recognizer_kwargs = dict(recognizer_kwargs)
+        self._slot_bytes = int(slot_bytes)
+        self._n_slots    = max(1, int(slots))
+        self._timeout_s  = float(timeout_s)
+        self._ctx        = mp.get_context("spawn")   # never fork a TF/GPIO process
+
+        self._lock = threading.Lock()
+        self._proc = None
+        self._req_q = None
+        self._res_q = None
+        self._shms: list[shared_memory.SharedMemory] = []
+        self._free_slots: queue.Queue = queue.Queue()
+        self._pending: dict[int, tuple[Future, int, float]] = {}   # seq → (future, slot, t_submit)
+        self._seq = 0
+        self._gallery: Optional[tuple] = None
+        self._running = False
+        self._restarting = False
+        self._rx_thread: Optional[threading.Thread] = None
+
+        # Metrics
+        self._ready     = False
+        self._ready_at  = 0.0         # perf_counter() of the child's "ready"
+        self._pid: Optional[int] = None
+        self._restarts  = 0
+        self._completed = 0
+        self._failed    = 0
+        self._roundtrip_ms = 0.0
+        self._worker_ms    = 0.0
+        self._copy_ms      = 0.0
+        self._last_error: Optional[str] = None
+
+    # ── Lifecycle ─────────────────────────────────────────────────────────────
+
+    def start(self):
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self._shms = [
+                shared_memory.SharedMemory(create=True, size=self._slot_bytes)
+                for _ in range(self._n_slots)
+            ]
+            for i in range(self._n_slots):
+                self._free_slots.put(i)
+            self._spawn_locked()
+
+        self._rx_thread = threading.Thread(
+            target=self._rx_loop, daemon=True, name="inference-rx"
+        )
+        self._rx_thread.start()
+
+    def stop(self):
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            proc, req_q = self._proc, self._req_q
+        try:
+            req_q.put(None)
+            proc.join(timeout=3)
+        except Exception:
+            pass
+        if proc.is_alive():
+            proc.terminate()
+            proc.join(timeout=2)
+        if self._rx_thread is not None:
+            self._rx_thread.join(timeout=2)
+        with self._lock:
+            self._fail_pending_locked(RuntimeError("inference worker stopped"))
+            for shm in self._shms:
+                try:
+                    shm.close()
+                    shm.unlink()
+                except Exception:
+                    pass
+            self._shms = []
+        logger.info("[Worker] Inference worker stopped")
+
+    def _spawn_locked(self):
+        self._req_q = self._ctx.Queue()
+        self._res_q = self._ctx.Queue()
+        self._ready = False
+        self._proc = self._ctx.Process(
+            target=_worker_main,
+            args=(self._req_q, self._res_q,
+                  [s.name for s in self._shms], self._recognizer_kwargs),
+            daemon=True,
+            name="face-inference",
+        )
+        with _main_module_hidden():
+            self._proc.start()
+        self._pid = self._proc.pid
+        if self._gallery is not None:
+            self._req_q.put(("gallery",) + self._gallery)
+        logger.info("[Worker] Inference worker spawned (pid=%s)", self._pid)
+
+    def _restart(self, reason: str):
+        with self._lock:
+            if not self._running:
+                return
+            logger.error("[Worker] Restarting inference worker: %s", reason)
+            proc = self._proc
+            self._restarting = True
+            self._last_error = reason
+            self._restarts += 1
+            self._fail_pending_locked(RuntimeError(f"inference worker restarted: {reason}"))
+        if proc.is_alive():
+            proc.kill()
+        proc.join(timeout=2)
+        time.sleep(_RESTART_DELAY_S)
+        with self._lock:
+            if self._running:
+                self._spawn_locked()
+            self._restarting = False
+
+    def _fail_pending_locked(self, exc: Exception):
+        for fut, slot, _ in self._pending.values():
+            self._free_slots.put(slot)
+            self._failed += 1
+            if not fut.done():
+                fut.set_exception(exc)
+        self._pending.clear()
+
+    # ── Requests ──────────────────────────────────────────────────────────────
+
+    def set_gallery(self, embs, names, threshold):
+        """Send gallery embeddings to the child (kept and re-sent on restart)."""
+        with self._lock:
+            self._gallery = (embs, list(names or []), float(threshold))
+            if self._running:
+                self._req_q.put(("gallery",) + self._gallery)
+
+    def submit(self, frame: np.ndarray, skip_names=(), regions=None, stream=None) -> Future:
+        """Copy frame into a free slot and queue it for inference.
+
+        Raises ValueError if the frame does not fit a slot and RuntimeError if
+        the worker is not running or every slot is busy.
+        """
+        if frame.nbytes > self._slot_bytes:
+            raise ValueError(f"frame of {frame.nbytes} bytes exceeds slot size {self._slot_bytes}")
+        try:
+            slot = self._free_slots.get_nowait()
+        except queue.Empty:
+            raise RuntimeError("no free inference slot") from None
+
+        with self._lock:
+            if not self._running or self._restarting:
+                self._free_slots.put(slot)
+                raise RuntimeError("inference worker not running" if not self._running
+                                   else "inference worker restarting")
+            t0 = time.perf_counter()
+            view = np.ndarray(frame.shape, dtype=frame.dtype, buffer=self._shms[slot].buf)
+            view[...] = frame
+            del view
+            copy_ms = (time.perf_counter() - t0) * 1000.0
+            self._copy_ms = self._copy_ms * (1 - _EWMA) + copy_ms * _EWMA
+
+            self._seq += 1
+            seq = self._seq
+            fut: Future = Future()
+            self._pending[seq] = (fut, slot, t0)
+            self._req_q.put(("frame", seq, slot, frame.shape, frame.dtype.str,
+                             tuple(skip_names), regions, stream))
+        return fut
+
+    # ── Result pump ───────────────────────────────────────────────────────────
+
+    def _rx_loop(self):
+        while True:
+            with self._lock:
+                if not self._running:
+                    return
+                res_q, proc = self._res_q, self._proc
+            try:
+                msg = res_q.get(timeout=0.25)
+            except queue.Empty:
+                msg = None
+            except (EOFError, OSError) as exc:
+                self._restart(f"result queue broken: {exc}")
+                continue
+
+            if msg is None:
+                if not proc.is_alive():
+                    self._restart(f"process exited with code {proc.exitcode}")
+                elif self._oldest_pending_age() > self._timeout_s:
+                    self._restart(f"request exceeded {self._timeout_s:.0f}s timeout")
+                continue
+
+            kind = msg[0]
+            if kind == "ready":
+                with self._lock:
+                    self._ready = True
+                    self._ready_at = time.perf_counter()
+                logger.info("[Worker] Inference worker ready (pid=%s)", msg[1])
+                continue
+
+            _, seq, payload, worker_ms = msg
+            with self._lock:
+                entry = self._pending.pop(seq, None)
+                if entry is None:
+                    continue
+                fut, slot, t_submit = entry
+                self._free_slots.put(slot)
+                rtt_ms = (time.perf_counter() - t_submit) * 1000.0
+                self._roundtrip_ms = self._roundtrip_ms * (1 - _EWMA) + rtt_ms * _EWMA
+                self._worker_ms    = self._worker_ms * (1 - _EWMA) + worker_ms * _EWMA
+                if kind == "result":
+                    self._completed += 1
+                else:
+                    self._failed += 1
+                    self._last_error = payload
+            if kind == "result":
+                fut.set_result(payload)
+            else:
+                fut.set_exception(RuntimeError(payload))
+
+    def _oldest_pending_age(self) -> float:
+        """Age of the oldest request, counted from when the child was ready
+        (0 while it is still loading the model)."""
+        with self._lock:
+            if not self._pending or not self._ready:
+                return 0.0
+            oldest = min(t for _, _, t in self._pending.values())
+            return time.perf_counter() - max(oldest, self._ready_at)
+
+    # ── Status ────────────────────────────────────────────────────────────────
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    @property
+    def slot_bytes(self) -> int:
+        return self._slot_bytes
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "mode":          "process",
+                "alive":         bool(self._proc is not None and self._proc.is_alive()),
+                "ready":         self._ready,
+                "pid":           self._pid,
+                "restarts":      self._restarts,
+                "restarting":    self._restarting,
+                "pending":       len(self._pending),
+                "completed":     self._completed,
+                "failed":        self._failed,
+                "roundtrip_ms":  round(self._roundtrip_ms, 1),
+                "worker_ms":     round(self._worker_ms, 1),
+                "ipc_ms":        round(max(0.0, self._roundtrip_ms - self._worker_ms), 1),
+                "copy_ms":       round(self._copy_ms, 2),
+                "last_error":    self._last_error,
+            }
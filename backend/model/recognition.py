@@ -0,0 +1,695 @@
+"""
+recognition.py
+──────────────
+Detection + ArcFace recognition pipeline for one camera frame.
+
+Shared by the in-process detection thread and the optional inference worker
+process (see inference_worker.py).  This module deliberately has no Firebase,
+camera or Flask imports so a spawned child process can load it cheaply.
+
+Usage:
+    rec = Recognizer(model_name="ArcFace", detector_backend="retinaface",
+                     fallback_backend="mtcnn", detection_scale=0.5)
+    rec.set_gallery(embs, names, threshold)
+    result = rec.run(bgr_frame)      # {"faces": [...], "timings": {...}, ...}
+
+Before anything reaches ArcFace, each detected face passes a quality gate
+(size, Laplacian blur, detector confidence, optional landmark yaw).  Faces
+that pass are embedded best-first, and a small IoU track memory avoids
+re-embedding faces that are already confirmed or that were already tried
+with a better crop.
+
+ROI passes (run(frame, regions=[...])) skip the full-frame sweep and run the
+detector only on padded crops around previously seen faces, at roi_scale
+instead of detection_scale, so small back-row faces get more pixels.
+
+Tiled passes (tile_grid=(rows, cols)) split a high-resolution frame into
+overlapping tiles that are detected in parallel and merged with NMS, so
+large lecture halls can be scanned at full sensor resolution.
+
+An EmbeddingCache keyed by a 64-bit dHash of the aligned crop plus a coarse
+box cell returns the previous ArcFace embedding for near-identical crops of
+a student who has not moved, so static scenes mostly skip TensorFlow.
+
+embed_backend="tflite" / "onnx" swaps DeepFace.represent for a converted
+(optionally int8) ArcFace model, see embedders.py.  native_detector="yunet"
+/ "scrfd" does the same for detection and alignment, see detectors.py.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+from model.detectors import make_detector
+from model.embedders import make_embedder
+
+logger = logging.getLogger("face_engine")
+
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+os.environ.setdefault("TF_ENABLE_ONEDNN_OPTS", "0")
+
+try:
+    import cv2                          # type: ignore
+    _CV2_OK = True
+except ImportError:
+    _CV2_OK = False
+
+try:
+    from deepface import DeepFace       # type: ignore
+    _DF_OK = True
+except Exception:
+    _DF_OK = False
+
+# Matching rule (unchanged from the original detect loop): the pkl threshold is
+# widened to ADAPTIVE_THRESHOLD whenever the best candidate is clearly ahead
+# of the runner-up by at least MIN_MARGIN.
+ADAPTIVE_THRESHOLD = 0.52
+MIN_MARGIN         = 0.02
+
+_TRACK_IOU       = 0.3    # min IoU to associate a face with an existing track
+_TRACK_MAX_AGE   = 5      # passes a track survives without being seen
+_RETRY_PASSES    = 3      # unresolved tracks re-embed a worse crop after this
+
+
+class EmbeddingCache:
+    """LRU of embeddings keyed by ((stream, box cell), dHash) with a TTL.
+
+    A crop hits when an entry in the same cell is younger than ttl_s and its
+    hash differs in at most max_hamming of 64 bits.  The cell is the box
+    centre quantised to half the face width, so a student who shifts in
+    their seat drops out of the cache instead of inheriting a neighbour's
+    embedding.
+    """
+
+    def __init__(self, size: int = 256, ttl_s: float = 10.0, max_hamming: int = 4):
+        self.size = max(1, size)
+        self.ttl_s = ttl_s
+        self.max_hamming = max_hamming
+        self._entries: OrderedDict = OrderedDict()   # (cell, hash) → (vec, t)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def dhash(face) -> int:
+        img = np.asarray(face, dtype=np.float32)
+        if img.ndim == 3:
+            img = img.mean(axis=2)
+        small = cv2.resize(img, (9, 8), interpolation=cv2.INTER_AREA)
+        bits = (small[:, 1:] > small[:, :-1]).flatten()
+        return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+    @staticmethod
+    def cell(box: dict) -> tuple:
+        q = max(8, box["w"] // 2)
+        return ((box["x"] + box["w"] // 2) // q, (box["y"] + box["h"] // 2) // q, q)
+
+    def key(self, face, box: dict, stream=None) -> tuple:
+        return (stream, self.cell(box)), self.dhash(face)
+
+    def get(self, key: tuple, now: Optional[float] = None) -> Optional[np.ndarray]:
+        now = time.monotonic() if now is None else now
+        cell, h = key
+        found = None
+        for k in list(self._entries):
+            vec, t = self._entries[k]
+            if now - t > self.ttl_s:
+                del self._entries[k]
+                continue
+            if found is None and k[0] == cell and bin(k[1] ^ h).count("1") <= self.max_hamming:
+                found = k
+        if found is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(found)
+        self.hits += 1
+        return self._entries[found][0]
+
+    def put(self, key: tuple, vec: np.ndarray, now: Optional[float] = None):
+        self._entries[key] = (vec, time.monotonic() if now is None else now)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def get_stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0}
+
+
+def box_iou(a: dict, b: dict) -> float:
+    ix = max(0, min(a["x"] + a["w"], b["x"] + b["w"]) - max(a["x"], b["x"]))
+    iy = max(0, min(a["y"] + a["h"], b["y"] + b["h"]) - max(a["y"], b["y"]))
+    inter = ix * iy
+    union = a["w"] * a["h"] + b["w"] * b["h"] - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _overlaps(a: dict, b: dict, iou: float, contain: float) -> bool:
+    if box_iou(a, b) >= iou:
+        return True
+    # A face cut by a tile seam yields a partial box mostly inside the full one
+    ix = max(0, min(a["x"] + a["w"], b["x"] + b["w"]) - max(a["x"], b["x"]))
+    iy = max(0, min(a["y"] + a["h"], b["y"] + b["h"]) - max(a["y"], b["y"]))
+    smaller = min(a["w"] * a["h"], b["w"] * b["h"])
+    return smaller > 0 and (ix * iy) / smaller >= contain
+
+
+def nms(hits: list, iou: float = 0.5, contain: float = 0.8) -> list:
+    """Greedy non-maximum suppression over (box, confidence, payload) tuples.
+
+    Besides the usual IoU test, boxes that lie mostly (contain) inside one
+    another are merged — a half face cut by a tile seam gives way to the
+    whole face from the neighbouring tile when their confidences are close.
+    """
+    kept = []
+    for hit in sorted(hits, key=lambda h: h[1], reverse=True):
+        for i, k in enumerate(kept):
+            if _overlaps(hit[0], k[0], iou, contain):
+                larger = hit[0]["w"] * hit[0]["h"] > k[0]["w"] * k[0]["h"]
+                if larger and hit[1] >= k[1] - 0.1:
+                    kept[i] = hit
+                break
+        else:
+            kept.append(hit)
+    return kept
+
+
+def plan_tiles(frame_shape, rows: int, cols: int, overlap: float = 0.15) -> list[tuple]:
+    """Split a frame into rows×cols tiles (x, y, w, h) overlapping by a
+    fraction of the tile size, so a face on a seam is whole in one tile."""
+    fh, fw = frame_shape[:2]
+    tw = int(fw / (cols - (cols - 1) * overlap)) if cols > 1 else fw
+    th = int(fh / (rows - (rows - 1) * overlap)) if rows > 1 else fh
+    tiles = []
+    for r in range(rows):
+        for c in range(cols):
+            # The last row / column is aligned to the frame edge, so rounding
+            # never leaves the right or bottom pixels out of every tile.
+            x = fw - tw if c == cols - 1 else min(fw - tw, int(c * tw * (1 - overlap)))
+            y = fh - th if r == rows - 1 else min(fh - th, int(r * th * (1 - overlap)))
+            tiles.append((x, y, tw, th))
+    return tiles
+
+
+def plan_regions(boxes: list[dict], frame_shape, pad: float = 0.75,
+                 max_fraction: float = 0.5) -> Optional[list[tuple]]:
+    """Padded, merged crop rectangles (x, y, w, h) around the given boxes.
+
+    Returns None when the crops would cover more than max_fraction of the
+    frame — a full-frame pass is cheaper then.
+    """
+    fh, fw = frame_shape[:2]
+    rects = []
+    for b in boxes:
+        p = int(max(b["w"], b["h"]) * pad)
+        x1, y1 = max(0, b["x"] - p), max(0, b["y"] - p)
+        x2, y2 = min(fw, b["x"] + b["w"] + p), min(fh, b["y"] + b["h"] + p)
+        if x2 > x1 and y2 > y1:
+            rects.append([x1, y1, x2, y2])
+
+    # Merge overlapping crops so neighbouring students share one detector call
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(rects)):
+            for j in range(i + 1, len(rects)):
+                a, b = rects[i], rects[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    rects[i] = [min(a[0], b[0]), min(a[1], b[1]),
+                                max(a[2], b[2]), max(a[3], b[3])]
+                    del rects[j]
+                    merged = True
+                    break
+            if merged:
+                break
+
+    area = sum((r[2] - r[0]) * (r[3] - r[1]) for r in rects)
+    if not rects or area > max_fraction * fw * fh:
+        return None
+    return [(r[0], r[1], r[2] - r[0], r[3] - r[1]) for r in rects]
+
+
+def estimate_yaw(fa: dict) -> Optional[float]:
+    """Rough absolute yaw in degrees from the detector's landmarks.
+
+    Uses the nose offset from the eye midpoint when the detector returns a
+    nose point (retinaface), otherwise the inter-ocular distance relative to
+    the box width.  Returns None when no eye landmarks are available.
+    """
+    le, re = fa.get("left_eye"), fa.get("right_eye")
+    if not le or not re:
+        return None
+    eye_dist = math.hypot(le[0] - re[0], le[1] - re[1])
+    if eye_dist <= 0:
+        return None
+    nose = fa.get("nose")
+    if nose:
+        mid_x = (le[0] + re[0]) / 2.0
+        ratio = (nose[0] - mid_x) / (eye_dist / 2.0)
+        return math.degrees(math.asin(max(-1.0, min(1.0, ratio))))
+    w = fa.get("w") or 0
+    if w <= 0:
+        return None
+    # Frontal faces have eyes ~0.42 of the box width apart; it shrinks with cos(yaw)
+    return math.degrees(math.acos(max(0.0, min(1.0, (eye_dist / w) / 0.42))))
+
+
+class Recognizer:
+    """Runs face detection + embedding + gallery matching on a BGR frame.
+
+    Not thread-safe: each detection thread / worker process owns one instance.
+    """
+
+    def __init__(self, model_name: str = "ArcFace",
+                 detector_backend: str = "retinaface",
+                 fallback_backend: str = "mtcnn",
+                 detection_scale: float = 0.5,
+                 roi_scale: float = 1.0,
+                 tile_grid: Optional[tuple] = None,
+                 tile_overlap: float = 0.15,
+                 tile_scale: float = 1.0,
+                 tile_workers: int = 2,
+                 min_face_px: int = 48,
+                 min_blur: float = 30.0,
+                 min_confidence: float = 0.80,
+                 max_yaw_deg: float = 0.0,
+                 max_embeds: int = 0,
+                 cache_size: int = 256,
+                 cache_ttl_s: float = 10.0,
+                 cache_hamming: int = 4,
+                 embed_backend: str = "deepface",
+                 embed_model_path: str = "",
+                 embed_threads: int = 0,
+                 native_detector: str = "",
+                 detector_model_path: str = "",
+                 detector_input_size: int = 0,
+                 detector_threshold: float = 0.6,
+                 detector_align: str = "deepface"):
+        self.model_name       = model_name
+        self.detector_backend = detector_backend
+        self.fallback_backend = fallback_backend
+        self.detection_scale  = detection_scale
+        self.roi_scale        = roi_scale
+        self.tile_grid        = tuple(tile_grid) if tile_grid else None
+        self.tile_overlap     = tile_overlap
+        self.tile_scale       = tile_scale
+        self.tile_workers     = max(1, tile_workers)
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+        # Quality gate (0 disables a check); sizes are full-frame capture pixels
+        self.min_face_px    = min_face_px
+        self.min_blur       = min_blur
+        self.min_confidence = min_confidence
+        self.max_yaw_deg    = max_yaw_deg
+        self.max_embeds     = max_embeds      # per-pass ArcFace budget
+
+        # Native detector (yunet / scrfd) replacing DeepFace.extract_faces;
+        # built on first use, shared by the tile-detect threads
+        self.native_detector     = (native_detector or "").lower()
+        self.detector_model_path = detector_model_path
+        self.detector_input_size = detector_input_size
+        self.detector_threshold  = detector_threshold
+        self.detector_align      = detector_align
+        self._detector = None
+        self._detector_lock = threading.Lock()
+
+        # Embedding backend; converted models are loaded on first use so the
+        # inference worker process builds its own interpreter
+        self.embed_backend    = (embed_backend or "deepface").lower()
+        self.embed_model_path = embed_model_path
+        self.embed_threads    = embed_threads
+        self._embedder = None
+
+        # Near-duplicate crop cache in front of ArcFace (cache_size=0 disables)
+        self._cache: Optional[EmbeddingCache] = (
+            EmbeddingCache(cache_size, cache_ttl_s, cache_hamming) if cache_size > 0 else None
+        )
+
+        self._tracks: list[dict] = []         # [{box, name, score, embedded_at, seen_at}]
+        self._pass = 0
+        # Track memory of the other streams (cameras); run() swaps in the
+        # one it is called for, so boxes never match across cameras
+        self._stream = None
+        self._streams: dict = {}              # stream → (tracks, pass)
+
+        self._embs: Optional[np.ndarray] = None
+        self._names: list[str]           = []    # unique gallery names
+        self._name_ids: Optional[np.ndarray] = None   # row → index into _names
+        self.threshold = 0.40
+
+    # ── Gallery ───────────────────────────────────────────────────────────────
+
+    def set_gallery(self, embs: Optional[np.ndarray], names: Optional[list[str]],
+                    threshold: float):
+        """Install L2-normalised gallery embeddings and their pkl names."""
+        self.threshold = float(threshold)
+        if embs is None or not names or embs.size == 0:
+            self._embs, self._names, self._name_ids = None, [], None
+            return
+        self._names = sorted(set(names))
+        index = {n: i for i, n in enumerate(self._names)}
+        self._embs = np.ascontiguousarray(embs, dtype=np.float32)
+        self._name_ids = np.asarray([index[n] for n in names], dtype=np.int32)
+
+    @property
+    def has_gallery(self) -> bool:
+        return self._embs is not None
+
+    # ── Pipeline stages ───────────────────────────────────────────────────────
+
+    @staticmethod
+    def _resize(img, factor: float):
+        """Resize for the detector; return (image, factor back to input px)."""
+        if factor == 1.0:
+            return img, 1.0
+        small = cv2.resize(
+            img, (0, 0),
+            fx=factor,
+            fy=factor,
+            interpolation=cv2.INTER_LINEAR,
+        )
+        return small, 1.0 / factor
+
+    def detect(self, frame, regions=None) -> list[tuple]:
+        """Run the detector on the whole frame or on ROI crops.
+
+        Returns [(box, confidence, (img, face_obj))] where box is in
+        full-frame pixels and img is the image face_obj's coordinates refer to.
+        """
+        if regions:
+            jobs = [(frame[y:y + h, x:x + w], self.roi_scale, x, y)
+                    for (x, y, w, h) in regions]
+        elif self.tile_grid:
+            jobs = [(frame[y:y + h, x:x + w], self.tile_scale, x, y)
+                    for (x, y, w, h) in plan_tiles(frame.shape, *self.tile_grid,
+                                                   overlap=self.tile_overlap)]
+        else:
+            jobs = [(frame, self.detection_scale, 0, 0)]
+
+        if len(jobs) > 1 and self.tile_workers > 1:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.tile_workers,
+                                                thread_name_prefix="tile-detect")
+            results = list(self._pool.map(self._detect_job, jobs))
+        else:
+            results = [self._detect_job(job) for job in jobs]
+        hits = [hit for res in results for hit in res]
+        # Tiles and padded crops overlap, so the same face may be found twice
+        return nms(hits) if len(jobs) > 1 else hits
+
+    def _detect_job(self, job) -> list[tuple]:
+        img, factor, ox, oy = job
+        small, scale = self._resize(img, factor)
+        hits = []
+        for face_obj in self._extract_faces(small):
+            fa = face_obj.get("facial_area") or {}
+            if not fa:
+                continue
+            box = {
+                "x": int(fa.get("x", 0) * scale) + ox,
+                "y": int(fa.get("y", 0) * scale) + oy,
+                "w": int(fa.get("w", 50) * scale),
+                "h": int(fa.get("h", 50) * scale),
+            }
+            hits.append((box, float(face_obj.get("confidence") or 0.0), (small, face_obj)))
+        return hits
+
+    def _native(self):
+        with self._detector_lock:
+            if self.native_detector and self._detector is None:
+                self._detector = make_detector(
+                    self.native_detector, self.detector_model_path,
+                    self.detector_input_size, self.detector_threshold,
+                    self.detector_align)
+                if self._detector is None:
+                    self.native_detector = ""        # fell back, logged above
+            return self._detector
+
+    def _extract_faces(self, img) -> list[dict]:
+        detector = self._native() if self.native_detector else None
+        if detector is not None:
+            try:
+                return detector.detect(img)
+            except Exception as exc:
+                logger.warning("[Detect] %s error, retrying with DeepFace: %s",
+                               detector.name, exc)
+        try:
+            return DeepFace.extract_faces(
+                img_path=img,
+                detector_backend=self.detector_backend,
+                enforce_detection=False,
+                align=True,
+            )
+        except Exception:
+            try:
+                return DeepFace.extract_faces(
+                    img_path=img,
+                    detector_backend=self.fallback_backend,
+                    enforce_detection=False,
+                    align=True,
+                )
+            except Exception:
+                return []
+
+    def _embed(self, face) -> Optional[np.ndarray]:
+        if self.embed_backend != "deepface" and self._embedder is None:
+            emb = make_embedder(self.embed_backend, self.model_name,
+                                self.embed_model_path, self.embed_threads)
+            if emb is None or emb.name == "deepface":
+                self.embed_backend = "deepface"      # fell back, logged above
+            else:
+                self._embedder = emb
+        if self._embedder is not None:
+            try:
+                return self._embedder.embed(face)
+            except Exception as exc:
+                logger.warning("[Recog] %s embed error: %s", self.embed_backend, exc)
+                return None
+        try:
+            reps = DeepFace.represent(
+                img_path=face,
+                model_name=self.model_name,
+                detector_backend="skip",
+                enforce_detection=False,
+                align=False,
+            )
+        except Exception as exc:
+            logger.warning("[Recog] DeepFace.represent error: %s", exc)
+            return None
+        if not reps:
+            return None
+        vec = np.asarray(reps[0].get("embedding"), dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        if norm:
+            vec = vec / norm
+        return vec
+
+    def match(self, vec: np.ndarray) -> tuple[Optional[str], float, float, bool]:
+        """Return (best_name, best_dist, second_dist, accepted) for an embedding."""
+        distances = 1.0 - self._embs @ vec
+        best = np.full(len(self._names), np.inf, dtype=np.float32)
+        np.minimum.at(best, self._name_ids, distances)
+
+        order = np.argsort(best)
+        best_name = self._names[order[0]]
+        best_dist = float(best[order[0]])
+        second_dist = float(best[order[1]]) if len(order) > 1 else 1.0
+        margin = second_dist - best_dist
+
+        thresh = self.threshold
+        if best_dist < ADAPTIVE_THRESHOLD and margin >= MIN_MARGIN:
+            thresh = ADAPTIVE_THRESHOLD
+        accepted = best_dist < thresh and margin >= MIN_MARGIN
+        logger.info(
+            "[Recog] best=%s dist=%.3f thresh=%.2f margin=%.3f → %s",
+            best_name, best_dist, thresh, margin, "ACCEPT" if accepted else "REJECT",
+        )
+        return best_name, best_dist, second_dist, accepted
+
+    # ── Quality gate ──────────────────────────────────────────────────────────
+
+    def quality(self, img, face_obj: dict, box: Optional[dict] = None) -> tuple[float, Optional[str]]:
+        """Score a detected face in [0, 1]; return (score, reject_reason).
+
+        Size is judged on box (the face in full-frame pixels) when given, so
+        a face is gated the same whether it was found on the downscaled full
+        frame or in an upscaled ROI / tile crop."""
+        fa = face_obj["facial_area"]
+        x, y = max(0, int(fa.get("x", 0))), max(0, int(fa.get("y", 0)))
+        w, h = int(fa.get("w", 0)), int(fa.get("h", 0))
+        size = min(box["w"], box["h"]) if box is not None else min(w, h)
+        if self.min_face_px and size < self.min_face_px:
+            return 0.0, "small"
+
+        conf = float(face_obj.get("confidence") or 0.0)
+        # Detectors that do not report confidence (0) are not gated on it
+        if self.min_confidence and 0.0 < conf < self.min_confidence:
+            return 0.0, "confidence"
+
+        blur = 0.0
+        crop = img[y:y + h, x:x + w]
+        if crop.size:
+            gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+            blur = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+        if self.min_blur and blur < self.min_blur:
+            return 0.0, "blur"
+
+        yaw = estimate_yaw(fa)
+        if self.max_yaw_deg and yaw is not None and abs(yaw) > self.max_yaw_deg:
+            return 0.0, "yaw"
+
+        size_term = min(1.0, size / float(max(1, 3 * (self.min_face_px or 48))))
+        blur_term = min(1.0, blur / float(max(1.0, 4 * (self.min_blur or 30.0))))
+        yaw_term  = math.cos(math.radians(min(abs(yaw), 89.0))) if yaw is not None else 1.0
+        conf_term = conf if conf > 0 else 1.0
+        return size_term * blur_term * yaw_term * conf_term, None
+
+    # ── Track memory ──────────────────────────────────────────────────────────
+
+    def _match_track(self, box: dict) -> Optional[dict]:
+        best, best_iou = None, _TRACK_IOU
+        for tr in self._tracks:
+            iou = box_iou(tr["box"], box)
+            if iou >= best_iou:
+                best, best_iou = tr, iou
+        return best
+
+    def _needs_embedding(self, track: Optional[dict], score: float,
+                         skip_names: set) -> bool:
+        if track is None or track["embedded_at"] is None:
+            return True
+        if track["name"] in skip_names:
+            return False                      # already confirmed present
+        if track["name"] != "Unknown":
+            return True                       # still collecting votes
+        # Unresolved: only retry with a better crop, or after a few passes
+        return score > track["score"] or self._pass - track["embedded_at"] >= _RETRY_PASSES
+
+    # ── Entry point ───────────────────────────────────────────────────────────
+
+    def _select_stream(self, stream):
+        if stream == self._stream:
+            return
+        self._streams[self._stream] = (self._tracks, self._pass)
+        self._tracks, self._pass = self._streams.pop(stream, ([], 0))
+        self._stream = stream
+
+    def run(self, frame, skip_names=(), regions=None, stream=None) -> dict:
+        """Detect and identify all faces in a full-resolution BGR frame.
+
+        skip_names: gallery names already confirmed present; faces tracked
+        to one of them keep their label without another ArcFace call.
+        regions: optional [(x, y, w, h)] crops (see plan_regions) for an ROI
+        pass instead of a full-frame sweep.
+        stream: camera the frame comes from; tracks and cache cells are kept
+        per stream so one Recognizer (one model) can serve several cameras.
+
+        Returns {"faces": [{x, y, w, h, detected_name, quality, best_name,
+        best_dist, second_dist}], "timings": {...}, "embeddings": n,
+        "cache_hits": n, "gated": n, "reused": n}.  Box coordinates are in full-frame pixels;
+        the match fields are None for faces never embedded and carry the
+        track's last match for reused faces.
+        """
+        t0 = time.perf_counter()
+        self._select_stream(stream)
+        self._pass += 1
+        skip_names = set(skip_names or ())
+        hits = self.detect(frame, regions)
+        t1 = time.perf_counter()
+
+        out = []
+        candidates = []        # (score, out_index, face_obj, track)
+        n_gated = n_reused = 0
+        for box, _, (img, face_obj) in hits:
+            det = dict(box, detected_name="Unknown", quality=0.0,
+                       best_name=None, best_dist=None, second_dist=None)
+            out.append(det)
+
+            track = self._match_track(det)
+            if track is None:
+                track = {"box": det, "name": "Unknown", "score": 0.0,
+                         "embedded_at": None, "seen_at": self._pass, "match": None}
+                self._tracks.append(track)
+            track["box"], track["seen_at"] = det, self._pass
+
+            score, reason = self.quality(img, face_obj, box)
+            det["quality"] = round(score, 3)
+            if not self._needs_embedding(track, score, skip_names):
+                det["detected_name"] = track["name"]
+                if track["match"]:
+                    det.update(track["match"])
+                n_reused += 1
+                continue
+            if reason is not None:
+                n_gated += 1
+                logger.debug("[Quality] dropped face %dx%d: %s", det["w"], det["h"], reason)
+                continue
+            if face_obj.get("face") is not None and self.has_gallery:
+                candidates.append((score, len(out) - 1, face_obj, track))
+
+        # Best crops first; the per-pass budget cuts the long tail
+        candidates.sort(key=lambda c: c[0], reverse=True)
+        if self.max_embeds:
+            candidates = candidates[:self.max_embeds]
+
+        embed_s = 0.0
+        match_s = 0.0
+        n_embed = n_cached = 0
+        for score, idx, face_obj, track in candidates:
+            te = time.perf_counter()
+            vec = None
+            key = None
+            if self._cache is not None:
+                key = self._cache.key(face_obj["face"], out[idx], stream)
+                vec = self._cache.get(key)
+            if vec is not None:
+                n_cached += 1
+            else:
+                vec = self._embed(face_obj["face"])
+                n_embed += 1
+                if vec is not None and key is not None:
+                    self._cache.put(key, vec)
+            tm = time.perf_counter()
+            embed_s += tm - te
+            name = "Unknown"
+            if vec is not None:
+                best_name, best_dist, second_dist, accepted = self.match(vec)
+                if accepted:
+                    name = best_name
+                track["match"] = {"best_name": best_name,
+                                  "best_dist": round(best_dist, 4),
+                                  "second_dist": round(second_dist, 4)}
+                out[idx].update(track["match"])
+            match_s += time.perf_counter() - tm
+            out[idx]["detected_name"] = name
+            track["name"], track["embedded_at"] = name, self._pass
+            track["score"] = max(track["score"], score) if name == "Unknown" else score
+
+        self._tracks = [t for t in self._tracks if self._pass - t["seen_at"] <= _TRACK_MAX_AGE]
+
+        return {
+            "faces": out,
+            "mode": "roi" if regions else ("tiled" if self.tile_grid else "full"),
+            "embeddings": n_embed,
+            "cache_hits": n_cached,
+            "gated": n_gated,
+            "reused": n_reused,
+            "timings": {
+                "detect_ms": (t1 - t0) * 1000.0,
+                "embed_ms":  embed_s * 1000.0,
+                "match_ms":  match_s * 1000.0,
+                "total_ms":  (time.perf_counter() - t0) * 1000.0,
+            },
+        }
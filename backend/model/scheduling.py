@@ -0,0 +1,238 @@
+"""
+scheduling.py
+─────────────
+Decides *when* the detect loop should run the next detection pass.
+
+AdaptiveScheduler replaces the fixed CAM_DETECT_INTERVAL_S cadence with one
+driven by what the Pi can actually sustain:
+
+  • latency   – rolling median of detection round-trips; the interval keeps
+                inference busy for at most CAM_ADAPTIVE_DUTY of wall time
+  • load      – 1-min load average above the core count stretches the interval
+  • thermal   – SoC temperature / firmware throttle flags back off further
+  • urgency   – faces that are recognised but not yet confirmed (or a jump in
+                face count) halve the interval to collect votes quickly
+  • static    – a 64×48 grey thumbnail diff against the last detected frame
+                skips passes while nothing in the scene has changed
+
+CoverageMap adds *where*: with the camera on the slider, the track is cut
+into position bins and passes are spent only on bins that were never seen,
+still hold unconfirmed faces, or have not been revisited for a while.
+"Unconfirmed" means recognised as an enrolled student still collecting
+votes — an Unknown face (a visitor, a bad angle) does not keep pulling
+passes to its bin.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from collections import deque
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger("face_engine")
+
+try:
+    import cv2                          # type: ignore
+    _CV2_OK = True
+except ImportError:
+    _CV2_OK = False
+
+_THERMAL_ZONE   = "/sys/class/thermal/thermal_zone0/temp"
+_THROTTLED_FILE = "/sys/devices/platform/soc/soc:firmware/get_throttled"
+_THROTTLE_NOW_MASK = 0x4 | 0x8   # currently throttled | soft temperature limit
+_SYS_POLL_S     = 5.0            # temperature / load are re-read at most this often
+_THUMB_SIZE     = (64, 48)
+
+
+def _read_int(path: str, base: int = 10) -> Optional[int]:
+    try:
+        with open(path, "r") as fh:
+            return int(fh.read().strip(), base)
+    except Exception:
+        return None
+
+
+class AdaptiveScheduler:
+    """Computes the delay before the next detection pass.  Detect-loop only."""
+
+    def __init__(self, base_interval_s: float = 0.5, enabled: bool = True):
+        self.enabled         = enabled
+        self.base_interval_s = max(0.10, base_interval_s)
+        self.min_interval_s  = float(os.getenv("CAM_ADAPTIVE_MIN_S", 0.15))
+        self.max_interval_s  = float(os.getenv("CAM_ADAPTIVE_MAX_S", 3.0))
+        self.duty            = min(1.0, max(0.1, float(os.getenv("CAM_ADAPTIVE_DUTY", 0.6))))
+        self.static_delta    = float(os.getenv("CAM_STATIC_DELTA", 0.012))
+        self.max_static_s    = float(os.getenv("CAM_STATIC_MAX_SKIP_S", 5.0))
+        self.thermal_soft_c  = float(os.getenv("CAM_THERMAL_SOFT_C", 75.0))
+
+        self._latencies: deque[float] = deque(maxlen=20)
+        self._ref_thumb: Optional[np.ndarray] = None
+        self._last_pass_at = 0.0
+        self._last_delta   = 1.0
+        self._prev_faces   = 0
+        self._pending      = 0
+        self._interval     = self.base_interval_s
+        self._passes       = 0
+        self._static_skips = 0
+
+        self._cpus        = os.cpu_count() or 1
+        self._sys_read_at = float("-inf")
+        self._load        = 0.0
+        self._temp_c: Optional[float] = None
+        self._throttled   = False
+
+    # ── Inputs ────────────────────────────────────────────────────────────────
+
+    def record_pass(self, latency_s: float, faces: int, pending: int):
+        """Feed back a finished pass: round-trip latency, face count and how
+        many of those faces are recognised but still collecting votes."""
+        self._latencies.append(latency_s)
+        self._pending = pending + max(0, faces - self._prev_faces)
+        self._prev_faces = faces
+
+    def _thumb(self, frame) -> Optional[np.ndarray]:
+        if not _CV2_OK:
+            return None
+        small = cv2.resize(frame, _THUMB_SIZE, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def _poll_system(self, now: float):
+        if now - self._sys_read_at < _SYS_POLL_S:
+            return
+        self._sys_read_at = now
+        try:
+            self._load = os.getloadavg()[0] / self._cpus
+        except (AttributeError, OSError):
+            self._load = 0.0
+        milli = _read_int(_THERMAL_ZONE)
+        self._temp_c = milli / 1000.0 if milli is not None else None
+        flags = _read_int(_THROTTLED_FILE, 16)
+        self._throttled = bool(flags is not None and flags & _THROTTLE_NOW_MASK)
+
+    # ── Decisions ─────────────────────────────────────────────────────────────
+
+    def should_skip(self, frame, now: float) -> bool:
+        """True when the scene is static and nothing is waiting on votes."""
+        if not self.enabled or self._pending > 0 or self._ref_thumb is None:
+            return False
+        if now - self._last_pass_at >= self.max_static_s:
+            return False
+        thumb = self._thumb(frame)
+        if thumb is None:
+            return False
+        self._last_delta = float(np.mean(cv2.absdiff(thumb, self._ref_thumb))) / 255.0
+        if self._last_delta < self.static_delta:
+            self._static_skips += 1
+            return True
+        return False
+
+    def on_pass_started(self, frame, now: float) -> float:
+        """Remember the frame a pass runs on; return seconds until the next one."""
+        self._passes += 1
+        self._last_pass_at = now
+        if self.enabled:
+            self._ref_thumb = self._thumb(frame)
+        self._interval = self._compute_interval(now)
+        return self._interval
+
+    def _compute_interval(self, now: float) -> float:
+        if not self.enabled:
+            return self.base_interval_s
+        self._poll_system(now)
+
+        if self._latencies:
+            latency = float(np.median(self._latencies))
+            interval = max(self.base_interval_s, latency / self.duty)
+        else:
+            interval = self.base_interval_s
+
+        if self._load > 1.0:
+            interval *= min(self._load, 2.0)
+        if self._throttled:
+            interval *= 2.0
+        elif self._temp_c is not None and self._temp_c > self.thermal_soft_c:
+            interval *= 1.0 + (self._temp_c - self.thermal_soft_c) / 10.0
+
+        if self._pending > 0:
+            interval *= 0.5
+
+        return min(self.max_interval_s, max(self.min_interval_s, interval))
+
+    # ── Status ────────────────────────────────────────────────────────────────
+
+    @property
+    def interval_s(self) -> float:
+        return self._interval
+
+    def get_stats(self) -> dict:
+        samples = list(self._latencies)
+        latency = float(np.median(samples)) if samples else 0.0
+        return {
+            "enabled":       self.enabled,
+            "interval_s":    round(self._interval, 3),
+            "latency_ms":    round(latency * 1000.0, 1),
+            "load":          round(self._load, 2),
+            "temp_c":        self._temp_c,
+            "throttled":     self._throttled,
+            "pending_faces": self._pending,
+            "scene_delta":   round(self._last_delta, 4),
+            "passes":        self._passes,
+            "static_skips":  self._static_skips,
+        }
+
+
+class CoverageMap:
+    """Per-slider-position coverage of the room.  Detect-loop only."""
+
+    def __init__(self, bins: int = 8, revisit_s: float = 20.0):
+        self.bins      = max(1, bins)
+        self.revisit_s = revisit_s
+        self._cells = [
+            {"passes": 0, "faces": 0, "unconfirmed": 0, "last_pass_at": None}
+            for _ in range(self.bins)
+        ]
+        self._skips = 0
+
+    def bin_of(self, position: Optional[float]) -> Optional[int]:
+        if position is None:
+            return None
+        return min(self.bins - 1, max(0, int(position * self.bins)))
+
+    def should_visit(self, position: Optional[float], now: float) -> bool:
+        """False when the camera sits over a bin whose faces are all confirmed
+        and which was scanned recently; unknown position always scans."""
+        b = self.bin_of(position)
+        if b is None:
+            return True
+        cell = self._cells[b]
+        if cell["last_pass_at"] is None or cell["unconfirmed"] > 0:
+            return True
+        if now - cell["last_pass_at"] >= self.revisit_s:
+            return True
+        self._skips += 1
+        return False
+
+    def record(self, position: Optional[float], faces: int, unconfirmed: int, now: float):
+        """unconfirmed: faces matched to an enrolled roll that is not yet
+        present (Unknown faces are not counted by the caller)."""
+        b = self.bin_of(position)
+        if b is None:
+            return
+        cell = self._cells[b]
+        cell["passes"] += 1
+        cell["faces"] = faces
+        cell["unconfirmed"] = unconfirmed
+        cell["last_pass_at"] = now
+
+    def get_stats(self) -> dict:
+        visited = sum(1 for c in self._cells if c["passes"])
+        return {
+            "bins":      self.bins,
+            "visited":   visited,
+            "skipped":   self._skips,
+            "cells":     [{k: c[k] for k in ("passes", "faces", "unconfirmed")}
+                          for c in self._cells],
+        }
@@ -0,0 +1,142 @@
+"""
+trace.py
+────────
+Structured per-session trace of an attendance scan (NDJSON, one record per
+line), written by FaceEngine to CAM_TRACE_DIR and read back by
+tools/replay_trace.py.
+
+Records (short keys keep a 10-minute scan to a few hundred KB):
+
+  {"k": "session", "date", "started_at", "threshold", "adaptive_threshold",
+   "min_margin", "vote_required", "gallery", "enrolled": [roll, …], …}
+  {"k": "pass", "t", "seq", "mode", "lat_ms", "timings": {…}, "pos",
+   "faces": [{"b": [x, y, w, h], "n": name, "r": roll, "q": quality,
+              "bn": best_name, "br": best_roll, "d1": best_dist,
+              "d2": second_dist}, …]}
+  {"k": "vote", "t", "r": roll, "v": votes}
+  {"k": "confirm", "t", "r": roll}
+  {"k": "end", "t", "reason", "present": [roll, …], "dropped": n}
+
+"t" is seconds since the session started.  record() only appends to a
+bounded deque; a background thread serialises and appends to the file every
+flush_interval_s, so the detect loop never waits on the SD card.  If the
+writer falls behind, the oldest unflushed records are dropped and counted.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+logger = logging.getLogger("face_engine")
+
+
+class SessionTrace:
+    def __init__(self, path: str, capacity: int = 4096, flush_interval_s: float = 2.0):
+        self.path = path
+        self._buf: deque = deque()
+        self._capacity = max(16, capacity)
+        self._flush_interval_s = flush_interval_s
+        self._t0 = time.monotonic()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()     # one _drain at a time, none after close
+        self._wake = threading.Event()
+        self._closed = False
+        self.written = 0
+        self.dropped = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._fh = open(path, "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._flush_loop, daemon=True,
+                                        name="trace-writer")
+        self._thread.start()
+
+    def now(self) -> float:
+        return round(time.monotonic() - self._t0, 3)
+
+    def record(self, kind: str, **fields):
+        """Queue one record; never blocks on I/O."""
+        fields["k"] = kind
+        fields.setdefault("t", self.now())
+        with self._lock:
+            if self._closed:
+                return
+            if len(self._buf) >= self._capacity:
+                self._buf.popleft()
+                self.dropped += 1
+            self._buf.append(fields)
+
+    def _drain(self):
+        with self._write_lock:
+            if self._fh.closed:
+                return
+            with self._lock:
+                items, self._buf = self._buf, deque()
+            if not items:
+                return
+            try:
+                self._fh.write("".join(json.dumps(r, separators=(",", ":")) + "\n"
+                                       for r in items))
+                self._fh.flush()
+                self.written += len(items)
+            except (OSError, TypeError, ValueError) as exc:
+                logger.warning("[Trace] write failed, %d records lost: %s", len(items), exc)
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wake.wait(self._flush_interval_s)
+            self._wake.clear()
+            self._drain()
+
+    def close(self, **end_fields):
+        """Write the final "end" record, flush and close the file."""
+        self.record("end", dropped=self.dropped, **end_fields)
+        with self._lock:
+            self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=5)
+        # The writer may still be inside a slow write: the lock makes this
+        # drain wait for it, and its next drain sees the file closed.
+        self._drain()
+        with self._write_lock:
+            self._fh.close()
+        logger.info("[Trace] %d records written to %s (%d dropped)",
+                    self.written, self.path, self.dropped)
+
+
+def prune(directory: str, keep: int):
+    """Delete all but the newest `keep` *.ndjson traces in directory."""
+    if keep <= 0 or not os.path.isdir(directory):
+        return
+    files = sorted(
+        (os.path.join(directory, n) for n in os.listdir(directory) if n.endswith(".ndjson")),
+        key=os.path.getmtime,
+    )
+    for path in files[:-keep]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def load(path: str) -> tuple[Optional[dict], list[dict]]:
+    """Read a trace; return (session header, all records)."""
+    header, records = None, []
+    with open(path, "r", encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue            # torn last line after a crash
+            if rec.get("k") == "session" and header is None:
+                header = rec
+            records.append(rec)
+    return header, records
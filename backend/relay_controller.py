@@ -0,0 +1,156 @@
+"""
+relay_controller.py
+───────────────────
+Single write path for the relay board.
+
+Every caller — /control, scenes, schedule edges, reconciliation and the
+physical push buttons — goes through RelayController, which
+
+  • remembers the last state written to each relay and skips writes that
+    would not change it (no GPIO traffic, no relay click)
+  • applies a multi-device change as one batch under one lock: all OFFs
+    first, then the ONs, so a batch never briefly has more load switched on
+    than its end state
+  • staggers ONs of inrush devices (fans; see devices.inrush_devices) by
+    stagger_s so their motor start currents do not coincide
+
+apply() only performs the first write of a batch and returns; the
+staggered ONs run on timers, so HTTP, scene and schedule callers never wait
+for the sequence.  Each timer write is skipped if a newer command for that
+device arrived in the meantime, so a slow batch can never override a later
+command.  states() reports the tracked targets, including ONs still waiting
+for their timer.
+
+A write that fails leaves that relay's tracked state at what the board
+reports; once the rest of the batch is written, apply() raises
+RelayWriteError naming the failed relays and the ones that did change.
+"""
+
+import logging
+import threading
+
+import metrics
+
+logger = logging.getLogger("smart-switch")
+
+_M_WRITES = metrics.counter("relay_writes_total",
+                            "Relay write requests by result (written/skipped)", ("result",))
+
+
+class RelayWriteError(RuntimeError):
+    """Some writes of a batch failed; `changed` lists the relays that did
+    switch, `failed` maps each failed relay to its error."""
+
+    def __init__(self, changed: list, failed: dict):
+        self.changed = changed
+        self.failed = failed
+        super().__init__("relay write failed: " + ", ".join(
+            f"{name} ({exc})" for name, exc in failed.items()))
+
+
+class RelayController:
+    def __init__(self, relays: dict, inrush: set = frozenset(), stagger_s: float = 0.3):
+        self._relays = relays
+        self.inrush = set(inrush)
+        self.stagger_s = stagger_s
+        self._lock = threading.RLock()
+        self._state = {name: bool(r.is_active) for name, r in relays.items()}
+        self._gen = {name: 0 for name in relays}     # bumps on every accepted change
+
+    # ── Queries ─────────────────────────────────────────
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._relays
+
+    def state(self, name: str) -> bool:
+        return self._state[name]
+
+    def states(self) -> dict:
+        with self._lock:
+            return dict(self._state)
+
+    # ── Writes ──────────────────────────────────────────
+
+    def _write(self, name: str, on: bool):
+        relay = self._relays[name]
+        if on:
+            relay.on()
+        else:
+            relay.off()
+        _M_WRITES.inc(result="written")
+
+    def apply(self, targets: dict, source: str = "") -> list:
+        """Drive {name: bool} to the given states; return the names that
+        changed.  Unknown names are ignored.  Raises RelayWriteError after
+        the batch if any write failed."""
+        with self._lock:
+            changes = {}
+            for name, on in targets.items():
+                if name not in self._relays:
+                    continue
+                if self._state[name] == bool(on):
+                    _M_WRITES.inc(result="skipped")
+                    continue
+                changes[name] = bool(on)
+            if not changes:
+                return []
+
+            now_on = [n for n, on in changes.items() if on]
+            # A single inrush device, or one next to others only switching
+            # off, needs no stagger.
+            staggered = [n for n in now_on if n in self.inrush]
+            if len(staggered) < 2:
+                staggered = []
+            immediate = [n for n, on in changes.items() if not on] + \
+                        [n for n in now_on if n not in staggered] + staggered[:1]
+            for name in changes:
+                self._state[name] = changes[name]
+                self._gen[name] += 1
+            failed = {}
+            for name in immediate:
+                try:
+                    self._write(name, changes[name])
+                except Exception as exc:
+                    self._state[name] = bool(self._relays[name].is_active)
+                    failed[name] = exc
+                    logger.error("[Relay] %s -> %s failed: %s",
+                                 name, "on" if changes[name] else "off", exc)
+            for i, name in enumerate(staggered[1:], start=1):
+                timer = threading.Timer(i * self.stagger_s, self._staggered_on,
+                                        (name, self._gen[name]))
+                timer.daemon = True
+                timer.start()
+
+        changed = [n for n in changes if n not in failed]
+        if changed:
+            logger.info("[Relay] %s%s", ", ".join(f"{n}={'on' if changes[n] else 'off'}"
+                                                   for n in changed),
+                        f"  ({source})" if source else "")
+        if failed:
+            raise RelayWriteError(changed, failed)
+        return changed
+
+    def _staggered_on(self, name: str, gen: int):
+        with self._lock:
+            if self._gen[name] != gen:
+                return                          # superseded by a newer command
+            try:
+                self._write(name, True)
+            except Exception as exc:
+                self._state[name] = bool(self._relays[name].is_active)
+                logger.error("[Relay] %s -> on failed: %s", name, exc)
+
+    def set(self, name: str, on: bool, source: str = "") -> bool:
+        """Switch one relay; True if it changed.  Raises RelayWriteError if
+        the write failed."""
+        return bool(self.apply({name: on}, source))
+
+    def toggle(self, name: str, source: str = "") -> bool:
+        """Flip one relay and return its resulting state (unchanged if the
+        write failed; the failure is logged)."""
+        with self._lock:                        # read + write as one step
+            try:
+                self.apply({name: not self._state[name]}, source)
+            except RelayWriteError:
+                pass
+            return self._state[name]
@@ -0,0 +1,324 @@
+"""
+schedule_engine.py
+──────────────────
+Event-driven schedule runner (replaces the once-a-minute cron scan).
+
+Every enabled schedule is compiled into its on/off edges and the next
+occurrence of each edge is kept in a min-heap keyed by fire time.  A single
+thread sleeps until the earliest edge is due, fires it, and pushes that
+edge's following occurrence — O(log n) per fire, nothing done between edges.
+
+Fire times are measured on the supplied clock (ntp_now), not the system
+clock, which is why APScheduler's own triggers are not used for schedules:
+on a Pi without RTC time.time() can be hours off until NTP answers.
+
+Catch-up applies only to edges that were already indexed: one that comes
+due late — the thread was starved, or the clock stepped forward past it —
+is still fired if it is at most grace_s late; older ones, and further
+occurrences a big jump skipped entirely, are logged as missed.  Indexing
+itself (startup, a schedule created or edited) only looks forward from now,
+so it never fires an edge whose time had already passed.  Edges that
+already fired are remembered, so re-indexing never fires them twice.
+
+desired_states() answers the reverse question — which edge was the last
+one for each device at a given instant — so the app can reconcile relays
+after a reboot or a clock correction instead of waiting for the next edge.
+"""
+
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+logger = logging.getLogger("smart-switch")
+
+# At equal fire times "off" runs first, so a device handed from one class
+# straight to the next ends up on.
+_ACTION_ORDER = {"off": 0, "on": 1}
+
+
+def parse_hhmm(value) -> Optional[tuple[int, int]]:
+    try:
+        h, m = (int(v) for v in str(value).split(":"))
+    except (TypeError, ValueError):
+        return None
+    if not (0 <= h < 24 and 0 <= m < 60):
+        return None
+    return h, m
+
+
+class ScheduleEngine:
+    def __init__(self, store, clock: Callable[[], datetime], tz,
+                 on_fire: Callable[[dict, str, datetime], None],
+                 grace_s: float = 120.0, max_sleep_s: float = 30.0):
+        self._store = store
+        self._clock = clock
+        self._tz = tz
+        self._on_fire = on_fire
+        self.grace_s = grace_s
+        # Upper bound on a single wait, so NTP offset changes are noticed
+        self.max_sleep_s = max_sleep_s
+
+        self._cond = threading.Condition()
+        self._heap: list = []               # (ts, order, seq, sched_id, action)
+        self._seq = 0
+        self._by_id: dict[str, dict] = {}
+        self._last_fired: dict[tuple, float] = {}   # (sched_id, action) → ts
+        self._dirty = True
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+        self._fired = 0
+        self._missed = 0
+        self._max_late_s = 0.0
+
+        store.add_listener(self.reload)
+
+    # ── Lifecycle ───────────────────────────────────────
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="schedule-engine")
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+
+    def reload(self):
+        """Re-index from the store (called on every schedule change)."""
+        with self._cond:
+            self._dirty = True
+            self._cond.notify_all()
+
+    def clock_stepped(self, before: datetime, after: datetime):
+        """Re-evaluate pending fires after the clock jumped.  Forward: edges
+        jumped over are caught up within the grace window.  Backward: fires
+        recorded after the new time were made on a wrong clock and are
+        forgotten, so those edges fire again when they really come due."""
+        with self._cond:
+            if after < before:
+                cut = after.timestamp()
+                self._last_fired = {k: v for k, v in self._last_fired.items() if v <= cut}
+            self._dirty = True
+            self._cond.notify_all()
+
+    # ── Indexing ────────────────────────────────────────
+
+    def _localize(self, naive: datetime) -> datetime:
+        localize = getattr(self._tz, "localize", None)      # pytz
+        return localize(naive) if localize else naive.replace(tzinfo=self._tz)
+
+    def next_fire(self, hhmm: tuple[int, int], days, after: datetime) -> Optional[datetime]:
+        """First occurrence of hh:mm on one of `days` strictly after `after`."""
+        h, m = hhmm
+        local = after.astimezone(self._tz)
+        for i in range(8):
+            d = (local + timedelta(days=i)).date()
+            if d.weekday() not in days:
+                continue
+            dt = self._localize(datetime(d.year, d.month, d.day, h, m))
+            if dt > after:
+                return dt
+        return None
+
+    def prev_fire(self, hhmm: tuple[int, int], days, at: datetime) -> Optional[datetime]:
+        """Last occurrence of hh:mm on one of `days` at or before `at`."""
+        h, m = hhmm
+        local = at.astimezone(self._tz)
+        for i in range(8):
+            d = (local - timedelta(days=i)).date()
+            if d.weekday() not in days:
+                continue
+            dt = self._localize(datetime(d.year, d.month, d.day, h, m))
+            if dt <= at:
+                return dt
+        return None
+
+    def _edge_spec(self, sched: dict, action: str) -> Optional[tuple]:
+        hhmm = parse_hhmm(sched.get(f"{action}_time"))
+        if hhmm is None:
+            return None
+        return hhmm, sched.get("days", list(range(7)))
+
+    def _push_at_locked(self, ts: float, sched_id: str, action: str):
+        self._seq += 1
+        heapq.heappush(self._heap, (ts, _ACTION_ORDER[action], self._seq, sched_id, action))
+
+    def _push_locked(self, sched: dict, action: str, after: datetime):
+        spec = self._edge_spec(sched, action)
+        if spec is None:
+            logger.warning("[Scheduler] Schedule %s has invalid %s_time %r – ignored",
+                           sched.get("label"), action, sched.get(f"{action}_time"))
+            return
+        dt = self.next_fire(*spec, after)
+        if dt is not None:
+            self._push_at_locked(dt.timestamp(), sched["id"], action)
+
+    def _is_edge(self, sched: dict, action: str, ts: float, tz) -> bool:
+        """Is ts still an occurrence of this edge (the schedule may have been
+        edited since it was indexed)?"""
+        spec = self._edge_spec(sched, action)
+        if spec is None:
+            return False
+        dt = self.next_fire(*spec, datetime.fromtimestamp(ts - 1, tz=tz))
+        return dt is not None and dt.timestamp() == ts
+
+    def _rebuild_locked(self):
+        now = self._clock()
+        now_ts = now.timestamp()
+        # Indexed edges that are overdue — the loop has not reached them yet,
+        # or the clock stepped forward past them — stay queued: the loop
+        # fires them within grace_s or logs them as missed.
+        overdue: dict[tuple, float] = {}
+        for ts, _, _, sid, action in self._heap:
+            if ts <= now_ts:
+                overdue[(sid, action)] = min(ts, overdue.get((sid, action), ts))
+        self._by_id = {s["id"]: s for s in self._store.all()
+                       if s.get("enabled", True) and "id" in s}
+        self._heap = []
+        for sid, sched in self._by_id.items():
+            for action in ("on", "off"):
+                last = self._last_fired.get((sid, action))
+                ts = overdue.get((sid, action))
+                if (ts is not None and (last is None or ts > last)
+                        and self._is_edge(sched, action, ts, now.tzinfo)):
+                    self._push_at_locked(ts, sid, action)
+                    continue
+                # Everything else is searched from now (never at or before
+                # an edge that already fired): an edge whose time passed
+                # before it was indexed is not caught up.
+                after = now
+                if last is not None:
+                    after = max(now, datetime.fromtimestamp(last, tz=now.tzinfo))
+                self._push_locked(sched, action, after)
+        self._last_fired = {k: v for k, v in self._last_fired.items() if k[0] in self._by_id}
+        self._dirty = False
+        logger.info("[Scheduler] Indexed %d edges from %d enabled schedules",
+                    len(self._heap), len(self._by_id))
+
+    def _skip_missed_locked(self, sched: dict, action: str, after: datetime,
+                            floor: datetime) -> datetime:
+        """After a long stall or a forward clock jump, count the occurrences
+        after `after` that are already older than the grace window as
+        missed; return where the search for the next edge should start."""
+        spec = self._edge_spec(sched, action)
+        skipped = 0
+        while spec is not None:
+            dt = self.next_fire(*spec, after)
+            if dt is None or dt >= floor:
+                break
+            skipped += 1
+            after = dt
+        if skipped:
+            self._missed += skipped
+            logger.warning("[Scheduler] Missed %d more %s edge(s) of %s, last at %s "
+                           "(clock jump or stall)", skipped, action.upper(),
+                           sched.get("label"), after.strftime("%Y-%m-%d %H:%M"))
+        return after
+
+    def desired_states(self, at: datetime) -> dict[str, tuple[str, dict, datetime]]:
+        """device → (action, schedule, edge time) of the most recent edge at
+        or before `at` across all enabled schedules.  Devices without any
+        schedule are absent: their state belongs to the user."""
+        with self._cond:
+            if self._dirty:
+                self._rebuild_locked()
+            scheds = list(self._by_id.values())
+        best: dict[str, tuple] = {}
+        for sched in scheds:
+            days = sched.get("days", list(range(7)))
+            for action in ("on", "off"):
+                hhmm = parse_hhmm(sched.get(f"{action}_time"))
+                dt = self.prev_fire(hhmm, days, at) if hhmm else None
+                if dt is None:
+                    continue
+                key = (dt.timestamp(), _ACTION_ORDER[action])
+                for device in sched.get("devices", []):
+                    if device not in best or key > best[device][0]:
+                        best[device] = (key, action, sched, dt)
+        return {d: (action, sched, dt) for d, (_, action, sched, dt) in best.items()}
+
+    # ── Loop ────────────────────────────────────────────
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+                if self._dirty:
+                    self._rebuild_locked()
+                now = self._clock()
+                now_ts = now.timestamp()
+                due = []
+                while self._heap and self._heap[0][0] <= now_ts:
+                    ts, _, _, sid, action = heapq.heappop(self._heap)
+                    sched = self._by_id.get(sid)
+                    if sched is None:
+                        continue
+                    due.append((ts, sched, action))
+                    self._last_fired[(sid, action)] = ts
+                    after = self._skip_missed_locked(
+                        sched, action, datetime.fromtimestamp(ts, tz=now.tzinfo),
+                        now - timedelta(seconds=self.grace_s))
+                    self._push_locked(sched, action, after)
+                if not due:
+                    delay = self._heap[0][0] - now_ts if self._heap else self.max_sleep_s
+                    self._cond.wait(min(max(delay, 0.05), self.max_sleep_s))
+                    continue
+
+            for ts, sched, action in due:
+                late = now_ts - ts
+                when = datetime.fromtimestamp(ts, tz=now.tzinfo)
+                if late > self.grace_s:
+                    self._missed += 1
+                    logger.warning("[Scheduler] Missed %s of %s at %s (%.0fs late)",
+                                   action.upper(), sched.get("label"),
+                                   when.strftime("%H:%M"), late)
+                    continue
+                self._fired += 1
+                self._max_late_s = max(self._max_late_s, late)
+                if late > 1.0:
+                    logger.info("[Scheduler] Catching up %s of %s (%.0fs late)",
+                                action.upper(), sched.get("label"), late)
+                try:
+                    self._on_fire(sched, action, when)
+                except Exception as exc:
+                    logger.error("[Scheduler] %s of %s failed: %s",
+                                 action.upper(), sched.get("label"), exc)
+
+    # ── Introspection ───────────────────────────────────
+
+    def upcoming(self, limit: int = 5) -> list[dict]:
+        with self._cond:
+            head = heapq.nsmallest(limit, self._heap)
+            by_id = self._by_id
+        out = []
+        for ts, _, _, sid, action in head:
+            sched = by_id.get(sid, {})
+            out.append({
+                "id":     sid,
+                "label":  sched.get("label"),
+                "action": action,
+                "at":     datetime.fromtimestamp(ts, tz=self._tz).isoformat(),
+            })
+        return out
+
+    def get_stats(self) -> dict:
+        with self._cond:
+            edges = len(self._heap)
+        return {
+            "indexed_edges": edges,
+            "fired":         self._fired,
+            "missed":        self._missed,
+            "max_late_s":    round(self._max_late_s, 1),
+            "grace_s":       self.grace_s,
+            "upcoming":      self.upcoming(),
+        }
@@ -0,0 +1,157 @@
+"""
+schedule_store.py
+─────────────────
+In-memory schedule repository backed by schedules.json.
+
+The file is read once at startup; the schedule engine and the /schedules routes
+work on the in-memory list.  Every mutation is persisted with an atomic
+write-temp-fsync-rename, so a power cut leaves either the old or the new
+file on the SD card — never a truncated one.
+
+The JSON is serialised under the store lock (microseconds) but written to
+disk under a separate write lock, so readers never wait on the SD card; a
+write that is overtaken by a newer version is skipped.
+
+Listeners registered with add_listener() are called after every change
+(the schedule engine uses this to re-index).
+"""
+
+import copy
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger("smart-switch")
+
+
+class ScheduleStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._items: list[dict] = []
+        self._version = 0
+        self._written_version = 0
+        self._listeners: list = []
+        self._load()
+
+    # ── Persistence ─────────────────────────────────────
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            if not isinstance(data, list):
+                raise ValueError("top-level JSON value is not a list")
+            self._items = data
+            logger.info("[Schedules] Loaded %d schedules from %s", len(data), self.path)
+        except Exception as exc:
+            # Keep the unreadable file for inspection instead of overwriting it
+            backup = f"{self.path}.corrupt-{int(time.time())}"
+            try:
+                os.replace(self.path, backup)
+            except OSError:
+                backup = "(not moved)"
+            logger.error("[Schedules] Cannot read %s (%s); starting empty, old file: %s",
+                         self.path, exc, backup)
+
+    def _persist(self, version: int, payload: str):
+        with self._write_lock:
+            if version <= self._written_version:
+                return                      # a newer snapshot is already on disk
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp = tempfile.mkstemp(prefix=".schedules-", suffix=".tmp", dir=directory)
+            try:
+                with os.fdopen(fd, "w") as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.path)
+                try:
+                    dfd = os.open(directory, os.O_RDONLY)
+                    try:
+                        os.fsync(dfd)       # make the rename itself durable
+                    finally:
+                        os.close(dfd)
+                except OSError:
+                    pass                    # not supported on every platform
+                self._written_version = version
+            except Exception as exc:
+                logger.error("[Schedules] Save failed: %s", exc)
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+
+    def _commit_locked(self) -> tuple[int, str]:
+        self._version += 1
+        return self._version, json.dumps(self._items, indent=2)
+
+    def _changed(self, version: int, payload: str):
+        self._persist(version, payload)
+        for fn in list(self._listeners):
+            try:
+                fn()
+            except Exception as exc:
+                logger.error("[Schedules] Listener failed: %s", exc)
+
+    def add_listener(self, fn):
+        """Call fn() (no arguments) after every mutation."""
+        self._listeners.append(fn)
+
+    # ── Queries ─────────────────────────────────────────
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def all(self) -> list[dict]:
+        """Snapshot of all schedules (safe to read without holding a lock)."""
+        with self._lock:
+            return copy.deepcopy(self._items)
+
+    def get(self, sched_id: str) -> Optional[dict]:
+        with self._lock:
+            for s in self._items:
+                if s["id"] == sched_id:
+                    return copy.deepcopy(s)
+        return None
+
+    # ── Mutations ───────────────────────────────────────
+
+    def add(self, schedule: dict) -> dict:
+        with self._lock:
+            self._items.append(copy.deepcopy(schedule))
+            version, payload = self._commit_locked()
+        self._changed(version, payload)
+        return schedule
+
+    def remove(self, sched_id: str) -> bool:
+        with self._lock:
+            before = len(self._items)
+            self._items = [s for s in self._items if s["id"] != sched_id]
+            if len(self._items) == before:
+                return False
+            version, payload = self._commit_locked()
+        self._changed(version, payload)
+        return True
+
+    def toggle(self, sched_id: str) -> Optional[dict]:
+        """Flip `enabled`; return the updated schedule or None if unknown."""
+        with self._lock:
+            for s in self._items:
+                if s["id"] == sched_id:
+                    s["enabled"] = not s.get("enabled", True)
+                    updated = copy.deepcopy(s)
+                    break
+            else:
+                return None
+            version, payload = self._commit_locked()
+        self._changed(version, payload)
+        return updated
@@ -12,6 +12,11 @@ Wiring (BCM pin numbers):
 The slider moves forward until LIMIT_A fires → reverses.
 Reverses until LIMIT_B fires → goes forward again.
 Continues bouncing until stop() is called.
+
+Position (no encoder): 0.0 = LIMIT_B end, 1.0 = LIMIT_A end.  Each limit hit
+pins the position; in between it is dead-reckoned from the measured
+end-to-end traverse time (EWMA of the time between opposite limit hits).
+In mock mode the bounce is simulated with the nominal traverse time.
 """
 
 from __future__ import annotations
@@ -20,6 +25,7 @@ import logging
 import os
 import time
 from threading import Lock
+from typing import Optional
 
 logger = logging.getLogger("smart-switch")
 
@@ -45,6 +51,8 @@ _PIN_LIM_B = 0
 
 SPEED = 1.0          # 0.0 – 1.0  PWM duty cycle
 COOLDOWN_S = 1.0     # seconds between limit-switch triggers (debounce)
+TRAVERSE_S = float(os.getenv("SLIDER_TRAVERSE_S", 8.0))   # nominal end-to-end time
+_TRAVERSE_EWMA = 0.3
 
 
 class SliderMotor:
@@ -59,6 +67,13 @@ class SliderMotor:
         self._direction          = "forward"   # "forward" | "reverse"
         self._last_trigger_time  = 0.0
 
+        # Position estimate (see module docstring)
+        self._last_limit: Optional[str] = None    # "A" | "B"
+        self._last_limit_time          = 0.0
+        self._traverse_s               = TRAVERSE_S
+        self._calibrated               = False
+        self._started_at               = 0.0
+
         # Hardware handles – created on first start() if not mock
         self._in1  = None
         self._in2  = None
@@ -85,6 +100,8 @@ class SliderMotor:
             self._running = True
             self._direction = "forward"
             self._last_trigger_time = 0.0
+            self._last_limit = None
+            self._started_at = time.monotonic()
 
         self._apply_direction()
         logger.info("[Slider] Started – direction: forward")
@@ -108,6 +125,36 @@ class SliderMotor:
     def direction(self) -> str:
         return self._direction
 
+    @property
+    def position(self) -> Optional[float]:
+        """Estimated slider position in [0, 1], or None until the first limit
+        hit (the start position is unknown without an encoder)."""
+        with self._lock:
+            if not self._running:
+                return None
+            now = time.monotonic()
+            if _USE_MOCK:
+                # Simulated bounce: forward from LIMIT_B at start()
+                phase = ((now - self._started_at) / self._traverse_s) % 2.0
+                return phase if phase <= 1.0 else 2.0 - phase
+            if self._last_limit is None:
+                return None
+            moved = (now - self._last_limit_time) / self._traverse_s
+            if self._last_limit == "A":
+                return max(0.0, 1.0 - moved)
+            return min(1.0, moved)
+
+    def get_status(self) -> dict:
+        pos = self.position
+        return {
+            "running":    self._running,
+            "direction":  self._direction,
+            "position":   round(pos, 3) if pos is not None else None,
+            "traverse_s": round(self._traverse_s, 2),
+            "calibrated": self._calibrated,
+            "simulated":  _USE_MOCK,
+        }
+
     # ── Hardware init ─────────────────────────────────────────────────────────
 
     def _init_hardware(self) -> bool:
@@ -134,8 +181,8 @@ class SliderMotor:
             self._lim_a = Button(_PIN_LIM_A, pull_up=True, bounce_time=0.1)
             self._lim_b = Button(_PIN_LIM_B, pull_up=True, bounce_time=0.1)
 
-            self._lim_a.when_pressed = self._on_limit_switch
-            self._lim_b.when_pressed = self._on_limit_switch
+            self._lim_a.when_pressed = lambda: self._on_limit_switch("A")
+            self._lim_b.when_pressed = lambda: self._on_limit_switch("B")
 
             self._hw_ok = True
             logger.info("[Slider] Hardware initialized (pins: IN1=%d IN2=%d ENA=%d "
@@ -194,12 +241,14 @@ class SliderMotor:
 
     # ── Limit switch callback ─────────────────────────────────────────────────
 
-    def _on_limit_switch(self):
+    def _on_limit_switch(self, which: str):
         """
-        Called by gpiozero from its own thread when either limit switch is pressed.
-        Reverses direction and resumes, with cooldown to prevent bounce retriggering.
+        Called by gpiozero from its own thread when limit switch "A" or "B" is
+        pressed.  Reverses direction and resumes, with cooldown to prevent
+        bounce retriggering, and re-anchors the position estimate.
         """
         now = time.time()
+        mono = time.monotonic()
 
         with self._lock:
             if not self._running:
@@ -207,15 +256,24 @@ class SliderMotor:
             if (now - self._last_trigger_time) < COOLDOWN_S:
                 return   # still within cooldown – ignore
             self._last_trigger_time = now
-            # Flip direction
-            self._direction = "reverse" if self._direction == "forward" else "forward"
+            if self._last_limit is not None and self._last_limit != which:
+                measured = mono - self._last_limit_time
+                if self._calibrated:
+                    self._traverse_s += _TRAVERSE_EWMA * (measured - self._traverse_s)
+                else:
+                    self._traverse_s = measured
+                    self._calibrated = True
+            self._last_limit = which
+            self._last_limit_time = mono
+            # Head away from the limit that was hit
+            self._direction = "reverse" if which == "A" else "forward"
             new_dir = self._direction
 
         # Brief stop before reversing (protects H-bridge driver)
         self._motor_stop()
         time.sleep(0.1)
         self._apply_direction()
-        logger.info("[Slider] Limit hit → direction now: %s", new_dir)
+        logger.info("[Slider] Limit %s hit → direction now: %s", which, new_dir)
 
     # ── Cleanup ───────────────────────────────────────────────────────────────
 
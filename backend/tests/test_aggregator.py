@@ -0,0 +1,242 @@
+import types
+
+import pytest
+
+import aggregator_core
+from aggregator_core import Aggregator, FirestoreWriter
+
+DAY = "2026-10-19"
+SUMMARY = ("attendance", DAY, "summary", "camera")
+
+
+def _event(roll, room="r1", date=DAY):
+    return {"date": date, "rollNo": roll, "name": f"Student {roll}", "room": room,
+            "ts": 1_792_400_000.0, "distance": 0.3}
+
+
+def _scan(session, passes=10, date=DAY):
+    return {"date": date, "session": session, "room": "r1", "sessions": 1,
+            "passes": passes, "faces": 2 * passes, "embeddings": passes // 2,
+            "duration_s": 30.0, "stop_reason": "manual"}
+
+
+class _Writer:
+    def __init__(self, fail=0):
+        self.fail = fail
+        self.calls = []
+
+    def __call__(self, records, scans=()):
+        if self.fail:
+            self.fail -= 1
+            raise RuntimeError("firestore unavailable")
+        self.calls.append(([r["rollNo"] for r in records], list(scans)))
+
+
+# ── Aggregator ──────────────────────────────────────────
+
+def test_ingest_dedupes_by_date_and_roll():
+    agg = Aggregator(_Writer())
+    assert agg.ingest([_event("A"), _event("B"), _event("A", room="r2")]) == \
+        {"accepted": 2, "duplicates": 1, "invalid": 0}
+    assert agg.ingest([_event("A", date="2026-10-20")])["accepted"] == 1
+    status = agg.status(DAY)
+    assert status["present"] == 2
+    assert next(r for r in status["records"] if r["rollNo"] == "A")["rooms"] == ["r1", "r2"]
+
+
+def test_ingest_rejects_invalid_events():
+    agg = Aggregator(_Writer())
+    result = agg.ingest(["x", {"rollNo": "A", "date": "19-10-2026"},
+                         {"date": DAY}, dict(_event("A"), ts="soon")],
+                        [{"date": DAY, "passes": 1}, "y"])
+    assert result == {"accepted": 0, "duplicates": 0, "invalid": 6}
+
+
+def test_scan_reports_are_deduped_by_session():
+    writer = _Writer()
+    agg = Aggregator(writer)
+    agg.ingest([], [_scan("s1", passes=10)])
+    assert agg.ingest([], [_scan("s1", passes=10)])["duplicates"] == 1   # retried POST
+    agg.ingest([], [_scan("s2", passes=4)])
+    assert agg.status(DAY)["scan"]["sessions"] == 2
+    assert agg.status(DAY)["scan"]["passes"] == 14
+    agg.flush()
+    (_, scans), = writer.calls
+    assert scans[0]["passes"] == 14
+    assert "session" not in scans[0]
+
+
+def test_flush_writes_each_record_once():
+    writer = _Writer()
+    agg = Aggregator(writer)
+    agg.ingest([_event("A"), _event("B")])
+    assert agg.flush() == 2
+    agg.ingest([_event("A")])
+    assert agg.flush() == 0
+    assert writer.calls == [(["A", "B"], [])]
+
+
+def test_failed_flush_is_retried():
+    writer = _Writer(fail=1)
+    agg = Aggregator(writer)
+    agg.ingest([_event("A")], [_scan("s1")])
+    assert agg.flush() == 0
+    status = agg.status()
+    assert status["pending_writes"] == 1
+    assert status["stats"]["failed_commits"] == 1
+    assert status["last_error"] == "firestore unavailable"
+
+    agg.ingest([_event("B")], [_scan("s2")])
+    assert agg.flush() == 2
+    (rolls, scans), = writer.calls
+    assert sorted(rolls) == ["A", "B"]
+    assert scans[0]["sessions"] == 2            # the failed report is not lost
+    assert agg.status()["pending_writes"] == 0
+
+
+def test_flush_respects_max_batch():
+    writer = _Writer()
+    agg = Aggregator(writer, max_batch=2)
+    agg.ingest([_event(str(i)) for i in range(5)])
+    assert [agg.flush(), agg.flush(), agg.flush(), agg.flush()] == [2, 2, 1, 0]
+
+
+def test_old_dates_are_pruned():
+    agg = Aggregator(_Writer(), keep_days=2)
+    for day in ("2026-10-17", "2026-10-18", "2026-10-19"):
+        agg.ingest([_event("A", date=day)], [_scan("s", date=day)])
+    assert list(agg.status()["dates"]) == ["2026-10-18", "2026-10-19"]
+
+
+# ── FirestoreWriter ─────────────────────────────────────
+
+class _Increment:
+    def __init__(self, n):
+        self.n = n
+
+
+class _ArrayUnion:
+    def __init__(self, values):
+        self.values = values
+
+
+def _merge(doc, data):
+    for key, value in data.items():
+        if isinstance(value, _Increment):
+            doc[key] = doc.get(key, 0) + value.n
+        elif isinstance(value, _ArrayUnion):
+            doc[key] = list(dict.fromkeys(list(doc.get(key, [])) + value.values))
+        elif isinstance(value, dict):
+            _merge(doc.setdefault(key, {}), value)
+        else:
+            doc[key] = value
+
+
+class _Ref:
+    def __init__(self, db, path):
+        self.db = db
+        self.path = path
+
+    def collection(self, name):
+        return _Ref(self.db, self.path + (name,))
+
+    def document(self, name):
+        return _Ref(self.db, self.path + (name,))
+
+    def get(self):
+        self.db.reads += 1
+        doc = self.db.docs.get(self.path)
+        return types.SimpleNamespace(exists=doc is not None, to_dict=lambda: doc)
+
+
+class _Batch:
+    def __init__(self, db):
+        self.db = db
+        self.ops = []
+
+    def set(self, ref, data, merge=False):
+        assert merge
+        self.ops.append((ref.path, data))
+
+    def commit(self):
+        if self.db.fail:
+            self.db.fail -= 1
+            raise RuntimeError("deadline exceeded")
+        self.db.commits.append(len(self.ops))
+        for path, data in self.ops:
+            _merge(self.db.docs.setdefault(path, {}), data)
+
+
+class _DB:
+    def __init__(self):
+        self.docs = {}
+        self.commits = []
+        self.reads = 0
+        self.fail = 0
+
+    def collection(self, name):
+        return _Ref(self, (name,))
+
+    def batch(self):
+        return _Batch(self)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(aggregator_core, "firestore",
+                        types.SimpleNamespace(SERVER_TIMESTAMP="ts", Increment=_Increment,
+                                              ArrayUnion=_ArrayUnion),
+                        raising=False)
+    return _DB()
+
+
+def test_writer_builds_records_and_summary(db):
+    agg = Aggregator(FirestoreWriter(db))
+    agg.ingest([_event("A"), _event("B", room="r2")], [_scan("s1")])
+    agg.flush()
+    assert db.commits == [4]                        # 2 records, parent, summary
+    summary = db.docs[SUMMARY]
+    assert summary["presentCount"] == 2
+    assert summary["present"] == ["A", "B"]
+    assert summary["firstRoom"] == {"A": "r1", "B": "r2"}
+    assert summary["scan"]["passes"] == 10
+    assert db.docs[("attendance", DAY, "records", "B")]["room"] == "r2"
+    assert db.docs[("attendance", DAY)]["date"] == DAY
+
+
+def test_writer_does_not_count_twice_across_restarts(db):
+    first = Aggregator(FirestoreWriter(db))
+    first.ingest([_event("A")], [_scan("s1")])
+    first.flush()
+
+    # A restarted process (fresh writer and aggregator) sees A again
+    second = Aggregator(FirestoreWriter(db))
+    second.ingest([_event("A"), _event("C")], [_scan("s2", passes=4)])
+    second.flush()
+    second.ingest([_event("D")])
+    second.flush()
+
+    summary = db.docs[SUMMARY]
+    assert summary["presentCount"] == 3
+    assert summary["present"] == ["A", "C", "D"]
+    assert summary["scan"]["sessions"] == 2
+    assert summary["scan"]["passes"] == 14
+    assert db.reads == 2                        # summary read once per writer and date
+
+
+def test_failed_commit_counts_nothing(db):
+    agg = Aggregator(FirestoreWriter(db))
+    agg.ingest([_event("A")])
+    db.fail = 1
+    assert agg.flush() == 0
+    assert SUMMARY not in db.docs
+    assert agg.flush() == 1
+    assert db.docs[SUMMARY]["presentCount"] == 1
+
+
+def test_large_writes_are_split_into_batches(db):
+    FirestoreWriter(db)([_event(f"X{i:03d}") for i in range(900)])
+    # The parent and summary ride in the last commit, after every record
+    assert db.commits == [450, 450, 2]
+    assert max(db.commits) <= FirestoreWriter.MAX_OPS
+    assert db.docs[SUMMARY]["presentCount"] == 900
@@ -0,0 +1,94 @@
+import os
+import signal
+import time
+
+import numpy as np
+import pytest
+
+from model import inference_worker
+from model.inference_worker import InferenceWorker
+
+
+def _stub_worker(req_q, res_q, slot_names, kwargs):
+    """Stand-in for the TF child: optional warm-up, then echo frame sums."""
+    from multiprocessing import shared_memory
+    time.sleep(kwargs.get("warmup_s", 0.0))
+    slots = [shared_memory.SharedMemory(name=n) for n in slot_names]
+    res_q.put(("ready", os.getpid()))
+    while True:
+        msg = req_q.get()
+        if msg is None:
+            break
+        if msg[0] != "frame":
+            continue
+        _, seq, slot, shape, dtype, *_ = msg
+        frame = np.ndarray(shape, dtype=np.dtype(dtype), buffer=slots[slot].buf)
+        res_q.put(("result", seq, int(frame.sum()), 0.0))
+        del frame
+
+
+@pytest.fixture
+def make_worker(monkeypatch):
+    monkeypatch.setattr(inference_worker, "_worker_main", _stub_worker)
+    monkeypatch.setattr(inference_worker, "_RESTART_DELAY_S", 0.2)
+    workers = []
+
+    def make(**kwargs):
+        timeout_s = kwargs.pop("timeout_s", 30.0)
+        w = InferenceWorker(kwargs, slot_bytes=64, slots=2, timeout_s=timeout_s)
+        w.start()
+        workers.append(w)
+        return w
+
+    yield make
+    for w in workers:
+        w.stop()
+
+
+def _wait(pred, timeout_s=20.0):
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        if pred():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_round_trip(make_worker):
+    w = make_worker()
+    frame = np.full((2, 4), 3, dtype=np.uint8)
+    assert w.submit(frame).result(timeout=20) == 24
+    assert w.get_stats()["completed"] == 1
+
+
+def test_recovers_after_child_is_killed(make_worker):
+    w = make_worker()
+    frame = np.ones((2, 4), dtype=np.uint8)
+    assert w.submit(frame).result(timeout=20) == 8
+
+    os.kill(w.get_stats()["pid"], signal.SIGKILL)
+    assert _wait(lambda: w.get_stats()["restarting"] or w.get_stats()["restarts"])
+    # Submitting while the respawn is under way must raise (the engine then
+    # runs the pass in process) or be answered by the new child — never be
+    # queued for the dead one.
+    try:
+        fut = w.submit(frame)
+    except RuntimeError:
+        fut = None
+    assert _wait(lambda: w.get_stats()["ready"] and not w.get_stats()["restarting"])
+    if fut is not None:
+        try:
+            assert fut.result(timeout=20) == 8
+        except RuntimeError:
+            pass
+    assert w.submit(frame).result(timeout=20) == 8
+
+    time.sleep(1.0)
+    assert w.get_stats()["restarts"] == 1
+
+
+def test_warm_up_is_not_a_timeout(make_worker):
+    w = make_worker(warmup_s=2.0, timeout_s=0.5)
+    fut = w.submit(np.ones((2, 2), dtype=np.uint8))
+    assert fut.result(timeout=20) == 4
+    assert w.get_stats()["restarts"] == 0
@@ -0,0 +1,120 @@
+import numpy as np
+
+from model.recognition import EmbeddingCache, Recognizer, nms, plan_regions, plan_tiles
+
+
+def _box(x, y, w, h):
+    return {"x": x, "y": y, "w": w, "h": h}
+
+
+FRAME = (480, 640, 3)
+
+
+def test_regions_are_padded_and_clipped_to_the_frame():
+    assert plan_regions([_box(100, 100, 40, 40)], FRAME, pad=0.5) == [(80, 80, 80, 80)]
+    assert plan_regions([_box(0, 0, 40, 40)], FRAME, pad=0.5) == [(0, 0, 60, 60)]
+
+
+def test_overlapping_regions_merge():
+    regions = plan_regions([_box(100, 100, 40, 40), _box(150, 100, 40, 40)], FRAME, pad=0.5)
+    assert regions == [(80, 80, 130, 80)]
+
+
+def test_distant_regions_stay_separate():
+    regions = plan_regions([_box(50, 50, 40, 40), _box(500, 350, 40, 40)], FRAME, pad=0.5)
+    assert len(regions) == 2
+
+
+def test_large_coverage_falls_back_to_full_frame():
+    assert plan_regions([_box(100, 50, 300, 300)], FRAME, pad=0.5) is None
+    assert plan_regions([], FRAME) is None
+
+
+def test_tiles_cover_the_frame_with_overlap():
+    tiles = plan_tiles(FRAME, rows=2, cols=2, overlap=0.2)
+    assert len(tiles) == 4
+    assert all(x + w <= 640 and y + h <= 480 for x, y, w, h in tiles)
+    assert max(x + w for x, _, w, _ in tiles) == 640
+    assert max(y + h for _, y, _, h in tiles) == 480
+    (x0, _, w0, _), (x1, _, _, _) = tiles[0], tiles[1]
+    assert x1 < x0 + w0                          # neighbours overlap
+
+
+def test_single_tile_is_the_whole_frame():
+    assert plan_tiles(FRAME, rows=1, cols=1) == [(0, 0, 640, 480)]
+
+
+def test_nms_keeps_the_most_confident_of_overlapping_boxes():
+    hits = [(_box(100, 100, 40, 40), 0.7, "b"),
+            (_box(102, 101, 40, 40), 0.9, "a"),
+            (_box(300, 300, 40, 40), 0.8, "c")]
+    assert sorted(h[2] for h in nms(hits)) == ["a", "c"]
+
+
+def test_nms_prefers_the_whole_face_over_a_seam_fragment():
+    whole = (_box(100, 100, 40, 40), 0.85, "whole")
+    part = (_box(100, 100, 18, 40), 0.9, "part")     # cut by a tile seam
+    assert [h[2] for h in nms([whole, part])] == ["whole"]
+
+
+def test_nms_keeps_a_much_more_confident_fragment():
+    whole = (_box(100, 100, 40, 40), 0.5, "whole")
+    part = (_box(100, 100, 18, 40), 0.95, "part")
+    assert [h[2] for h in nms([whole, part])] == ["part"]
+
+
+def _face(seed):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 255, (64, 64, 3), dtype=np.uint8)
+
+
+def test_cache_hits_near_identical_crop_in_the_same_cell():
+    cache = EmbeddingCache(ttl_s=10.0)
+    face, box = _face(1), _box(100, 100, 40, 40)
+    vec = np.ones(4, dtype=np.float32)
+    assert cache.get(cache.key(face, box), now=0.0) is None
+    cache.put(cache.key(face, box), vec, now=0.0)
+    noisy = np.clip(face.astype(int) + 1, 0, 255).astype(np.uint8)
+    moved = _box(103, 101, 40, 40)                   # same cell
+    assert cache.get(cache.key(noisy, moved), now=1.0) is vec
+    assert cache.get_stats()["hits"] == 1 and cache.get_stats()["misses"] == 1
+
+
+def test_cache_misses_other_faces_cells_and_streams():
+    cache = EmbeddingCache()
+    face, box = _face(1), _box(100, 100, 40, 40)
+    cache.put(cache.key(face, box), np.ones(4), now=0.0)
+    assert cache.get(cache.key(_face(2), box), now=1.0) is None
+    assert cache.get(cache.key(face, _box(200, 100, 40, 40)), now=1.0) is None
+    assert cache.get(cache.key(face, box, stream="back"), now=1.0) is None
+
+
+def test_cache_entries_expire():
+    cache = EmbeddingCache(ttl_s=5.0)
+    key = cache.key(_face(1), _box(100, 100, 40, 40))
+    cache.put(key, np.ones(4), now=0.0)
+    assert cache.get(key, now=4.0) is not None
+    assert cache.get(key, now=10.0) is None
+    assert cache.get_stats()["size"] == 0
+
+
+def test_cache_evicts_least_recently_used():
+    cache = EmbeddingCache(size=2)
+    keys = [cache.key(_face(i), _box(100 * i, 0, 40, 40)) for i in range(3)]
+    for i, key in enumerate(keys[:2]):
+        cache.put(key, np.full(4, i), now=0.0)
+    cache.get(keys[0], now=1.0)                      # 0 is now the most recent
+    cache.put(keys[2], np.full(4, 2), now=1.0)
+    assert cache.get(keys[1], now=1.0) is None
+    assert cache.get(keys[0], now=1.0) is not None
+
+
+def test_quality_gate_judges_size_in_full_frame_pixels():
+    rec = Recognizer(min_face_px=48, min_blur=0, min_confidence=0)
+    img = _face(1)
+    # A 30 px face on a detector input downscaled 0.5x is 60 px in the frame
+    face_obj = {"facial_area": {"x": 0, "y": 0, "w": 30, "h": 30}}
+    assert rec.quality(img, face_obj, _box(0, 0, 60, 60))[1] is None
+    # and 60 px on an upscaled crop can be only 30 px in the frame
+    face_obj = {"facial_area": {"x": 0, "y": 0, "w": 60, "h": 60}}
+    assert rec.quality(img, face_obj, _box(0, 0, 30, 30))[1] == "small"
@@ -0,0 +1,148 @@
+import threading
+import time
+
+import pytest
+
+from relay_controller import RelayController, RelayWriteError
+
+
+class _Relay:
+    def __init__(self, name, log, active=False, fail=False):
+        self.name = name
+        self.log = log
+        self.is_active = active
+        self.fail = fail
+
+    def on(self):
+        if self.fail:
+            raise OSError("gpio busy")
+        self.is_active = True
+        self.log.append((self.name, "on"))
+
+    def off(self):
+        if self.fail:
+            raise OSError("gpio busy")
+        self.is_active = False
+        self.log.append((self.name, "off"))
+
+
+@pytest.fixture
+def board():
+    log = []
+    relays = {n: _Relay(n, log) for n in ("light1", "light2", "fan1", "fan2", "fan3")}
+    return relays, log
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_initial_state_comes_from_the_board(board):
+    relays, _ = board
+    relays["light2"].is_active = True
+    rc = RelayController(relays)
+    assert rc.states() == {"light1": False, "light2": True,
+                           "fan1": False, "fan2": False, "fan3": False}
+
+
+def test_only_changes_are_written(board):
+    relays, log = board
+    rc = RelayController(relays)
+    assert rc.apply({"light1": True, "light2": False, "nope": True}) == ["light1"]
+    assert rc.apply({"light1": True}) == []
+    assert rc.set("light1", True) is False
+    assert log == [("light1", "on")]
+
+
+def test_offs_are_written_before_ons(board):
+    relays, log = board
+    relays["light1"].is_active = True
+    relays["fan1"].is_active = True
+    rc = RelayController(relays)
+    rc.apply({"light2": True, "light1": False, "fan2": True, "fan1": False})
+    assert log[:2] == [("light1", "off"), ("fan1", "off")]
+    assert sorted(log[2:]) == [("fan2", "on"), ("light2", "on")]
+
+
+def test_inrush_ons_are_staggered_without_blocking(board):
+    relays, log = board
+    rc = RelayController(relays, inrush={"fan1", "fan2", "fan3"}, stagger_s=0.1)
+    t0 = time.monotonic()
+    rc.apply({"fan1": True, "fan2": True, "fan3": True, "light1": True})
+    assert time.monotonic() - t0 < 0.05
+    # Tracked state is the target at once; only the first fan is on so far
+    assert rc.states()["fan3"] is True
+    assert log == [("light1", "on"), ("fan1", "on")]
+    assert _wait_for(lambda: len(log) == 4)
+    assert log[2:] == [("fan2", "on"), ("fan3", "on")]
+
+
+def test_single_inrush_device_is_not_staggered(board):
+    relays, log = board
+    rc = RelayController(relays, inrush={"fan1", "fan2"}, stagger_s=5.0)
+    rc.apply({"fan1": True, "light1": True})
+    assert sorted(log) == [("fan1", "on"), ("light1", "on")]
+
+
+def test_newer_command_supersedes_a_pending_on(board):
+    relays, log = board
+    rc = RelayController(relays, inrush={"fan1", "fan2"}, stagger_s=0.1)
+    rc.apply({"fan1": True, "fan2": True})
+    rc.set("fan2", False)                   # before its timer fires
+    time.sleep(0.3)
+    assert ("fan2", "on") not in log
+    assert rc.states()["fan2"] is False
+    assert relays["fan2"].is_active is False
+
+
+def test_toggle_returns_the_new_state(board):
+    relays, log = board
+    rc = RelayController(relays)
+    assert rc.toggle("light1") is True
+    assert rc.toggle("light1") is False
+    assert log == [("light1", "on"), ("light1", "off")]
+
+
+def test_concurrent_toggles_stay_consistent(board):
+    relays, log = board
+    rc = RelayController(relays)
+    threads = [threading.Thread(target=rc.toggle, args=("light1",)) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert rc.state("light1") is False
+    assert len(log) == 10
+
+
+def test_failed_write_is_raised_after_the_batch(board):
+    relays, log = board
+    relays["light1"].fail = True
+    rc = RelayController(relays)
+    with pytest.raises(RelayWriteError) as err:
+        rc.apply({"light1": True, "light2": True})
+    assert err.value.changed == ["light2"]
+    assert list(err.value.failed) == ["light1"]
+    assert log == [("light2", "on")]
+    assert rc.states()["light1"] is False
+    assert rc.states()["light2"] is True
+    with pytest.raises(RelayWriteError):
+        rc.set("light1", True)
+    # Nothing is remembered as written, so the next request tries again
+    relays["light1"].fail = False
+    assert rc.set("light1", True) is True
+    assert relays["light1"].is_active is True
+
+
+def test_failed_toggle_returns_the_actual_state(board):
+    relays, log = board
+    relays["light1"].fail = True
+    rc = RelayController(relays)
+    assert rc.toggle("light1") is False
+    assert rc.state("light1") is False
+    assert log == []
@@ -0,0 +1,193 @@
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from schedule_engine import ScheduleEngine
+
+TZ = timezone.utc
+
+
+class _Store:
+    def __init__(self, items):
+        self.items = items
+        self.listeners = []
+
+    def all(self):
+        return [dict(s) for s in self.items]
+
+    def add_listener(self, fn):
+        self.listeners.append(fn)
+
+
+class _Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _at(day, hh, mm, ss=0):
+    return datetime(2026, 10, day, hh, mm, ss, tzinfo=TZ)
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+@pytest.fixture
+def make_engine():
+    engines = []
+
+    def make(schedules, now, grace_s=120.0):
+        clock = _Clock(now)
+        fired = []
+        lock = threading.Lock()
+
+        def on_fire(sched, action, when):
+            with lock:
+                fired.append((sched["id"], action, when))
+
+        engine = ScheduleEngine(_Store(schedules), clock, TZ, on_fire,
+                                grace_s=grace_s, max_sleep_s=0.02)
+        engines.append(engine)
+        engine.start()
+        return engine, clock, fired
+
+    yield make
+    for engine in engines:
+        engine.stop()
+
+
+def _settle():
+    time.sleep(0.15)
+
+
+def test_edges_fire_in_time_order(make_engine):
+    scheds = [{"id": "a", "label": "A", "on_time": "08:00", "off_time": "09:00", "devices": ["l1"]},
+              {"id": "b", "label": "B", "on_time": "08:30", "off_time": "08:45", "devices": ["l2"]}]
+    engine, clock, fired = make_engine(scheds, _at(19, 7, 59), grace_s=7200)
+    _settle()
+    assert fired == []
+    assert [(u["id"], u["action"]) for u in engine.upcoming(4)] == \
+        [("a", "on"), ("b", "on"), ("b", "off"), ("a", "off")]
+
+    clock.now = _at(19, 9, 0, 1)       # everything comes due at once (stall)
+    assert _wait_for(lambda: len(fired) == 4)
+    assert [(sid, action) for sid, action, _ in fired] == \
+        [("a", "on"), ("b", "on"), ("b", "off"), ("a", "off")]
+
+
+def test_off_runs_before_on_at_the_same_time(make_engine):
+    # Class A ends at 10:00 on the same light class B starts with
+    scheds = [{"id": "b", "label": "B", "on_time": "10:00", "off_time": "11:00", "devices": ["l1"]},
+              {"id": "a", "label": "A", "on_time": "09:00", "off_time": "10:00", "devices": ["l1"]}]
+    engine, clock, fired = make_engine(scheds, _at(19, 9, 30))
+    clock.now = _at(19, 10, 0, 1)
+    assert _wait_for(lambda: len(fired) == 2)
+    assert [(sid, action) for sid, action, _ in fired] == [("a", "off"), ("b", "on")]
+    action, sched, _ = engine.desired_states(_at(19, 10, 0))["l1"]
+    assert (action, sched["id"]) == ("on", "b")
+
+
+def test_startup_does_not_fire_past_edges(make_engine):
+    scheds = [{"id": "a", "label": "A", "on_time": "08:00", "off_time": "08:01", "devices": ["l1"]}]
+    engine, clock, fired = make_engine(scheds, _at(19, 8, 0, 30))
+    _settle()
+    assert fired == []
+    clock.now = _at(19, 8, 1, 5)
+    assert _wait_for(lambda: len(fired) == 1)
+    assert fired[0][:2] == ("a", "off")
+
+
+def test_late_indexed_edge_is_caught_up_within_grace(make_engine):
+    scheds = [{"id": "a", "label": "A", "on_time": "08:00", "off_time": "09:00", "devices": ["l1"]}]
+    engine, clock, fired = make_engine(scheds, _at(19, 7, 59), grace_s=120)
+    _settle()
+    clock.now = _at(19, 8, 1, 30)       # 90 s late, inside the grace window
+    assert _wait_for(lambda: len(fired) == 1)
+    assert fired[0] == ("a", "on", _at(19, 8, 0))
+    assert engine.get_stats()["max_late_s"] == pytest.approx(90, abs=1)
+
+
+def test_edge_older_than_grace_is_missed(make_engine):
+    scheds = [{"id": "a", "label": "A", "on_time": "08:00", "off_time": "09:00", "devices": ["l1"]}]
+    engine, clock, fired = make_engine(scheds, _at(19, 7, 59), grace_s=60)
+    _settle()
+    clock.now = _at(19, 8, 5)
+    assert _wait_for(lambda: engine.get_stats()["missed"] == 1)
+    _settle()
+    assert fired == []
+
+
+def test_forward_jump_logs_skipped_days_and_keeps_grace_edge(make_engine, caplog):
+    scheds = [{"id": "a", "label": "A", "on_time": "08:00", "off_time": "18:00", "devices": ["l1"]}]
+    engine, clock, fired = make_engine(scheds, _at(19, 7, 59), grace_s=120)
+    _settle()
+    before = clock.now
+    clock.now = _at(22, 8, 0, 20)
+    with caplog.at_level(logging.WARNING, logger="smart-switch"):
+        engine.clock_stepped(before, clock.now)
+        assert _wait_for(lambda: len(fired) == 1)
+        _settle()
+    # Only the 22nd's ON (20 s late) fires; the 19th-21st were jumped over
+    assert fired == [("a", "on", _at(22, 8, 0))]
+    assert engine.get_stats()["missed"] == 3 + 3       # 3 ONs, 3 OFFs
+    assert any("Missed" in r.getMessage() for r in caplog.records)
+
+
+def test_backward_step_refires_edges_recorded_on_the_wrong_clock(make_engine):
+    scheds = [{"id": "a", "label": "A", "on_time": "08:00", "off_time": "18:00", "devices": ["l1"]}]
+    engine, clock, fired = make_engine(scheds, _at(19, 7, 59))
+    clock.now = _at(19, 8, 0, 5)
+    assert _wait_for(lambda: len(fired) == 1)
+
+    # The clock was 10 minutes fast: the ON really hasn't happened yet
+    before = clock.now
+    clock.now = _at(19, 7, 50, 5)
+    engine.clock_stepped(before, clock.now)
+    _settle()
+    assert len(fired) == 1
+    clock.now = _at(19, 8, 0, 1)
+    assert _wait_for(lambda: len(fired) == 2)
+    assert fired[1][:2] == ("a", "on")
+
+
+def test_reload_does_not_fire_an_edge_twice(make_engine):
+    store_item = {"id": "a", "label": "A", "on_time": "08:00", "off_time": "18:00", "devices": ["l1"]}
+    engine, clock, fired = make_engine([store_item], _at(19, 7, 59))
+    clock.now = _at(19, 8, 0, 5)
+    assert _wait_for(lambda: len(fired) == 1)
+    engine.reload()
+    _settle()
+    assert len(fired) == 1
+
+
+def test_disabled_and_invalid_schedules_are_not_indexed(make_engine):
+    scheds = [{"id": "a", "label": "A", "on_time": "08:00", "off_time": "18:00",
+               "devices": ["l1"], "enabled": False},
+              {"id": "b", "label": "B", "on_time": "25:00", "off_time": "18:00", "devices": ["l2"]}]
+    engine, clock, fired = make_engine(scheds, _at(19, 7, 59))
+    _settle()
+    assert [(u["id"], u["action"]) for u in engine.upcoming()] == [("b", "off")]
+
+
+def test_days_restrict_occurrences(make_engine):
+    # 2026-10-19 is a Monday; weekdays only
+    scheds = [{"id": "a", "label": "A", "on_time": "08:00", "off_time": "18:00",
+               "devices": ["l1"], "days": [0, 1, 2, 3, 4]}]
+    engine, clock, fired = make_engine(scheds, _at(24, 9, 0))      # Saturday
+    _settle()
+    assert engine.upcoming(1)[0]["at"] == _at(26, 8, 0).isoformat()
+    # Over the weekend the last edge was Friday's OFF
+    action, _, when = engine.desired_states(_at(25, 12, 0))["l1"]
+    assert (action, when) == ("off", _at(23, 18, 0))
+    assert "l9" not in engine.desired_states(_at(25, 12, 0))
@@ -0,0 +1,134 @@
+import json
+import os
+import threading
+
+import pytest
+
+from schedule_store import ScheduleStore
+
+
+def _sched(sched_id, **extra):
+    return {"id": sched_id, "device": "light", "action": "on",
+            "time": "08:00", "enabled": True, **extra}
+
+
+def _on_disk(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "schedules.json")
+
+
+def test_missing_file_starts_empty(path):
+    store = ScheduleStore(path)
+    assert store.all() == []
+    assert store.version == 0
+    assert not os.path.exists(path)
+
+
+def test_mutations_persist_and_bump_version(path):
+    store = ScheduleStore(path)
+    store.add(_sched("a"))
+    store.add(_sched("b"))
+    assert store.version == 2
+    assert [s["id"] for s in _on_disk(path)] == ["a", "b"]
+
+    assert store.toggle("a")["enabled"] is False
+    assert store.version == 3
+    assert _on_disk(path)[0]["enabled"] is False
+
+    assert store.remove("b") is True
+    assert store.version == 4
+    assert [s["id"] for s in _on_disk(path)] == ["a"]
+
+    # A reload sees exactly what was written
+    assert ScheduleStore(path).all() == store.all()
+
+
+def test_noop_mutations_do_not_write(path):
+    store = ScheduleStore(path)
+    store.add(_sched("a"))
+    mtime = os.stat(path).st_mtime_ns
+    assert store.remove("missing") is False
+    assert store.toggle("missing") is None
+    assert store.version == 1
+    assert os.stat(path).st_mtime_ns == mtime
+
+
+def test_snapshots_are_copies(path):
+    store = ScheduleStore(path)
+    original = _sched("a")
+    store.add(original)
+    original["time"] = "09:00"
+    store.all()[0]["time"] = "10:00"
+    store.get("a")["time"] = "11:00"
+    assert store.get("a")["time"] == "08:00"
+
+
+def test_write_leaves_no_temp_files(path, tmp_path):
+    store = ScheduleStore(path)
+    for i in range(5):
+        store.add(_sched(str(i)))
+    assert sorted(os.listdir(tmp_path)) == ["schedules.json"]
+
+
+def test_failed_write_keeps_old_file(path, tmp_path, monkeypatch):
+    store = ScheduleStore(path)
+    store.add(_sched("a"))
+
+    def boom(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", boom)
+    store.add(_sched("b"))
+    monkeypatch.undo()
+
+    assert [s["id"] for s in _on_disk(path)] == ["a"]
+    assert sorted(os.listdir(tmp_path)) == ["schedules.json"]
+    # Memory still has both; the next successful write catches the file up
+    store.toggle("a")
+    assert [s["id"] for s in _on_disk(path)] == ["a", "b"]
+
+
+def test_stale_snapshot_is_not_written_over_newer(path):
+    store = ScheduleStore(path)
+    store.add(_sched("a"))
+    store.add(_sched("b"))
+    # A writer that serialised version 1 but lost the race to version 2
+    store._persist(1, json.dumps([_sched("a")]))
+    assert [s["id"] for s in _on_disk(path)] == ["a", "b"]
+
+
+def test_concurrent_adds_end_with_latest_version_on_disk(path):
+    store = ScheduleStore(path)
+    threads = [threading.Thread(target=store.add, args=(_sched(str(i)),)) for i in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert store.version == 20
+    assert len(_on_disk(path)) == 20
+
+
+def test_corrupt_file_is_moved_aside(path, tmp_path):
+    with open(path, "w") as f:
+        f.write("{not json")
+    store = ScheduleStore(path)
+    assert store.all() == []
+    names = os.listdir(tmp_path)
+    assert not os.path.exists(path)
+    assert len(names) == 1 and names[0].startswith("schedules.json.corrupt-")
+
+
+def test_listeners_run_after_each_change(path):
+    store = ScheduleStore(path)
+    seen = []
+    store.add_listener(lambda: seen.append(store.version))
+    store.add_listener(lambda: 1 / 0)       # a failing listener doesn't block others
+    store.add(_sched("a"))
+    store.toggle("a")
+    store.remove("a")
+    assert seen == [1, 2, 3]
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from model.scheduling import AdaptiveScheduler
+
+
+@pytest.fixture
+def sched(monkeypatch):
+    for var in ("CAM_ADAPTIVE_MIN_S", "CAM_ADAPTIVE_MAX_S", "CAM_ADAPTIVE_DUTY",
+                "CAM_STATIC_DELTA", "CAM_STATIC_MAX_SKIP_S", "CAM_THERMAL_SOFT_C"):
+        monkeypatch.delenv(var, raising=False)
+    s = AdaptiveScheduler(base_interval_s=0.5)
+    # No /proc or /sys reads: an idle, cool machine unless a test says otherwise
+    monkeypatch.setattr(s, "_poll_system", lambda now: None)
+    return s
+
+
+def _frame(value=0):
+    return np.full((96, 128, 3), value, dtype=np.uint8)
+
+
+def test_base_interval_without_feedback(sched):
+    assert sched.on_pass_started(_frame(), 0.0) == pytest.approx(0.5)
+
+
+def test_interval_follows_median_latency_over_duty(sched):
+    for latency in (0.9, 1.2, 1.2):
+        sched.record_pass(latency, faces=0, pending=0)
+    # median 1.2 s at 60 % duty
+    assert sched.on_pass_started(_frame(), 0.0) == pytest.approx(2.0)
+
+
+def test_interval_is_clamped(sched):
+    sched.record_pass(10.0, faces=0, pending=0)
+    assert sched.on_pass_started(_frame(), 0.0) == pytest.approx(sched.max_interval_s)
+
+
+def test_load_and_throttling_back_off(sched):
+    sched._load = 1.5
+    assert sched.on_pass_started(_frame(), 0.0) == pytest.approx(0.75)
+    sched._throttled = True
+    assert sched.on_pass_started(_frame(), 1.0) == pytest.approx(1.5)
+
+
+def test_soft_temperature_backs_off_proportionally(sched):
+    sched._temp_c = sched.thermal_soft_c + 5.0
+    assert sched.on_pass_started(_frame(), 0.0) == pytest.approx(0.75)
+
+
+def test_pending_votes_halve_the_interval(sched):
+    sched.record_pass(0.3, faces=2, pending=1)
+    assert sched.on_pass_started(_frame(), 0.0) == pytest.approx(0.25)
+    assert sched.get_stats()["pending_faces"] == 3      # 1 pending + 2 new faces
+
+
+def test_static_scene_is_skipped_until_it_changes(sched):
+    sched.record_pass(0.1, faces=0, pending=0)
+    sched.record_pass(0.1, faces=0, pending=0)
+    sched.on_pass_started(_frame(10), 0.0)
+    assert sched.should_skip(_frame(10), 1.0)
+    assert not sched.should_skip(_frame(200), 1.0)
+
+
+def test_static_skip_is_bounded_in_time(sched):
+    sched.on_pass_started(_frame(10), 0.0)
+    assert sched.should_skip(_frame(10), 1.0)
+    assert not sched.should_skip(_frame(10), sched.max_static_s + 0.1)
+
+
+def test_no_skip_while_votes_are_pending(sched):
+    sched.record_pass(0.1, faces=1, pending=1)
+    sched.on_pass_started(_frame(10), 0.0)
+    assert not sched.should_skip(_frame(10), 1.0)
+
+
+def test_disabled_scheduler_is_fixed():
+    s = AdaptiveScheduler(base_interval_s=0.5, enabled=False)
+    s.record_pass(5.0, faces=3, pending=3)
+    assert s.on_pass_started(_frame(), 0.0) == pytest.approx(0.5)
+    assert not s.should_skip(_frame(), 1.0)
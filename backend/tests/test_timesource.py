@@ -0,0 +1,190 @@
+import os
+import time
+from datetime import timezone
+
+import pytest
+
+import timesource
+from timesource import Clock, NTPSource, StandInNTPServer
+
+TZ = timezone.utc
+
+
+def _answer(server, distance, true_offset=0.0):
+    mono, wall = time.monotonic(), time.time()
+    return {"server": server, "mono": mono, "wall": wall, "true": wall + true_offset,
+            "delay": distance, "distance": distance}
+
+
+# ── NTPSource ─────────────────────────────────────────────────────────────────
+
+def test_query_picks_the_smallest_distance(monkeypatch):
+    distances = {"a": 0.30, "b": 0.05, "c": 0.12}
+    src = NTPSource(list(distances), timeout_s=1.0)
+    monkeypatch.setattr(src, "_one", lambda server: _answer(server, distances[server]))
+    best = src.query()
+    assert best["server"] == "b"
+    assert best["answered"] == 3
+
+
+def test_query_skips_failing_and_slow_servers(monkeypatch):
+    def one(server):
+        if server == "down":
+            raise OSError("unreachable")
+        if server == "slow":
+            time.sleep(1.0)
+        return _answer(server, 0.01 if server == "slow" else 0.2)
+
+    src = NTPSource(["down", "slow", "ok"], timeout_s=0.1)
+    monkeypatch.setattr(src, "_one", one)
+    t0 = time.monotonic()
+    best = src.query()
+    assert time.monotonic() - t0 < 0.9          # does not wait for the slow one
+    assert best["server"] == "ok"
+    assert best["answered"] == 1
+
+
+def test_query_without_answers(monkeypatch):
+    assert NTPSource([]).query() is None
+    src = NTPSource(["down"], timeout_s=0.1)
+    monkeypatch.setattr(src, "_one", lambda server: (_ for _ in ()).throw(OSError("x")))
+    assert src.query() is None
+
+
+def test_query_against_stand_in_server():
+    srv = StandInNTPServer("127.0.0.1", 0, offset_s=3600.0).start()
+    try:
+        best = NTPSource([f"127.0.0.1:{srv.port}"], timeout_s=2.0).query()
+    finally:
+        srv.stop()
+    assert best is not None
+    assert best["true"] - best["wall"] == pytest.approx(3600.0, abs=0.5)
+
+
+# ── Clock ─────────────────────────────────────────────────────────────────────
+
+class _Source:
+    name = "ntp"
+
+    def __init__(self, offset):
+        self.offset = offset
+        self.servers = ["fake"]
+
+    def query(self):
+        return None if self.offset is None else _answer("fake", 0.01, self.offset)
+
+
+class _SysTime:
+    """Stands in for time.time / time.monotonic so the system clock can be
+    stepped without touching the real one."""
+
+    def __init__(self):
+        self.mono = 1000.0
+        self.skew = 1_800_000_000.0
+
+    def monotonic(self):
+        return self.mono
+
+    def time(self):
+        return self.mono + self.skew
+
+
+@pytest.fixture
+def systime(monkeypatch):
+    st = _SysTime()
+    monkeypatch.setattr(timesource.time, "monotonic", st.monotonic)
+    monkeypatch.setattr(timesource.time, "time", st.time)
+    return st
+
+
+def _steps(clock):
+    seen = []
+    clock.add_listener(lambda before, after: seen.append(after.timestamp() - before.timestamp()))
+    return seen
+
+
+def test_check_step_reports_system_clock_steps_while_following_it(systime):
+    clock = Clock(TZ, [], step_s=2.0)
+    seen = _steps(clock)
+    systime.mono += 30
+    clock.check_step()                      # time passing is not a step
+    systime.skew += 1.0
+    clock.check_step()                      # below step_s
+    systime.skew -= 3600
+    clock.check_step()
+    assert seen == [pytest.approx(-3600)]
+    assert clock.timestamp() == systime.time()
+
+
+def test_check_step_ignores_system_clock_once_synced(systime):
+    clock = Clock(TZ, [_Source(10.0)], step_s=2.0)
+    assert clock.sync()
+    seen = _steps(clock)
+    pinned = clock.timestamp()
+    systime.skew += 3600
+    clock.check_step()
+    assert seen == []
+    assert clock.timestamp() == pytest.approx(pinned)
+    systime.mono += 5
+    assert clock.timestamp() == pytest.approx(pinned + 5)
+
+
+def test_sync_steps_on_big_offsets_and_slews_small_ones(systime):
+    clock = Clock(TZ, [_Source(100.0)], step_s=2.0, smooth=0.5)
+    seen = _steps(clock)
+    assert clock.sync()
+    assert clock.offset() == pytest.approx(100.0)
+    assert seen == [pytest.approx(100.0)]
+    assert clock.source == "ntp"
+
+    clock.sources[0].offset = 101.0          # 1 s off: blended, no step reported
+    assert clock.sync()
+    assert clock.offset() == pytest.approx(100.5)
+    assert len(seen) == 1
+
+
+def test_sync_failure_keeps_the_clock(systime):
+    clock = Clock(TZ, [_Source(None)])
+    assert not clock.sync()
+    assert clock.source == "system"
+
+
+def test_persisted_time_survives_a_restart(systime, tmp_path, monkeypatch):
+    monkeypatch.setattr(timesource, "_boot_id", lambda: "boot-1")
+    path = str(tmp_path / "time_state.json")
+    clock = Clock(TZ, [_Source(50.0)], state_path=path)
+    assert clock.sync()
+    systime.mono += 20
+    expected = clock.timestamp()
+
+    again = Clock(TZ, [], state_path=path)          # same boot: exact
+    assert again.source == "persisted"
+    assert again.timestamp() == pytest.approx(expected)
+
+
+def test_persisted_time_is_a_lower_bound_after_reboot(systime, tmp_path, monkeypatch):
+    path = str(tmp_path / "time_state.json")
+    monkeypatch.setattr(timesource, "_boot_id", lambda: "boot-1")
+    clock = Clock(TZ, [_Source(50.0)], state_path=path)
+    assert clock.sync()
+    saved = clock.timestamp()
+
+    # Reboot without RTC: monotonic restarts, the system clock is far behind
+    monkeypatch.setattr(timesource, "_boot_id", lambda: "boot-2")
+    systime.mono = 5.0
+    systime.skew = 1_700_000_000.0
+    again = Clock(TZ, [], state_path=path)
+    assert again.source == "persisted"
+    assert again.timestamp() == pytest.approx(saved)
+
+
+def test_failed_save_leaves_no_temp_file(systime, tmp_path, monkeypatch):
+    path = str(tmp_path / "time_state.json")
+    clock = Clock(TZ, [_Source(50.0)], state_path=path)
+
+    def disk_full(src, dst):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(timesource.os, "replace", disk_full)
+    assert clock.sync()                     # the sync itself still succeeds
+    assert os.listdir(tmp_path) == []
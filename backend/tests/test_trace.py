@@ -0,0 +1,59 @@
+import json
+import threading
+import time
+
+from model import trace
+from model.trace import SessionTrace
+
+
+def _lines(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_records_are_written_on_close(tmp_path):
+    path = str(tmp_path / "s.ndjson")
+    tr = SessionTrace(path, flush_interval_s=60)
+    tr.record("session", date="2026-10-19")
+    tr.record("confirm", r="24CS001")
+    tr.close(reason="manual", present=["24CS001"])
+    assert [r["k"] for r in _lines(path)] == ["session", "confirm", "end"]
+    assert tr.written == 3
+    header, records = trace.load(path)
+    assert header["date"] == "2026-10-19"
+    assert records[-1]["reason"] == "manual"
+
+
+def test_full_buffer_drops_the_oldest(tmp_path):
+    path = str(tmp_path / "s.ndjson")
+    tr = SessionTrace(path, capacity=16, flush_interval_s=60)
+    for i in range(20):
+        tr.record("vote", r=str(i), v=1)
+    tr.close()
+    records = _lines(path)
+    # The "end" record pushes out one more
+    assert tr.dropped == 5
+    assert records[0]["r"] == "5"
+    assert records[-1]["k"] == "end"
+
+
+def test_close_waits_for_a_slow_writer(tmp_path, monkeypatch):
+    path = str(tmp_path / "s.ndjson")
+    tr = SessionTrace(path, flush_interval_s=0.01)
+    entered = threading.Event()
+    real_write = tr._fh.write
+
+    def slow_write(data):
+        if not entered.is_set():
+            entered.set()
+            time.sleep(0.2)                 # SD card stall on the writer's first write
+        return real_write(data)
+
+    monkeypatch.setattr(tr._fh, "write", slow_write)
+    tr.record("pass", seq=1)
+    assert entered.wait(2)
+    # As if the join timed out while the writer is mid-write
+    monkeypatch.setattr(tr._thread, "join", lambda timeout=None: None)
+    tr.close(reason="manual")
+    assert [r["k"] for r in _lines(path)] == ["pass", "end"]
+    assert tr.written == 2
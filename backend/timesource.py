@@ -0,0 +1,361 @@
+"""
+timesource.py
+─────────────
+Wall-clock time for schedules on a Pi without RTC.
+
+Clock keeps a (monotonic, true unix time) base and derives now() from the
+monotonic clock, so reading the time is lock-free and immune to something
+else stepping the system clock.  Where the base comes from is pluggable:
+
+  • NTPSource       – all servers queried in parallel, the answer with the
+                      smallest synchronisation distance wins.  Entries may be
+                      "host" or "host:port", e.g. a StandInNTPServer on the
+                      LAN or on 127.0.0.1 in tests.
+  • persisted state – the last known good time is saved (time_state.json)
+                      with the monotonic reading and kernel boot id.  After
+                      a service restart it gives the exact time with no
+                      network; after a reboot it is a lower bound — the
+                      clock can never again start before it.
+  • system clock    – only until one of the above is available.
+
+Step detection: every sync and every check_step() call compares the new
+reading with the running clock; a difference of step_s or more is applied
+at once and reported to listeners as (before, after) so pending schedule
+fires and relay states can be re-evaluated.  While the clock still follows
+the system clock, a step of the system clock (fake-hwclock, timesyncd,
+someone running `date -s`) is detected the same way.
+
+Run a stand-in server (e.g. on a laptop in a classroom without internet):
+    python timesource.py serve [--port 123] [--offset 0]
+"""
+
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Callable, Optional
+
+import ntplib
+
+logger = logging.getLogger("smart-switch")
+
+_BOOT_ID_FILE = "/proc/sys/kernel/random/boot_id"
+
+
+def _boot_id() -> Optional[str]:
+    try:
+        with open(_BOOT_ID_FILE, "r") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+# ── Sources ───────────────────────────────────────────────────────────────────
+
+class NTPSource:
+    """Parallel NTP query; query() returns the best answer as a dict
+    {"server", "mono", "wall", "true", "delay", "distance"} or None."""
+
+    name = "ntp"
+
+    def __init__(self, servers: list, timeout_s: float = 3.0):
+        self.servers = list(servers)
+        self.timeout_s = timeout_s
+
+    def _one(self, server: str) -> dict:
+        host, _, port = server.partition(":")
+        resp = ntplib.NTPClient().request(host, version=3, port=int(port) if port else "ntp",
+                                          timeout=self.timeout_s)
+        mono, wall = time.monotonic(), time.time()
+        return {
+            "server":   server,
+            "mono":     mono,
+            "wall":     wall,
+            "true":     wall + resp.offset,
+            "delay":    resp.delay,
+            # RFC 5905 root synchronisation distance, roughly
+            "distance": resp.delay / 2 + resp.root_delay / 2 + resp.root_dispersion,
+        }
+
+    def query(self) -> Optional[dict]:
+        if not self.servers:
+            return None
+        pool = ThreadPoolExecutor(max_workers=len(self.servers), thread_name_prefix="ntp")
+        futures = {pool.submit(self._one, s): s for s in self.servers}
+        done, _ = wait(futures, timeout=self.timeout_s + 0.5)
+        pool.shutdown(wait=False)
+        answers = []
+        for fut in done:
+            try:
+                answers.append(fut.result())
+            except Exception as exc:
+                logger.warning("[NTP] %s unreachable: %s", futures[fut], exc)
+        for fut in set(futures) - done:
+            logger.warning("[NTP] %s unreachable: no answer", futures[fut])
+        if not answers:
+            return None
+        best = min(answers, key=lambda a: a["distance"])
+        best["answered"] = len(answers)
+        return best
+
+
+# ── Clock ─────────────────────────────────────────────────────────────────────
+
+class Clock:
+    def __init__(self, tz, sources: list, state_path: Optional[str] = None,
+                 step_s: float = 2.0, smooth: float = 0.5, save_every_s: float = 300.0):
+        self.tz = tz
+        self.sources = list(sources)
+        self.state_path = state_path
+        self.step_s = step_s
+        self.smooth = smooth                # weight of a new sample below step_s
+        self.save_every_s = save_every_s
+
+        # (monotonic, true unix time) — replaced as a whole, read without lock.
+        # None: follow the system clock.
+        self._base: Optional[tuple[float, float]] = None
+        self._source = "system"
+        self._info: dict = {}
+        self._sync_lock = threading.Lock()
+        self._listeners: list = []
+        self._last_saved = 0.0
+        self._sys_skew = time.time() - time.monotonic()   # system-clock step detector
+        self._boot_id = _boot_id()
+        self._restore()
+
+    # ── Reading ─────────────────────────────────────────
+
+    def timestamp(self) -> float:
+        base = self._base
+        if base is None:
+            return time.time()
+        return base[1] + (time.monotonic() - base[0])
+
+    def now(self) -> datetime:
+        return datetime.fromtimestamp(self.timestamp(), tz=self.tz)
+
+    def offset(self) -> float:
+        """Seconds this clock is ahead of the system clock."""
+        return self.timestamp() - time.time()
+
+    @property
+    def source(self) -> str:
+        return self._source
+
+    def info(self) -> dict:
+        return {"source": self._source, "offset_s": round(self.offset(), 3), **self._info}
+
+    def add_listener(self, fn: Callable[[datetime, datetime], None]):
+        """fn(before, after) is called after the clock stepped."""
+        self._listeners.append(fn)
+
+    # ── Updating ────────────────────────────────────────
+
+    def _apply(self, mono: float, wall: float, true_ts: float, source: str):
+        """Move the base towards (mono, true_ts): step on the first sample or
+        a big difference, otherwise blend.  Returns (clock reading at mono
+        before the update, difference, stepped)."""
+        old = self._base
+        current = wall if old is None else old[1] + (mono - old[0])
+        diff = true_ts - current
+        stepped = old is None or abs(diff) >= self.step_s
+        self._base = (mono, true_ts if stepped else current + self.smooth * diff)
+        self._source = source
+        return current, diff, stepped
+
+    def _notify(self, before_ts: float, after_ts: float):
+        before = datetime.fromtimestamp(before_ts, tz=self.tz)
+        after = datetime.fromtimestamp(after_ts, tz=self.tz)
+        logger.warning("[Clock] Stepped %+.1fs (%s → %s)", after_ts - before_ts,
+                       before.strftime("%Y-%m-%d %H:%M:%S"), after.strftime("%Y-%m-%d %H:%M:%S"))
+        for fn in list(self._listeners):
+            try:
+                fn(before, after)
+            except Exception as exc:
+                logger.error("[Clock] Step listener failed: %s", exc)
+
+    def sync(self) -> bool:
+        """Ask the sources in order; True if one answered."""
+        with self._sync_lock:
+            for src in self.sources:
+                ans = src.query()
+                if ans is None:
+                    continue
+                current, diff, stepped = self._apply(ans["mono"], ans["wall"], ans["true"],
+                                                     src.name)
+                self._info = {
+                    "server":      ans.get("server"),
+                    "delay_ms":    round(ans.get("delay", 0.0) * 1000, 1),
+                    "distance_ms": round(ans.get("distance", 0.0) * 1000, 1),
+                    "synced_at":   ans["true"],
+                }
+                break
+            else:
+                logger.warning("[NTP] All servers failed — using %s", self._source_desc())
+                return False
+        logger.info("[NTP] Synced with %s (%d/%d answered)  delay=%.0fms  %s %+.3fs  "
+                    "true_time=%s", ans.get("server"), ans.get("answered", 1),
+                    len(getattr(src, "servers", [None])), ans.get("delay", 0.0) * 1000,
+                    "stepped" if stepped else "slewed", diff,
+                    datetime.fromtimestamp(ans["true"], tz=self.tz).strftime("%Y-%m-%d %H:%M:%S %Z"))
+        self.save(force=True)
+        if abs(diff) >= self.step_s:
+            self._notify(current, current + diff)
+        return True
+
+    def _source_desc(self) -> str:
+        return {"system": "system clock",
+                "persisted": "last known good time + monotonic clock"}.get(
+                    self._source, "last sync + monotonic clock")
+
+    def check_step(self):
+        """Detect system-clock steps while following it, and persist the
+        current time now and then.  Call periodically (e.g. every 30 s)."""
+        skew = time.time() - time.monotonic()
+        jump = skew - self._sys_skew
+        self._sys_skew = skew
+        if abs(jump) >= self.step_s:
+            if self._base is None:
+                now_ts = time.time()
+                self._notify(now_ts - jump, now_ts)
+            else:
+                logger.info("[Clock] System clock stepped %+.1fs (ignored, using %s)",
+                            jump, self._source)
+        self.save()
+
+    # ── Persistence ─────────────────────────────────────
+
+    def _restore(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, "r") as f:
+                st = json.load(f)
+            saved_true, saved_mono = float(st["true"]), float(st["mono"])
+        except Exception as exc:
+            logger.warning("[Clock] Ignoring unreadable %s: %s", self.state_path, exc)
+            return
+        mono = time.monotonic()
+        if st.get("boot_id") and st.get("boot_id") == self._boot_id and mono >= saved_mono:
+            # Same boot (service restart): monotonic elapsed time is exact
+            self._base = (mono, saved_true + (mono - saved_mono))
+            self._source = "persisted"
+            logger.info("[Clock] Restored time from %s (same boot, exact)", self.state_path)
+        elif time.time() < saved_true:
+            # New boot and the system clock is behind the last known good
+            # time, so it is certainly wrong; the saved time is a lower bound.
+            self._base = (mono, saved_true)
+            self._source = "persisted"
+            logger.warning("[Clock] System clock is %.0fs behind the last known good time – "
+                           "using that until NTP answers", saved_true - time.time())
+
+    def save(self, force: bool = False):
+        """Persist the current time if it is trustworthy (not the bare
+        system clock); at most every save_every_s unless forced."""
+        if not self.state_path or self._base is None:
+            return
+        mono = time.monotonic()
+        if not force and mono - self._last_saved < self.save_every_s:
+            return
+        self._last_saved = mono
+        state = {"true": self.timestamp(), "mono": mono, "boot_id": self._boot_id,
+                 "source": self._source}
+        directory = os.path.dirname(os.path.abspath(self.state_path))
+        try:
+            fd, tmp = tempfile.mkstemp(prefix=".time-", suffix=".tmp", dir=directory)
+        except OSError as exc:
+            logger.warning("[Clock] Could not save %s: %s", self.state_path, exc)
+            return
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(state, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.state_path)
+        except (OSError, TypeError, ValueError) as exc:
+            logger.warning("[Clock] Could not save %s: %s", self.state_path, exc)
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+
+
+# ── Stand-in NTP server ───────────────────────────────────────────────────────
+
+class StandInNTPServer:
+    """Minimal SNTP server answering from clock() + offset_s.  For a
+    classroom LAN without internet (point NTP_SERVERS at it) and for tests
+    that need a wrong or stepping clock (change offset_s while running)."""
+
+    def __init__(self, host: str = "0.0.0.0", port: int = 123, offset_s: float = 0.0,
+                 clock: Callable[[], float] = time.time, stratum: int = 10):
+        self.offset_s = offset_s
+        self.clock = clock
+        self.stratum = stratum
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind((host, port))
+        self.port = self._sock.getsockname()[1]
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    def _now(self) -> float:
+        return ntplib.system_to_ntp_time(self.clock() + self.offset_s)
+
+    def serve_forever(self):
+        self._running = True
+        self._sock.settimeout(0.5)
+        while self._running:
+            try:
+                data, addr = self._sock.recvfrom(1024)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            recv = self._now()
+            try:
+                req = ntplib.NTPPacket()
+                req.from_data(data)
+            except ntplib.NTPException:
+                continue
+            resp = ntplib.NTPPacket(version=req.version, mode=4)
+            resp.stratum = self.stratum
+            resp.ref_id = 0x4C4F434C                       # "LOCL"
+            resp.ref_timestamp = recv
+            resp.orig_timestamp = req.tx_timestamp
+            resp.recv_timestamp = recv
+            resp.tx_timestamp = self._now()
+            self._sock.sendto(resp.to_data(), addr)
+
+    def start(self) -> "StandInNTPServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True,
+                                        name="ntp-standin")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self._sock.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Stand-in SNTP server")
+    ap.add_argument("command", choices=("serve",))
+    ap.add_argument("--host", default="0.0.0.0")
+    ap.add_argument("--port", type=int, default=123)
+    ap.add_argument("--offset", type=float, default=0.0,
+                    help="seconds added to this machine's clock (simulate a wrong clock)")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    srv = StandInNTPServer(args.host, args.port, args.offset)
+    logger.info("[NTP] Stand-in server on %s:%d (offset %+.1fs)", args.host, srv.port, args.offset)
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+bench_detector.py  —  Compare DeepFace detection (retinaface + fallback)
+                      against the native YuNet / SCRFD detectors.
+
+USAGE:
+  python tools/bench_detector.py --images frames/ [--labels labels.json]
+        [--scale 0.5] [--deepface retinaface]
+        [--yunet model/weights/face_detection_yunet_2023mar.onnx]
+        [--scrfd model/weights/scrfd_500m_bnkps.onnx] [--input 640]
+        [--align deepface|arcface]
+
+  --images   directory of JPEG/PNG frames (e.g. recorded with CAM_RECORD_DIR)
+  --labels   optional JSON {"frame_001.jpg": [[x, y, w, h], ...], ...} in
+             full-frame pixels; enables recall numbers (IoU >= 0.5)
+  --scale    detector input scale, as CAM_SCALE
+  --input    native detector input size (longest side / SCRFD square)
+
+Each detector goes through Recognizer.detect(), so timings include
+resizing and alignment exactly as in a live pass.  Reports mean/p95 latency,
+frames/s, faces, faces with landmarks and — with labels — recall.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2                                           # noqa: E402
+import numpy as np                                   # noqa: E402
+
+from model.recognition import Recognizer, box_iou   # noqa: E402
+
+
+def _recall(found: list[dict], truth: list[list[int]]) -> tuple[int, int]:
+    hit = 0
+    for x, y, w, h in truth:
+        gt = {"x": x, "y": y, "w": w, "h": h}
+        if any(box_iou(gt, f) >= 0.5 for f in found):
+            hit += 1
+    return hit, len(truth)
+
+
+def _run(name: str, rec: Recognizer, frames: list, labels: dict):
+    times, faces, marks, hit, total = [], 0, 0, 0, 0
+    rec.detect(frames[0][1])                       # warm-up (model load)
+    for fname, img in frames:
+        t0 = time.perf_counter()
+        hits = rec.detect(img)
+        times.append(time.perf_counter() - t0)
+        faces += len(hits)
+        marks += sum(1 for _, _, (_, fo) in hits if fo["facial_area"].get("left_eye"))
+        if fname in labels:
+            h, t = _recall([b for b, _, _ in hits], labels[fname])
+            hit += h
+            total += t
+
+    ms = np.asarray(times) * 1000.0
+    line = (f"{name:<22} mean={ms.mean():7.1f} ms  p95={np.percentile(ms, 95):7.1f} ms  "
+            f"{len(frames) / ms.sum() * 1000.0:5.2f} frames/s  faces={faces}  landmarks={marks}")
+    if total:
+        line += f"  recall={hit}/{total} ({hit / total:.1%})"
+    print(line)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Detector backend benchmark")
+    ap.add_argument("--images", required=True)
+    ap.add_argument("--labels")
+    ap.add_argument("--scale", type=float, default=0.5)
+    ap.add_argument("--deepface", default="retinaface",
+                    help="DeepFace detector_backend for the baseline ('' to skip)")
+    ap.add_argument("--fallback", default="mtcnn")
+    ap.add_argument("--yunet")
+    ap.add_argument("--scrfd")
+    ap.add_argument("--input", type=int, default=0)
+    ap.add_argument("--threshold", type=float, default=0.6)
+    ap.add_argument("--align", default="deepface", choices=("deepface", "arcface"))
+    args = ap.parse_args()
+
+    names = sorted(n for n in os.listdir(args.images)
+                   if n.lower().endswith((".jpg", ".jpeg", ".png")))
+    frames = [(n, cv2.imread(os.path.join(args.images, n))) for n in names]
+    frames = [(n, f) for n, f in frames if f is not None]
+    if not frames:
+        raise SystemExit(f"No images in {args.images}")
+    labels = {}
+    if args.labels:
+        with open(args.labels, "r", encoding="utf-8") as fh:
+            labels = json.load(fh)
+    h, w = frames[0][1].shape[:2]
+    print(f"{len(frames)} frames @ {w}x{h}, scale={args.scale}\n")
+
+    if args.deepface:
+        rec = Recognizer(detector_backend=args.deepface, fallback_backend=args.fallback,
+                         detection_scale=args.scale)
+        _run(f"deepface/{args.deepface}", rec, frames, labels)
+    for backend, path in (("yunet", args.yunet), ("scrfd", args.scrfd)):
+        if not path:
+            continue
+        rec = Recognizer(detection_scale=args.scale, native_detector=backend,
+                         detector_model_path=path, detector_input_size=args.input,
+                         detector_threshold=args.threshold, detector_align=args.align)
+        if rec._native() is None:
+            print(f"{backend:<22} unavailable (see log)")
+            continue
+        _run(f"native/{backend}", rec, frames, labels)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+bench_engine.py  —  End-to-end throughput benchmark of FaceEngine on a
+                    recorded clip, without camera, GPIO or Firestore.
+
+USAGE:
+  python tools/bench_engine.py --source clip/ [--max-speed] [--loop]
+                               [--duration 120] [--repeat 3]
+                               [--config tiled:CAM_TILED=1,CAM_TILE_GRID=2x2]
+
+  --source   directory of frames (e.g. recorded with CAM_RECORD_DIR) or a
+             video file; played through CAM_SOURCE
+  --max-speed  decode frames as fast as possible instead of real time
+  --config   NAME:KEY=VAL,KEY=VAL — extra env for one run; repeatable.
+             Without --config a single run with the current .env is made.
+  --students JSON [{"rollNo": …, "name": …}]; default: STUDENTS in app.py
+  --firestore  actually write attendance (off by default)
+
+Reports, per config: capture fps, detection passes/s, mean per-stage latency
+(detect / embed / match / total), embeddings/s, roster coverage and
+time-to-full-roster.  Runs on a plain Linux box with CPU-only TensorFlow.
+"""
+
+import argparse
+import ast
+import json
+import os
+import sys
+import time
+
+_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _BACKEND)
+
+from model import face_engine as fe                 # noqa: E402
+
+
+def _app_students() -> list[dict]:
+    """Read the STUDENTS literal from app.py without importing it (GPIO)."""
+    with open(os.path.join(_BACKEND, "app.py"), "r", encoding="utf-8") as fh:
+        tree = ast.parse(fh.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(
+                isinstance(t, ast.Name) and t.id == "STUDENTS" for t in node.targets):
+            return ast.literal_eval(node.value)
+    return []
+
+
+def _parse_config(spec: str) -> tuple[str, dict]:
+    name, _, pairs = spec.partition(":")
+    env = {}
+    for pair in filter(None, pairs.split(",")):
+        key, _, val = pair.partition("=")
+        env[key.strip()] = val.strip()
+    return name or "run", env
+
+
+def _run(name: str, env: dict, args) -> dict:
+    saved = {k: os.environ.get(k) for k in env}
+    os.environ.update(env)
+    os.environ["CAM_SOURCE"] = args.source
+    os.environ["CAM_SOURCE_REALTIME"] = "0" if args.max_speed else "1"
+    os.environ["CAM_SOURCE_LOOP"] = "1" if args.loop else "0"
+    os.environ["CAM_MAX_DURATION"] = str(args.duration)
+    try:
+        engine = fe.FaceEngine()
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+    res = engine.start(session_date=time.strftime("%Y-%m-%d"))
+    if not res.get("ok"):
+        raise SystemExit(f"{name}: cannot start engine: {res.get('reason')}")
+
+    t0 = time.monotonic()
+    full_roster_s = None
+    status = engine.get_status()
+    try:
+        while status["state"] != "idle":
+            time.sleep(0.2)
+            status = engine.get_status()
+            roster = status.get("roster") or {}
+            if full_roster_s is None and roster.get("expected") \
+                    and roster.get("present") == roster.get("expected"):
+                full_roster_s = time.monotonic() - t0
+    except KeyboardInterrupt:
+        engine.stop()
+    engine.shutdown()
+    elapsed = time.monotonic() - t0
+
+    recog = status.get("recognition") or {}
+    roster = status.get("roster") or {}
+    return {
+        "config":        name,
+        "env":           env,
+        "elapsed_s":     round(elapsed, 2),
+        "stop_reason":   status.get("stop_reason"),
+        "capture_fps":   round(status.get("capture_count", 0) / elapsed, 2),
+        "passes_per_s":  round(recog.get("passes", 0) / elapsed, 3),
+        "stage_ms":      status.get("stage_ms"),
+        "embeddings_per_s": round(recog.get("embeddings", 0) / elapsed, 3),
+        "faces":         recog.get("faces", 0),
+        "gated":         recog.get("gated", 0),
+        "reused":        recog.get("reused", 0),
+        "roster":        roster,
+        "full_roster_s": round(full_roster_s, 2) if full_roster_s is not None else None,
+        "error":         status.get("error"),
+    }
+
+
+def _print(r: dict):
+    st = r["stage_ms"] or {}
+    roster = r["roster"]
+    print(f"\n== {r['config']}  {r['env'] or ''}")
+    print(f"   {r['elapsed_s']:.1f}s ({r['stop_reason']})  capture {r['capture_fps']:.1f} fps  "
+          f"passes {r['passes_per_s']:.2f}/s  embeddings {r['embeddings_per_s']:.2f}/s")
+    print(f"   stage ms: detect={st.get('detect_ms', 0):.1f} embed={st.get('embed_ms', 0):.1f} "
+          f"match={st.get('match_ms', 0):.1f} total={st.get('total_ms', 0):.1f}")
+    full = f"{r['full_roster_s']:.1f}s" if r["full_roster_s"] is not None else "not reached"
+    print(f"   roster {roster.get('present', 0)}/{roster.get('expected', 0)}  "
+          f"time-to-full-roster {full}  faces={r['faces']} gated={r['gated']} "
+          f"reused={r['reused']}")
+    if r["error"]:
+        print(f"   error: {r['error']}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="FaceEngine throughput benchmark")
+    ap.add_argument("--source", required=True)
+    ap.add_argument("--max-speed", action="store_true")
+    ap.add_argument("--loop", action="store_true")
+    ap.add_argument("--duration", type=int, default=120)
+    ap.add_argument("--repeat", type=int, default=1)
+    ap.add_argument("--config", action="append", default=[])
+    ap.add_argument("--students")
+    ap.add_argument("--firestore", action="store_true")
+    ap.add_argument("--json", help="also write all results to this file")
+    args = ap.parse_args()
+
+    if not os.path.exists(args.source):
+        raise SystemExit(f"Source not found: {args.source}")
+    if not args.firestore:
+        fe._db = None
+
+    if args.students:
+        with open(args.students, "r", encoding="utf-8") as fh:
+            fe.load_students(json.load(fh))
+    else:
+        fe.load_students(_app_students())
+
+    configs = [_parse_config(c) for c in args.config] or [("default", {})]
+    results = []
+    for name, env in configs:
+        for i in range(args.repeat):
+            label = name if args.repeat == 1 else f"{name}#{i + 1}"
+            r = _run(label, env, args)
+            _print(r)
+            results.append(r)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
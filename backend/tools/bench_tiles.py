@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+bench_tiles.py  —  Compare full-frame vs tiled face detection on a recorded
+                   set of lecture-hall images.
+
+USAGE:
+  python tools/bench_tiles.py --images hall_frames/ [--labels labels.json]
+                              [--grid 2x2] [--overlap 0.15] [--workers 2]
+
+  --images   directory of JPEG/PNG frames captured at full sensor resolution
+  --labels   optional JSON {"frame_001.jpg": [[x, y, w, h], ...], ...} with
+             hand-labelled face boxes; enables recall numbers (IoU >= 0.5)
+
+Reports, per mode: mean/p95 latency per frame, frames/s, faces found and —
+with labels — recall.  Detection only; no ArcFace / gallery needed.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2                                           # noqa: E402
+import numpy as np                                   # noqa: E402
+
+from model.recognition import Recognizer, box_iou   # noqa: E402
+
+
+def _recall(found: list[dict], truth: list[list[int]]) -> tuple[int, int]:
+    hit = 0
+    for x, y, w, h in truth:
+        gt = {"x": x, "y": y, "w": w, "h": h}
+        if any(box_iou(gt, f) >= 0.5 for f in found):
+            hit += 1
+    return hit, len(truth)
+
+
+def _run(name: str, rec: Recognizer, frames: list, labels: dict):
+    times, faces, hit, total = [], 0, 0, 0
+    rec.detect(frames[0][1])                       # warm-up (model load)
+    for fname, img in frames:
+        t0 = time.perf_counter()
+        hits = rec.detect(img)
+        times.append(time.perf_counter() - t0)
+        boxes = [h[0] for h in hits]
+        faces += len(boxes)
+        if fname in labels:
+            h, t = _recall(boxes, labels[fname])
+            hit += h
+            total += t
+
+    ms = np.asarray(times) * 1000.0
+    line = (f"{name:<22} mean={ms.mean():7.1f} ms  p95={np.percentile(ms, 95):7.1f} ms  "
+            f"{len(frames) / ms.sum() * 1000.0:5.2f} frames/s  faces={faces}")
+    if total:
+        line += f"  recall={hit}/{total} ({hit / total:.1%})"
+    print(line)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--images", required=True)
+    ap.add_argument("--labels")
+    ap.add_argument("--detector", default=os.getenv("CAM_DETECTOR", "retinaface"))
+    ap.add_argument("--scale", type=float, default=float(os.getenv("CAM_SCALE", 0.5)))
+    ap.add_argument("--grid", default="2x2")
+    ap.add_argument("--overlap", type=float, default=0.15)
+    ap.add_argument("--tile-scale", type=float, default=1.0)
+    ap.add_argument("--workers", type=int, default=2)
+    args = ap.parse_args()
+
+    names = sorted(f for f in os.listdir(args.images)
+                   if f.lower().endswith((".jpg", ".jpeg", ".png")))
+    frames = [(f, cv2.imread(os.path.join(args.images, f))) for f in names]
+    frames = [(f, img) for f, img in frames if img is not None]
+    if not frames:
+        sys.exit(f"No images found in {args.images}")
+    labels = {}
+    if args.labels:
+        with open(args.labels, "r", encoding="utf-8") as fh:
+            labels = json.load(fh)
+
+    rows, _, cols = args.grid.lower().partition("x")
+    grid = (int(rows), int(cols or rows))
+    h, w = frames[0][1].shape[:2]
+    print(f"{len(frames)} frames @ {w}x{h}, detector={args.detector}")
+
+    _run(f"full @ {args.scale}x",
+         Recognizer(detector_backend=args.detector, detection_scale=args.scale),
+         frames, labels)
+    _run(f"tiled {grid[0]}x{grid[1]} @ {args.tile_scale}x",
+         Recognizer(detector_backend=args.detector, tile_grid=grid,
+                    tile_overlap=args.overlap, tile_scale=args.tile_scale,
+                    tile_workers=args.workers),
+         frames, labels)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+check_embedder.py  —  Compare a converted ArcFace (TFLite / ONNX) against the
+                      Keras model on the enrolment dataset.
+
+USAGE:
+  python tools/check_embedder.py --backend tflite --model model/weights/arcface_int8.tflite
+                                 [--dataset model/dataset] [--limit 300]
+
+For every dataset face (largest face per image) both models embed the same
+aligned crop.  Reported:
+
+  • cosine similarity between the two embeddings (mean / p5 / min)
+  • decision agreement against the enrolled pkl gallery — same best name and
+    same accept/reject under the engine's matching rule
+  • per-face latency of both backends and the speed-up
+  • model file size
+
+Rule of thumb before deploying: mean cosine ≥ 0.99 and decision agreement
+≥ 99 %; int8 models that fall short should be re-calibrated with more faces.
+"""
+
+import argparse
+import logging
+import os
+import pickle
+import sys
+import time
+
+_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _BACKEND)
+
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+
+import numpy as np                                                   # noqa: E402
+
+from model.embedders import (DeepFaceEmbedder, iter_dataset_faces,  # noqa: E402
+                             make_embedder)
+from model.recognition import Recognizer                             # noqa: E402
+
+
+def _gallery(path: str):
+    with open(path, "rb") as fh:
+        data = pickle.load(fh)
+    embs = np.asarray(data.get("embeddings", []), dtype=np.float32)
+    norms = np.linalg.norm(embs, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return embs / norms, data.get("names", []), float(data.get("threshold", 0.40))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Check a converted ArcFace model")
+    ap.add_argument("--backend", choices=("tflite", "onnx"), required=True)
+    ap.add_argument("--model", required=True)
+    ap.add_argument("--dataset", default=os.path.join(_BACKEND, "model", "dataset"))
+    ap.add_argument("--pkl", default=os.path.join(_BACKEND, "model", "deepface_embeddings.pkl"))
+    ap.add_argument("--detector", default="opencv")
+    ap.add_argument("--limit", type=int, default=300)
+    ap.add_argument("--threads", type=int, default=0)
+    args = ap.parse_args()
+
+    logging.getLogger("face_engine").setLevel(logging.WARNING)   # silence [Recog] lines
+
+    test = make_embedder(args.backend, model_path=args.model, threads=args.threads)
+    if test is None or test.name != args.backend:
+        raise SystemExit(f"Could not load {args.backend} model {args.model}")
+    ref = DeepFaceEmbedder("ArcFace")
+
+    rec = Recognizer()
+    if os.path.exists(args.pkl):
+        rec.set_gallery(*_gallery(args.pkl))
+
+    cos, ref_ms, test_ms = [], [], []
+    same_name = same_decision = 0
+    faces = list(iter_dataset_faces(args.dataset, args.detector, args.limit))
+    if not faces:
+        raise SystemExit(f"No faces found under {args.dataset}")
+    ref.embed(faces[0][2])                                   # warm-up both
+    test.embed(faces[0][2])
+
+    for _, _, face in faces:
+        t0 = time.perf_counter()
+        a = ref.embed(face)
+        t1 = time.perf_counter()
+        b = test.embed(face)
+        t2 = time.perf_counter()
+        if a is None or b is None:
+            continue
+        ref_ms.append((t1 - t0) * 1000.0)
+        test_ms.append((t2 - t1) * 1000.0)
+        cos.append(float(a @ b))
+        if rec.has_gallery:
+            na, _, _, acc_a = rec.match(a)
+            nb, _, _, acc_b = rec.match(b)
+            same_name += na == nb
+            same_decision += (na == nb and acc_a == acc_b) or (not acc_a and not acc_b)
+
+    n = len(cos)
+    c = np.asarray(cos)
+    print(f"faces compared      {n}")
+    print(f"cosine(keras, {args.backend})  mean={c.mean():.4f}  p5={np.percentile(c, 5):.4f}  "
+          f"min={c.min():.4f}")
+    if rec.has_gallery:
+        print(f"gallery best name   {same_name / n:.1%} identical")
+        print(f"accept decision     {same_decision / n:.1%} identical")
+    r, t = np.median(ref_ms), np.median(test_ms)
+    print(f"latency per face    keras={r:.1f} ms  {args.backend}={t:.1f} ms  "
+          f"speed-up x{r / t:.2f}")
+    print(f"model file          {os.path.getsize(args.model) / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
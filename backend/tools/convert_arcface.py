@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+convert_arcface.py  —  Export DeepFace's Keras ArcFace to TFLite or ONNX,
+                       optionally quantised, for CAM_EMBED_BACKEND.
+
+USAGE:
+  python tools/convert_arcface.py --format tflite [--quant int8|fp16|none]
+                                  [--dataset model/dataset] [--calib 200]
+                                  [--out model/weights/arcface_int8.tflite]
+  python tools/convert_arcface.py --format onnx --quant int8 --dataset model/dataset
+
+  --format   tflite (needs tensorflow) or onnx (needs tf2onnx, onnxruntime)
+  --quant    none: fp32 · fp16: fp16 weights (tflite only) · int8: full-integer
+             weights and activations, calibrated on aligned faces from the
+             enrolment dataset (root/<person>/<image>)
+  --calib    number of dataset faces used for int8 calibration
+
+Inputs and outputs stay float32 so embedders.py can feed either variant.
+Validate the result before deploying:
+  python tools/check_embedder.py --backend tflite --model <out> --dataset model/dataset
+
+Then in .env:  CAM_EMBED_BACKEND=tflite  CAM_EMBED_MODEL=<out>
+"""
+
+import argparse
+import os
+import sys
+
+_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _BACKEND)
+
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+
+from model.embedders import iter_dataset_faces, preprocess   # noqa: E402
+
+
+def _keras_arcface():
+    from deepface import DeepFace               # type: ignore
+    built = DeepFace.build_model("ArcFace")
+    # Newer DeepFace wraps the Keras model in a client object
+    return getattr(built, "model", built)
+
+
+def _calibration(dataset: str, n: int, size: tuple, detector: str) -> list:
+    if not dataset:
+        raise SystemExit("--dataset is required for int8 calibration")
+    samples = [preprocess(face, size)
+               for _, _, face in iter_dataset_faces(dataset, detector, limit=n)]
+    if not samples:
+        raise SystemExit(f"No faces found under {dataset}")
+    print(f"Calibrating on {len(samples)} faces")
+    return samples
+
+
+def to_tflite(model, out: str, quant: str, calib: list):
+    import tensorflow as tf                     # type: ignore
+    conv = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quant == "fp16":
+        conv.optimizations = [tf.lite.Optimize.DEFAULT]
+        conv.target_spec.supported_types = [tf.float16]
+    elif quant == "int8":
+        conv.optimizations = [tf.lite.Optimize.DEFAULT]
+        conv.representative_dataset = lambda: ([x] for x in calib)
+        conv.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    with open(out, "wb") as fh:
+        fh.write(conv.convert())
+
+
+def to_onnx(model, out: str, quant: str, calib: list, size: tuple):
+    import tensorflow as tf                     # type: ignore
+    import tf2onnx                              # type: ignore
+    fp32 = out if quant == "none" else out.replace(".onnx", "") + "_fp32.onnx"
+    spec = [tf.TensorSpec((None, size[0], size[1], 3), tf.float32, name="input")]
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=13, output_path=fp32)
+    if quant == "fp16":
+        raise SystemExit("fp16 is only supported for --format tflite")
+    if quant != "int8":
+        return
+
+    from onnxruntime.quantization import (          # type: ignore
+        CalibrationDataReader, QuantFormat, QuantType, quantize_static,
+    )
+
+    class _Reader(CalibrationDataReader):
+        def __init__(self):
+            self._it = iter(calib)
+
+        def get_next(self):
+            x = next(self._it, None)
+            return None if x is None else {"input": x}
+
+    # S8S8 QDQ: the layout ONNX Runtime runs fastest on ARM CPUs
+    quantize_static(fp32, out, _Reader(), quant_format=QuantFormat.QDQ,
+                    per_channel=True, weight_type=QuantType.QInt8,
+                    activation_type=QuantType.QInt8)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Convert ArcFace for embedders.py")
+    ap.add_argument("--format", choices=("tflite", "onnx"), required=True)
+    ap.add_argument("--quant", choices=("none", "fp16", "int8"), default="none")
+    ap.add_argument("--dataset", default=os.path.join(_BACKEND, "model", "dataset"))
+    ap.add_argument("--calib", type=int, default=200)
+    ap.add_argument("--detector", default="opencv")
+    ap.add_argument("--out")
+    args = ap.parse_args()
+
+    suffix = "" if args.quant == "none" else f"_{args.quant}"
+    out = args.out or os.path.join(_BACKEND, "model", "weights",
+                                   f"arcface{suffix}.{args.format}")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+
+    model = _keras_arcface()
+    size = tuple(int(v) for v in model.input_shape[1:3])
+    calib = _calibration(args.dataset, args.calib, size, args.detector) \
+        if args.quant == "int8" else []
+
+    if args.format == "tflite":
+        to_tflite(model, out, args.quant, calib)
+    else:
+        to_onnx(model, out, args.quant, calib, size)
+
+    print(f"Wrote {out} ({os.path.getsize(out) / 1e6:.1f} MB, input {size})")
+
+
+if __name__ == "__main__":
+    main()
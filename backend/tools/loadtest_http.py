@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+loadtest_http.py  —  Relay-control latency under MJPEG viewers and polling.
+
+USAGE:
+  python tools/loadtest_http.py [--url http://127.0.0.1:8000] [--viewers 3]
+                                [--pollers 4] [--requests 400]
+                                [--concurrency 2] [--device light1]
+                                [--no-keepalive]
+
+  --viewers      open N /attendance/camera/stream connections for the whole
+                 run and keep reading them (start a scan first to get frames)
+  --pollers      N clients polling /states at 1 Hz, like open dashboard tabs
+  --requests     total /control/<device>/on|off calls, alternating on/off
+  --concurrency  parallel control clients
+  --no-keepalive new TCP connection per request (what app.run forces)
+
+Reports p50 / p95 / p99 / max /control latency, errors (including 503 for
+viewers beyond HTTP_STREAM_WORKERS), control throughput and the frames the
+viewers received.  Run it once against HTTP_SERVER=dev and once against
+waitress to compare.  Note: it really switches the relay given by --device.
+"""
+
+import argparse
+import http.client
+import threading
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+
+class _Client:
+    def __init__(self, host: str, port: int, keepalive: bool):
+        self.host, self.port, self.keepalive = host, port, keepalive
+        self._conn = None
+
+    def get(self, path: str) -> int:
+        if self._conn is None:
+            self._conn = http.client.HTTPConnection(self.host, self.port, timeout=10)
+        headers = {} if self.keepalive else {"Connection": "close"}
+        try:
+            self._conn.request("GET", path, headers=headers)
+            resp = self._conn.getresponse()
+            resp.read()
+            status = resp.status
+            if not self.keepalive or resp.will_close:
+                self.close()
+            return status
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def _viewer(host: str, port: int, stop: threading.Event, counts: list, idx: int):
+    try:
+        conn = http.client.HTTPConnection(host, port, timeout=10)
+        conn.request("GET", "/attendance/camera/stream")
+        resp = conn.getresponse()
+        if resp.status != 200:
+            counts[idx] = -resp.status
+            return
+        while not stop.is_set():
+            line = resp.fp.readline()
+            if not line:
+                break
+            if line.startswith(b"--frame"):
+                counts[idx] += 1
+        conn.close()
+    except Exception:
+        pass
+
+
+def _poller(host: str, port: int, stop: threading.Event, keepalive: bool):
+    c = _Client(host, port, keepalive)
+    while not stop.is_set():
+        try:
+            c.get("/states")
+        except Exception:
+            pass
+        stop.wait(1.0)
+    c.close()
+
+
+def _controller(host: str, port: int, device: str, n: int, keepalive: bool,
+                lat: list, errors: list):
+    c = _Client(host, port, keepalive)
+    for i in range(n):
+        state = "on" if i % 2 == 0 else "off"
+        t0 = time.perf_counter()
+        try:
+            status = c.get(f"/control/{device}/{state}")
+        except Exception:
+            errors.append("conn")
+            continue
+        lat.append(time.perf_counter() - t0)
+        if status != 200:
+            errors.append(status)
+    c.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="HTTP latency load test")
+    ap.add_argument("--url", default="http://127.0.0.1:8000")
+    ap.add_argument("--viewers", type=int, default=3)
+    ap.add_argument("--pollers", type=int, default=4)
+    ap.add_argument("--requests", type=int, default=400)
+    ap.add_argument("--concurrency", type=int, default=2)
+    ap.add_argument("--device", default="light1")
+    ap.add_argument("--no-keepalive", action="store_true")
+    args = ap.parse_args()
+
+    u = urlparse(args.url)
+    host, port = u.hostname, u.port or 80
+    keepalive = not args.no_keepalive
+    stop = threading.Event()
+
+    frames = [0] * args.viewers
+    bg = [threading.Thread(target=_viewer, args=(host, port, stop, frames, i), daemon=True)
+          for i in range(args.viewers)]
+    bg += [threading.Thread(target=_poller, args=(host, port, stop, keepalive), daemon=True)
+           for _ in range(args.pollers)]
+    for t in bg:
+        t.start()
+    time.sleep(1.0)                                   # let viewers connect
+
+    lat, errors = [], []
+    per = max(1, args.requests // args.concurrency)
+    workers = [threading.Thread(target=_controller,
+                                args=(host, port, args.device, per, keepalive, lat, errors))
+               for _ in range(args.concurrency)]
+    t0 = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    stop.set()
+
+    print(f"{args.url}  viewers={args.viewers}  pollers={args.pollers}  "
+          f"concurrency={args.concurrency}  keep-alive={'on' if keepalive else 'off'}")
+    if lat:
+        ms = np.asarray(lat) * 1000.0
+        print(f"/control latency   p50={np.percentile(ms, 50):.1f} ms  "
+              f"p95={np.percentile(ms, 95):.1f} ms  p99={np.percentile(ms, 99):.1f} ms  "
+              f"max={ms.max():.1f} ms")
+        print(f"throughput         {len(lat) / elapsed:.1f} req/s")
+    print(f"errors             {len(errors)}"
+          + (f"  ({', '.join(sorted({str(e) for e in errors}))})" if errors else ""))
+    rejected = sum(1 for f in frames if f < 0)
+    print(f"viewer frames      {[max(f, 0) for f in frames]}"
+          + (f"  ({rejected} viewers refused)" if rejected else ""))
+
+
+if __name__ == "__main__":
+    main()
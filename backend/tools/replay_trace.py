@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+replay_trace.py  —  Analyse attendance-scan traces offline (no inference).
+
+USAGE:
+  python tools/replay_trace.py traces/2026-02-20_093000.ndjson [more.ndjson …]
+                               [--votes 1,2,3] [--thresholds 0.44:0.60:0.02]
+                               [--truth present.json]
+
+  traces      files written by FaceEngine (CAM_TRACE_DIR, default traces/)
+  --votes     vote_required values to try
+  --thresholds  adaptive thresholds to try, start:stop:step or a,b,c
+  --truth     JSON list of rollNos actually present (or {trace_name: […]}),
+              enables false-positive / missed counts
+
+Prints per-trace latency percentiles (pass round-trip and Recognizer stages),
+then replays every recorded best/second distance under each
+(vote_required, adaptive threshold) pair with the same accept rule as
+recognition.Recognizer.match and reports confirmations, median
+time-to-confirm and — with --truth — false positives and misses.
+
+Faces that the engine reused from its track memory carry the track's last
+distances, so they count as fresh evidence here; results are therefore a
+slight upper bound on confirmations for low vote_required values.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np                                  # noqa: E402
+
+from model.trace import load                        # noqa: E402
+
+
+def _pct(values: list[float]) -> str:
+    if not values:
+        return "n/a"
+    a = np.asarray(values, dtype=float)
+    p50, p90, p99 = np.percentile(a, [50, 90, 99])
+    return f"p50={p50:7.1f}  p90={p90:7.1f}  p99={p99:7.1f}  max={a.max():7.1f}  (n={len(a)})"
+
+
+def _thresholds(spec: str) -> list[float]:
+    if ":" in spec:
+        start, stop, step = (float(x) for x in spec.split(":"))
+        return [round(v, 4) for v in np.arange(start, stop + step / 2, step)]
+    return [float(x) for x in spec.split(",")]
+
+
+def _accepts(face: dict, base: float, adaptive: float, min_margin: float) -> bool:
+    d1, d2 = face.get("d1"), face.get("d2")
+    if d1 is None:
+        return False
+    margin = (d2 if d2 is not None else 1.0) - d1
+    thresh = adaptive if d1 < adaptive and margin >= min_margin else base
+    return d1 < thresh and margin >= min_margin
+
+
+def replay(header: dict, passes: list[dict], vote_required: int,
+           adaptive: float) -> dict[str, float]:
+    """Return {roll: confirm_time_s} under the given parameters."""
+    base = header.get("threshold", 0.40)
+    margin = header.get("min_margin", 0.02)
+    votes: dict[str, int] = {}
+    confirmed: dict[str, float] = {}
+    for p in passes:
+        for face in p.get("faces", []):
+            roll = face.get("br")
+            if not roll or roll in confirmed:
+                continue
+            if not _accepts(face, base, adaptive, margin):
+                continue
+            votes[roll] = votes.get(roll, 0) + 1
+            if votes[roll] >= vote_required:
+                confirmed[roll] = p["t"]
+    return confirmed
+
+
+def _latency(passes: list[dict]):
+    print(f"   round-trip ms  {_pct([p['lat_ms'] for p in passes if 'lat_ms' in p])}")
+    stages = sorted({k for p in passes for k in p.get("timings", {})})
+    for stage in stages:
+        vals = [p["timings"][stage] for p in passes if stage in p.get("timings", {})]
+        print(f"   {stage:<14} {_pct(vals)}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay attendance-scan traces")
+    ap.add_argument("traces", nargs="+")
+    ap.add_argument("--votes", default="1,2,3")
+    ap.add_argument("--thresholds", default="0.44:0.60:0.02")
+    ap.add_argument("--truth")
+    args = ap.parse_args()
+
+    vote_values = [int(v) for v in args.votes.split(",")]
+    thresholds = _thresholds(args.thresholds)
+    truth_spec = None
+    if args.truth:
+        with open(args.truth, "r", encoding="utf-8") as fh:
+            truth_spec = json.load(fh)
+
+    for path in args.traces:
+        header, records = load(path)
+        if header is None:
+            print(f"{path}: no session header, skipped")
+            continue
+        passes = [r for r in records if r.get("k") == "pass"]
+        end = next((r for r in records if r.get("k") == "end"), {})
+        name = os.path.basename(path)
+
+        print(f"\n== {name}  date={header.get('date')}  passes={len(passes)}  "
+              f"ended={end.get('reason', '?')} at {end.get('t', 0):.0f}s  "
+              f"dropped={end.get('dropped', 0)}")
+        print(f"   recorded: threshold={header.get('threshold')}  "
+              f"adaptive={header.get('adaptive_threshold')}  "
+              f"votes={header.get('vote_required')}  present={len(end.get('present', []))}"
+              f"/{len(header.get('enrolled', []))} enrolled")
+        _latency(passes)
+
+        truth = None
+        if isinstance(truth_spec, dict):
+            truth = truth_spec.get(name)
+        elif isinstance(truth_spec, list):
+            truth = truth_spec
+        truth = set(truth) if truth is not None else None
+
+        head = f"   {'votes':>5} {'adapt':>6} {'confirmed':>9} {'t50 s':>7} {'t_all s':>8}"
+        if truth is not None:
+            head += f" {'false+':>6} {'missed':>6}"
+        print(head)
+        for v in vote_values:
+            for th in thresholds:
+                confirmed = replay(header, passes, v, th)
+                times = sorted(confirmed.values())
+                line = (f"   {v:>5} {th:>6.2f} {len(confirmed):>9} "
+                        f"{(np.median(times) if times else float('nan')):>7.1f} "
+                        f"{(times[-1] if times else float('nan')):>8.1f}")
+                if truth is not None:
+                    line += f" {len(set(confirmed) - truth):>6} {len(truth - set(confirmed)):>6}"
+                print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -118,6 +118,8 @@ function CameraPanel({ date, isAdmin }) {
   const [streamError, setStreamError] = useState(false)
   const [frameUrl,    setFrameUrl]    = useState(null) // fallback only
   const [displayFps,  setDisplayFps]  = useState(0)   // client-side measured FPS
+  const [camId,       setCamId]       = useState(null) // selected camera (multi-camera rooms)
+  const [summary,     setSummary]     = useState(null) // attendance/{date}/summary/camera
 
   // Client-side FPS counter — counts onLoad events from the MJPEG img
   const fpsFrames  = useRef(0)
@@ -154,21 +156,31 @@ function CameraPanel({ date, isAdmin }) {
   // Status polling
   useEffect(() => {
     fetchStatus()
-    const t = setInterval(fetchStatus, status?.state === 'running' ? POLL_MS : 15000)
+    const fast = status?.state === 'running' || status?.state === 'initializing'
+    const t = setInterval(fetchStatus, fast ? POLL_MS : 15000)
     return () => clearInterval(t)
   }, [fetchStatus, status?.state])
 
+  // Camera summary: one document with the count and scan totals, kept
+  // current by the backend's batched writes
+  useEffect(() => {
+    setSummary(null)
+    const ref = doc(db, 'attendance', date, 'summary', 'camera')
+    return onSnapshot(ref, (snap) => setSummary(snap.exists() ? snap.data() : null), () => {})
+  }, [date])
+
   // Fallback frame polling (only active when MJPEG stream errored)
   useEffect(() => {
     if (status?.state !== 'running' || !streamError) {
       setFrameUrl(null)
       return
     }
-    const updateFrame = () => setFrameUrl(`${API_BASE}/attendance/camera/frame?t=${Date.now()}`)
+    const camParam = camId ? `cam=${encodeURIComponent(camId)}&` : ''
+    const updateFrame = () => setFrameUrl(`${API_BASE}/attendance/camera/frame?${camParam}t=${Date.now()}`)
     updateFrame()
     const interval = setInterval(updateFrame, FRAME_POLL_MS)
     return () => clearInterval(interval)
-  }, [status?.state, streamError])
+  }, [status?.state, streamError, camId])
 
   // Reset stream error state when scan stops/restarts
   useEffect(() => {
@@ -211,10 +223,11 @@ function CameraPanel({ date, isAdmin }) {
 
   const running  = status?.state === 'running'
   const detected = status?.detected ?? []
+  const camIds   = Object.keys(status?.cameras ?? {})
 
   // Prefer MJPEG stream; fall back to polled single frames on stream error
   const streamSrc = running && !streamError
-    ? `${API_BASE}/attendance/camera/stream`
+    ? `${API_BASE}/attendance/camera/stream${camId ? `?cam=${encodeURIComponent(camId)}` : ''}`
     : null
 
   return (
@@ -227,13 +240,27 @@ function CameraPanel({ date, isAdmin }) {
         {running && displayFps > 0 && (
           <span className="cam-panel__fps">{displayFps} fps</span>
         )}
+        {!running && summary?.presentCount > 0 && (
+          <span className="cam-panel__summary">
+            {summary.presentCount} by camera
+            {summary.scan?.sessions > 0 && ` · ${summary.scan.sessions} scan${summary.scan.sessions > 1 ? 's' : ''}`}
+          </span>
+        )}
+        {running && camIds.length > 1 && camIds.map(id => (
+          <button
+            key={id}
+            className={`cam-tab ${(camId ?? camIds[0]) === id ? 'cam-tab--active' : ''}`}
+            onClick={() => { setCamId(id); setStreamError(false) }}
+          >{id}</button>
+        ))}
         <span className="cam-panel__spacer" />
         {error && <span className="cam-panel__err">{error}</span>}
         {isAdmin && (
           running
             ? <button className="cam-btn cam-btn--stop"  onClick={handleStop}  disabled={busy}>■ Stop</button>
             : <button className="cam-btn cam-btn--start" onClick={handleStart} disabled={busy || status?.available === false}>
-                {status?.available === false ? 'Unavailable' : '▶ Start Scan'}
+                {status?.state === 'initializing' ? 'Loading…'
+                  : status?.available === false ? 'Unavailable' : '▶ Start Scan'}
               </button>
         )}
       </div>